@@ -1,29 +1,32 @@
 import os
-import json
 import csv
 import collections
 
 import pandas as pd
 import numpy as np
 
+import instrumentation
 import model.metrics
+import output.catalog
+import output.columnar_writer
 from generator.topology_generator import SimpleOpticalTopologyGenerator
 
 
 def get_metrics_single_solution(solution_file, base_path):
-    with open(os.path.join(base_path, solution_file), "r") as fd:
-        sol_dict = json.load(fd)
+    # JSON or columnar (.npz) solution files
+    sol_dict = output.columnar_writer.load_solution(os.path.join(base_path, solution_file))
     metrics = sol_dict['metrics']
+    # One column per timing and variable/constraint family, e.g., timings.build_variable_flow_cdn
+    for group in instrumentation.METRIC_GROUPS:
+        for k, v in metrics.pop(group, dict()).items():
+            metrics[f"{group}.{k}"] = v
     if len(sol_dict["ip_links"]) > 0:
         for k, metric_func in model.metrics.AVAILABLE_METRICS.items():
             if k not in metrics or "path_length" in k:
                 metrics.update(metric_func(sol_dict))
 
     # Additional metric: Total traffic volume
-    fname_cfg = os.path.join(base_path, solution_file.replace("solution", "configuration"))
-
-    with open(fname_cfg, "r") as fd:
-        json_config = json.load(fd)
+    json_config = output.columnar_writer.load_configuration(os.path.join(base_path, solution_file))
     total_traffic = 0
 
     fname_cdn_demand = None
@@ -263,8 +266,7 @@ def get_metrics_single_solution(solution_file, base_path):
         'total_ip_link_util': 1.0*total_rate_in_net / total_cap_in_net if total_cap_in_net > 0 else 0
     })
 
-    with open(os.path.join(base_path, solution_file.replace("solution", "configuration")), "r") as fd:
-        json_config = json.load(fd)
+    json_config = output.columnar_writer.load_configuration(os.path.join(base_path, solution_file))
 
     # Get demand type
     demtype = json_config['demand']['name']
@@ -299,13 +301,26 @@ def get_agg_metrics(fname, base_path):
     if os.path.exists(fname):
         df = pd.read_hdf(fname, key='agg_metrics')
 
+    if output.catalog.SolutionCatalog.exists(base_path):
+        # Solutions of the catalog, without listing the folder. Solutions that are not registered yet are added first
+        catalog = output.catalog.SolutionCatalog(base_path)
+        catalog.index_folder()
+        solution_files = [(row["solution_fname"], row["config_hash"]) for row in catalog.query()]
+        catalog.close()
+    else:
+        solution_files = [
+            (solution_file, os.path.splitext(solution_file.split('_')[-1])[0])
+            for solution_file in filter(lambda x: "solution_" in x, sorted(os.listdir(base_path)))
+        ]
+
+    known_config_ids = set(df["config_id"].values.tolist())
     solutions_list = list()
-    for solution_file in filter(lambda x: "solution_" in x, sorted(os.listdir(base_path))):
+    for solution_file, config_id in solution_files:
         print(solution_file)
-        config_id = solution_file.split('_')[-1].rstrip('.json')
-        if config_id in df["config_id"].values.tolist():
+        if config_id in known_config_ids:
             print("skipping")
             continue
+        known_config_ids.add(config_id)
         config = get_metrics_single_solution(solution_file, base_path)
         config['config_id'] = config_id
 
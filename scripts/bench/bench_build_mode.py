@@ -0,0 +1,70 @@
+import argparse
+import logging
+import multiprocessing
+import resource
+import sys
+import time
+
+import algorithm.mip_pathbased_lin
+from instances import build_ring_instance
+
+"""
+Compares the expression based and the sparse-matrix build of the linearized MIP. Every build runs in a fresh process
+so that the peak resident set size (RSS) can be attributed to one mode.
+Usage: PYTHONPATH=../../src python3 bench_build_mode.py --num_nodes 8 12 16 --check
+"""
+
+BUILD_MODES = [
+    algorithm.mip_pathbased_lin.PathBasedMixedIntegerProgramConfiguration.BUILD_MODE_EXPRESSION,
+    algorithm.mip_pathbased_lin.PathBasedMixedIntegerProgramConfiguration.BUILD_MODE_SPARSE
+]
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024 ** 2 if sys.platform == "darwin" else maxrss / 1024
+
+
+def run_build(build_mode, num_nodes, num_hypergiants, export):
+    inputinstance = build_ring_instance(num_nodes, num_hypergiants)
+    mip = algorithm.mip_pathbased_lin.PathBasedMixedIntegerProgramConfiguration(
+        model_implementor=algorithm.mip_pathbased_lin.PathMixedIntegerProgram.MODEL_IMPLEMENTOR_CBC,
+        build_mode=build_mode
+    ).produce(inputinstance)
+    t_start = time.perf_counter()
+    mip.build()
+    duration = time.perf_counter() - t_start
+    return {
+        'duration': duration,
+        'rss_peak': peak_rss_mb(),
+        'num_variables': mip.model_impl.NumVariables(),
+        'num_constraints': mip.model_impl.NumConstraints(),
+        'lp': mip.model_impl.ExportModelAsLpFormat(False) if export else None
+    }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Benchmark build time and peak memory of the MIP build modes")
+    parser.add_argument("--num_nodes", type=int, nargs="+", default=[6, 10, 14])
+    parser.add_argument("--num_hypergiants", type=int, default=2)
+    parser.add_argument("--check", action="store_true", help="check that both modes build the identical model")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'nodes':>6} {'mode':>11} {'variables':>10} {'constraints':>12} {'build [s]':>10} "
+          f"{'peak RSS [MB]':>14} {'identical':>10}")
+    for num_nodes in args.num_nodes:
+        results = dict()
+        for build_mode in BUILD_MODES:
+            with ctx.Pool(processes=1) as pool:
+                results[build_mode] = pool.apply(run_build, (build_mode, num_nodes, args.num_hypergiants, args.check))
+
+        identical = "-"
+        if args.check:
+            identical = str(len(set(result['lp'] for result in results.values())) == 1)
+        for build_mode, result in results.items():
+            print(f"{num_nodes:>6} {build_mode:>11} {result['num_variables']:>10} {result['num_constraints']:>12} "
+                  f"{result['duration']:>10.3f} {result['rss_peak']:>14.1f} {identical:>10}")
@@ -0,0 +1,213 @@
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from ortools.linear_solver import pywraplp
+
+import algorithm.mip_pathbased_lin
+import constants
+import generator.demand_generator
+import generator.topology_generator
+import model.input
+
+"""
+Scaling benchmark of the linearized MIP on synthetic instances (see generator.topology_generator and
+generator.demand_generator). Measures wall time and peak memory of build(), solve() under a time limit,
+get_solution() and writing the solution as JSON for every instance size and solver. Every run is done in a fresh
+process so that the peak resident set size (RSS) can be attributed to one run.
+Usage:
+    PYTHONPATH=../../src python3 bench_scaling.py --num_nodes 8 16 32 --num_hypergiants 2 4 --output results.json
+    PYTHONPATH=../../src python3 bench_scaling.py --num_nodes 8 16 32 --baseline results.json
+"""
+
+SOLVERS = {
+    "CBC": algorithm.mip_pathbased_lin.PathMixedIntegerProgram.MODEL_IMPLEMENTOR_CBC,
+    "SCIP": algorithm.mip_pathbased_lin.PathMixedIntegerProgram.MODEL_IMPLEMENTOR_SCIP,
+    "CPLEX": algorithm.mip_pathbased_lin.PathMixedIntegerProgram.MODEL_IMPLEMENTOR_CPLEX
+}
+# Parameters that identify a run
+KEYS = ["num_nodes", "num_hypergiants", "num_core_routers", "background_volume", "graph_type", "solver", "seed"]
+# Measurements compared against the baseline. Smaller is better for all of them
+MEASUREMENTS = ["build_time", "build_rss", "solve_time", "extract_time", "write_time", "peak_rss"]
+# Differences below these (s or MB) are noise and never count as regression
+MIN_DELTA = {
+    "build_time": 0.05,
+    "build_rss": 5,
+    "solve_time": 0.05,
+    "extract_time": 0.05,
+    "write_time": 0.05,
+    "peak_rss": 5
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024 ** 2 if sys.platform == "darwin" else maxrss / 1024
+
+
+def get_available_solvers():
+    return [name for name, solver_id in SOLVERS.items() if pywraplp.Solver.SupportsProblemType(solver_id)]
+
+
+def build_instance(params):
+    topology = generator.topology_generator.ComposedTopologyGeneratorConfiguration(
+        opt_topo_gen_config=generator.topology_generator.SyntheticOpticalTopologyGeneratorConfiguration(
+            num_nodes=params["num_nodes"], graph_type=params["graph_type"], fiber_capacity=params["fiber_capacity"],
+            seed=params["seed"]
+        ),
+        ip_topo_gen_config=generator.topology_generator.IPRoutersPerPoPGeneratorConfiguration(
+            num_core_routers=params["num_core_routers"], num_peering_routers=1,
+            num_transceiver=params["num_transceiver"]
+        ),
+        parameter={
+            constants.KEY_IP_LIGHTPATH_CAPACITY: 100,
+            constants.KEY_IP_LINK_UTILIZATION: 0.8
+        }
+    ).produce().generate()
+    demandset, background_demand = generator.demand_generator.GravityDemandGeneratorConfiguration(
+        num_hypergiants=params["num_hypergiants"],
+        cdn_volume=params["cdn_volume_per_node"] * params["num_nodes"],
+        background_volume=params["background_volume"],
+        seed=params["seed"]
+    ).produce(topology).generate()
+    return model.input.InputInstance(topology, demandset, background_demand=background_demand)
+
+
+def run_single(params):
+    inputinstance = build_instance(params)
+    result = dict(params)
+    result.update({
+        'num_ip_nodes': len(inputinstance.topology.ip_nodes),
+        'num_user_nodes': sum(len(hg.user_nodes) for hg in inputinstance.demandset),
+        'num_background_pairs': len(inputinstance.background_demand or dict())
+    })
+    mip = algorithm.mip_pathbased_lin.PathBasedMixedIntegerProgramConfiguration(
+        model_implementor=SOLVERS[params["solver"]],
+        time_limit=params["time_limit"],
+        build_mode=params["build_mode"]
+    ).produce(inputinstance)
+
+    t_start = time.perf_counter()
+    mip.build()
+    result['build_time'] = time.perf_counter() - t_start
+    result['build_rss'] = peak_rss_mb()
+    result['num_variables'] = mip.model_impl.NumVariables()
+    result['num_constraints'] = mip.model_impl.NumConstraints()
+
+    t_start = time.perf_counter()
+    mip.solve()
+    result['solve_time'] = time.perf_counter() - t_start
+
+    t_start = time.perf_counter()
+    sol = mip.get_solution()
+    result['extract_time'] = time.perf_counter() - t_start
+    result['objective'] = sol.to_dict()["metrics"].get("objective")
+    result['mip_gap'] = sol.to_dict()["metrics"].get("mip_gap")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        t_start = time.perf_counter()
+        with open(os.path.join(tmp_dir, "solution.json"), "w") as fd:
+            json.dump(sol.to_dict(), fp=fd, indent=2)
+        result['write_time'] = time.perf_counter() - t_start
+    result['peak_rss'] = peak_rss_mb()
+    return result
+
+
+def get_key(result):
+    return tuple(result.get(k) for k in KEYS)
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the ratio of every measurement to the baseline run with the same parameters.
+    :return: (int) number of measurements that are more than threshold worse than the baseline
+    """
+    baseline = {get_key(r): r for r in baseline}
+    num_regressions = 0
+    print(f"{'nodes':>6} {'hgs':>4} {'bg':>8} {'solver':>6} " + " ".join(f"{m:>13}" for m in MEASUREMENTS))
+    for result in results:
+        base = baseline.get(get_key(result))
+        if base is None:
+            print(f"{result['num_nodes']:>6} {result['num_hypergiants']:>4} {result['background_volume']:>8} "
+                  f"{result['solver']:>6} no baseline")
+            continue
+        cells = list()
+        for m in MEASUREMENTS:
+            ratio = result[m] / base[m] if base[m] > 0 else 1.0
+            flag = " "
+            if ratio > 1 + threshold and result[m] - base[m] > MIN_DELTA[m]:
+                flag = "!"
+                num_regressions += 1
+            cells.append(f"{ratio:>12.2f}{flag}")
+        print(f"{result['num_nodes']:>6} {result['num_hypergiants']:>4} {result['background_volume']:>8} "
+              f"{result['solver']:>6} " + " ".join(cells))
+    return num_regressions
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Scaling benchmark of build, solve, extraction and memory")
+    parser.add_argument("--num_nodes", type=int, nargs="+", default=[6, 10, 14], help="PoPs (optical nodes)")
+    parser.add_argument("--num_hypergiants", type=int, nargs="+", default=[2])
+    parser.add_argument("--num_core_routers", type=int, nargs="+", default=[1],
+                        help="core routers per PoP. Every PoP also has one peering router")
+    parser.add_argument("--background_volume", type=float, nargs="+", default=[0],
+                        help="total background demand, 0 for none. Otherwise, there is a demand per PoP pair")
+    parser.add_argument("--graph_type", type=str, default="mesh", choices=["ring", "mesh", "waxman"])
+    parser.add_argument("--solvers", type=str, nargs="+", default=None,
+                        help="solvers to compare, default: all locally available of {}".format(list(SOLVERS)))
+    parser.add_argument("--build_mode", type=str, default="expression", choices=["expression", "sparse"])
+    parser.add_argument("--time_limit", type=int, default=60, help="solver time limit in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="write the results as JSON to this file")
+    parser.add_argument("--baseline", type=str, default=None, help="compare against the results in this file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown against the baseline that counts as regression")
+    args = parser.parse_args()
+
+    solvers = args.solvers if args.solvers is not None else get_available_solvers()
+    ctx = multiprocessing.get_context("spawn")
+    results = list()
+    print(f"{'nodes':>6} {'hgs':>4} {'bg':>8} {'solver':>6} {'variables':>10} {'constraints':>12} {'build [s]':>10} "
+          f"{'solve [s]':>10} {'extract [s]':>12} {'write [s]':>10} {'peak RSS [MB]':>14} {'objective':>10}")
+    for num_nodes, num_hypergiants, num_core_routers, background_volume, solver in itertools.product(
+            args.num_nodes, args.num_hypergiants, args.num_core_routers, args.background_volume, solvers):
+        params = {
+            'num_nodes': num_nodes,
+            'num_hypergiants': num_hypergiants,
+            'num_core_routers': num_core_routers,
+            'background_volume': background_volume,
+            'graph_type': args.graph_type,
+            'solver': solver,
+            'seed': args.seed,
+            'build_mode': args.build_mode,
+            'time_limit': args.time_limit,
+            'fiber_capacity': 40,
+            'num_transceiver': 32,
+            'cdn_volume_per_node': 50
+        }
+        with ctx.Pool(processes=1) as pool:
+            result = pool.apply(run_single, (params,))
+        results.append(result)
+        print(f"{num_nodes:>6} {num_hypergiants:>4} {background_volume:>8} {solver:>6} {result['num_variables']:>10} "
+              f"{result['num_constraints']:>12} {result['build_time']:>10.3f} {result['solve_time']:>10.3f} "
+              f"{result['extract_time']:>12.3f} {result['write_time']:>10.3f} {result['peak_rss']:>14.1f} "
+              f"{str(result['objective']):>10}")
+
+    if args.output is not None:
+        with open(args.output, "w") as fd:
+            json.dump(results, fp=fd, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline, "r") as fd:
+            baseline_results = json.load(fd)
+        if compare(results, baseline_results, args.threshold) > 0:
+            sys.exit(1)
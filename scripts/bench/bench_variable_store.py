@@ -0,0 +1,119 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import algorithm.mip_pathbased_lin
+from instances import build_ring_instance
+
+"""
+Compares the build time of the linearized MIP with the indexed variable store against the builder of a baseline
+commit, which stores the variables in gurobipy's tupledict (select() scans all keys). The baseline is checked out in a
+temporary git worktree. Every build runs in a fresh process with the src folder of its tree. The baseline needs
+gurobipy (only tupledict is used, no license). By default, the baseline is the commit before the variable store.
+Usage: PYTHONPATH=../../src python3 bench_variable_store.py --num_nodes 6 10 14 [--baseline <commit>]
+
+Recorded run against the commit before the variable store (2 hypergiants, shortest of 5 builds):
+ nodes  variables  constraints  indexed [s]  baseline [s]
+     6        420          189        0.026         0.035
+    10       1940          489        0.060         0.104
+    14       5348          933        0.233         0.393
+    18      11412         1521        0.591         0.804
+"""
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def time_build(num_nodes, num_hypergiants):
+    """
+    Builds the model with the algorithm package on the path of this process.
+    :return: (dict) with the build time, number of variables and number of constraints
+    """
+    mip = algorithm.mip_pathbased_lin.PathMixedIntegerProgram(
+        build_ring_instance(num_nodes, num_hypergiants), num_threads=1
+    )
+    t_start = time.perf_counter()
+    mip.build()
+    return {
+        'duration': time.perf_counter() - t_start,
+        'num_vars': mip.model_impl.NumVariables(),
+        'num_cons': mip.model_impl.NumConstraints()
+    }
+
+
+def run_in_tree(src_path, num_nodes, num_hypergiants, repeats):
+    """
+    Runs time_build() in a new process with the given src folder repeats times.
+    :return: (dict) of time_build() with the shortest build time or None if the build failed
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([src_path, BENCH_PATH]))
+    best = None
+    for _ in range(repeats):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--num_nodes", str(num_nodes),
+             "--num_hypergiants", str(num_hypergiants)],
+            env=env, cwd=BENCH_PATH, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print("Build in {} failed: {}".format(src_path, proc.stderr.strip().splitlines()[-1:]))
+            return None
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if best is None or result['duration'] < best['duration']:
+            best = result
+    return best
+
+
+def git(*args):
+    return subprocess.run(["git"] + list(args), cwd=BENCH_PATH, capture_output=True, text=True,
+                          check=True).stdout.strip()
+
+
+def get_default_baseline():
+    """
+    :return: the commit before the one that added the indexed variable store
+    """
+    commits = git("log", "--format=%H", "--reverse", "-S", "class IndexedVariableDict", "--",
+                  ":/src/algorithm/mip.py")
+    return commits.splitlines()[0] + "^"
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Benchmark model build time of variable containers")
+    parser.add_argument("--num_nodes", type=int, nargs="+", default=[6, 10, 14])
+    parser.add_argument("--num_hypergiants", type=int, default=2)
+    parser.add_argument("--baseline", type=str, default=None, help="commit of the baseline builder")
+    parser.add_argument("--repeats", type=int, default=3, help="builds per tree, the shortest one is reported")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(time_build(args.num_nodes[0], args.num_hypergiants)))
+        sys.exit(0)
+
+    baseline = args.baseline if args.baseline is not None else get_default_baseline()
+    worktree = tempfile.mkdtemp(prefix="bench_baseline_")
+    git("worktree", "add", "--detach", worktree, baseline)
+    try:
+        print("Baseline: {}".format(git("log", "-1", "--format=%h %s", baseline)))
+        print(f"{'nodes':>6} {'variables':>10} {'constraints':>12} {'indexed [s]':>12} {'baseline [s]':>13}")
+        for num_nodes in args.num_nodes:
+            current = run_in_tree(os.path.join(BENCH_PATH, "..", "..", "src"), num_nodes, args.num_hypergiants,
+                                  args.repeats)
+            previous = run_in_tree(os.path.join(worktree, "src"), num_nodes, args.num_hypergiants, args.repeats)
+            if current is None:
+                continue
+            if previous is not None and (previous['num_vars'], previous['num_cons']) != \
+                    (current['num_vars'], current['num_cons']):
+                print("Models of {} nodes differ: {} variables and {} constraints in the baseline".format(
+                    num_nodes, previous['num_vars'], previous['num_cons']))
+            duration_baseline = previous['duration'] if previous is not None else float("nan")
+            print(f"{num_nodes:>6} {current['num_vars']:>10} {current['num_cons']:>12} {current['duration']:>12.3f} "
+                  f"{duration_baseline:>13.3f}")
+    finally:
+        git("worktree", "remove", "--force", worktree)
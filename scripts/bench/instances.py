@@ -0,0 +1,56 @@
+import constants
+import model.demand
+import model.input
+import model.topology
+
+"""
+Synthetic instances for the benchmarks in this directory.
+"""
+
+
+def build_ring_instance(num_nodes, num_hypergiants=2, fiber_capacity=100, num_transceiver=100):
+    """
+    Creates a ring of optical nodes with one IP node each. Every hypergiant peers at two nodes and serves all nodes.
+    :param num_nodes:
+    :param num_hypergiants:
+    :param fiber_capacity:
+    :param num_transceiver:
+    :return: (model.input.InputInstance)
+    """
+    topo = model.topology.Topology(
+        name=f"ring_{num_nodes}",
+        parameter={
+            constants.KEY_IP_LIGHTPATH_CAPACITY: 100,
+            constants.KEY_IP_LINK_UTILIZATION: 0.5
+        }
+    )
+    for i in range(num_nodes):
+        topo.add_node(model.topology.OpticalNode(nid=f"O-{i}"))
+    for i in range(num_nodes):
+        topo.add_node(
+            model.topology.IPNode(nid=f"{i}", parent=topo.get_node_by_id(f"O-{i}"), num_transceiver=num_transceiver)
+        )
+    for i in range(num_nodes):
+        m = topo.get_node_by_id(f"O-{i}")
+        n = topo.get_node_by_id(f"O-{(i + 1) % num_nodes}")
+        topo.add_edge(model.topology.OpticalLink(m, n, capacity=fiber_capacity))
+        topo.add_edge(model.topology.OpticalLink(n, m, capacity=fiber_capacity))
+
+    demandset = model.demand.DemandSet()
+    for h in range(num_hypergiants):
+        name = f"hg{h}"
+        demandset.append(
+            model.demand.Hypergiant(
+                name=name,
+                peering_nodes=[
+                    model.demand.PeeringNode(nid=f"{p}-{name}", parent=topo.get_node_by_id(f"{p}"), capacity=1000)
+                    for p in [h % num_nodes, (h + num_nodes // 2) % num_nodes]
+                ],
+                user_nodes=[
+                    model.demand.EndUserNode(nid=f"{u}-{name}", parent=topo.get_node_by_id(f"{u}"),
+                                             demand_volume=10.0 + u)
+                    for u in range(num_nodes)
+                ]
+            )
+        )
+    return model.input.InputInstance(topo, demandset)
@@ -6,6 +6,9 @@ import csv
 import re
 import scipy.spatial.distance as sspd
 
+import output.catalog
+import output.columnar_writer
+
 CDN_FIXED_PREFIX = "fixed_cdn"
 
 
@@ -25,9 +28,19 @@ def get_config_hashes(agg_metrics, algo_name, demand_type, num_transceiver, ip_l
 
 def load_file(config_hash, timestamp, demand_type, base_sol_path, ftype="solution"):
     """
-    Returns json content of the specified solution file. Constructs proper fname before.
+    Returns json content of the specified solution file. Constructs proper fname before. If the folder has a solution
+    catalog, the file is looked up by the config hash instead.
     :return:
     """
+    if output.catalog.SolutionCatalog.exists(base_sol_path):
+        catalog = output.catalog.SolutionCatalog(base_sol_path)
+        entries = catalog.query(config_hash=config_hash)
+        catalog.close()
+        if len(entries) > 0:
+            if ftype == "configuration":
+                return json.loads(entries[0]["configuration"])
+            return output.columnar_writer.load_solution(os.path.join(base_sol_path, entries[0]["solution_fname"]))
+
     if demand_type == 'DemandSetGeneratorFromCSVConfiguration':
         infix = f'single_{timestamp}_{config_hash}.json'
     elif demand_type == 'DemandMatrixFromCSVGeneratorConfiguration':
@@ -7,6 +7,8 @@ import scenario
 import generator.topology_generator
 import generator.demand_generator
 import constants
+import output.catalog
+import output.columnar_writer
 import output.file_writer
 import model.fixed_layers
 
@@ -120,12 +122,58 @@ def create_demand_and_topo_configs(input_file_tuples, opt_topo_config, topo_para
     return out_tuples
 
 
+def is_previous_configuration(config_from_file, topo, demand, algo, fixed_layer, comment):
+    """
+    Checks if a stored scenario configuration is the previous one of the given configurations
+    (see find_previous_solution_file()).
+    """
+    if topo.to_dict()["parameter"] != config_from_file["topology"]["parameter"]:
+        if topo.to_dict()["name"] != config_from_file["topology"]["name"] or \
+                topo.to_dict()["opt_topo"]["fiber_capacity"] != config_from_file["topology"]["opt_topo"][
+            "fiber_capacity"] or \
+                topo.to_dict()["parameter"]["IP_LINK_UTILIZATION"] != config_from_file["topology"][
+            "parameter"]["IP_LINK_UTILIZATION"] or \
+                "failed_links" in config_from_file["topology"]["parameter"]:
+            return False
+    if algo.to_dict() != config_from_file["algorithm"]:
+        return False
+    if config_from_file["demand"]["name"] != demand.__class__.__name__:
+        return False
+    if fixed_layer is not None and "fixed_layers" not in config_from_file:
+        return False
+    elif fixed_layer is None and "fixed_layers" in config_from_file:
+        if config_from_file["fixed_layers"] != {}:
+            return False
+    elif fixed_layer is not None and "fixed_layers" in config_from_file and len(
+            config_from_file["fixed_layers"]) > 0 and \
+            (config_from_file["fixed_layers"]["fix_ip_links"] != fixed_layer[0] or
+             config_from_file["fixed_layers"]["fix_ip_connectivity"] != fixed_layer[1] or
+             config_from_file["fixed_layers"]["fix_cdn_assignment"] != fixed_layer[2]):
+        return False
+    if comment is not None and "comment" not in config_from_file:
+        return False
+    elif comment is None and "comment" in config_from_file:
+        return False
+    elif comment is not None and "comment" in config_from_file and config_from_file["comment"] != comment:
+        return False
+    return True
+
+
 def find_previous_solution_file(topo, demand, algo, fixed_layer, comment, path, offset):
     if "average" in topo.ip_topo_gen_config.fname:
         raise RuntimeError("No previous solution for average input")
     previous_timestamp = int(topo.ip_topo_gen_config.fname.split("_")[-1].replace(".csv", "")) - offset
     print(f"Timestamp previous solution: {previous_timestamp}")
 
+    if output.catalog.SolutionCatalog.exists(path):
+        # Indexed lookup of the solutions of the timestamp. Only their configurations are compared
+        catalog = output.catalog.SolutionCatalog(path)
+        entries = catalog.query(input_timestamp=previous_timestamp, algo_name=algo.to_dict()["name"])
+        catalog.close()
+        for entry in entries:
+            if is_previous_configuration(json.loads(entry["configuration"]), topo, demand, algo, fixed_layer, comment):
+                return os.path.join(path, entry["solution_fname"])
+
     for cfg_fname in filter(
             lambda x: "configuration_" in x and str(previous_timestamp) in x,
             os.listdir(path)
@@ -133,36 +181,8 @@ def find_previous_solution_file(topo, demand, algo, fixed_layer, comment, path,
         abs_cfg_fname = os.path.join(path, cfg_fname)
         with open(abs_cfg_fname, "r") as fd:
             config_from_file = json.load(fd)
-        if topo.to_dict()["parameter"] != config_from_file["topology"]["parameter"]:
-            if topo.to_dict()["name"] != config_from_file["topology"]["name"] or \
-                    topo.to_dict()["opt_topo"]["fiber_capacity"] != config_from_file["topology"]["opt_topo"][
-                "fiber_capacity"] or \
-                    topo.to_dict()["parameter"]["IP_LINK_UTILIZATION"] != config_from_file["topology"][
-                "parameter"]["IP_LINK_UTILIZATION"] or \
-                    "failed_links" in config_from_file["topology"]["parameter"]:
-                continue
-        if algo.to_dict() != config_from_file["algorithm"]:
-            continue
-        if config_from_file["demand"]["name"] != demand.__class__.__name__:
-            continue
-        if fixed_layer is not None and "fixed_layers" not in config_from_file:
-            continue
-        elif fixed_layer is None and "fixed_layers" in config_from_file:
-            if config_from_file["fixed_layers"] != {}:
-                continue
-        elif fixed_layer is not None and "fixed_layers" in config_from_file and len(
-                config_from_file["fixed_layers"]) > 0 and \
-                (config_from_file["fixed_layers"]["fix_ip_links"] != fixed_layer[0] or
-                 config_from_file["fixed_layers"]["fix_ip_connectivity"] != fixed_layer[1] or
-                 config_from_file["fixed_layers"]["fix_cdn_assignment"] != fixed_layer[2]):
-            continue
-        if comment is not None and "comment" not in config_from_file:
-            continue
-        elif comment is None and "comment" in config_from_file:
-            continue
-        elif comment is not None and "comment" in config_from_file and config_from_file["comment"] != comment:
-            continue
-        return abs_cfg_fname.replace("configuration", "solution")
+        if is_previous_configuration(config_from_file, topo, demand, algo, fixed_layer, comment):
+            return abs_cfg_fname.replace("configuration", "solution")
     raise RuntimeError(
         f"Could not find solution file for {topo.to_dict()}\n {demand.to_dict()} \n {algo.to_dict()} \n {fixed_layer}")
 
@@ -170,8 +190,7 @@ def find_previous_solution_file(topo, demand, algo, fixed_layer, comment, path,
 def get_links_from_solution_file(solution_fname):
     links = dict()
 
-    with open(solution_fname, "r") as fd:
-        sol_dict = json.load(fd)
+    sol_dict = output.columnar_writer.load_solution(solution_fname)
 
     for link in sol_dict["ip_links"]:
         links[f"{link['node1']}<->{link['node2']}"] = link["num_trunks"]
@@ -182,8 +201,7 @@ def get_links_from_solution_file(solution_fname):
 def get_cdn_assignment_from_solution_file(solution_fname):
     assignment = dict()
 
-    with open(solution_fname, "r") as fd:
-        sol_dict = json.load(fd)
+    sol_dict = output.columnar_writer.load_solution(solution_fname)
 
     for cdn in sol_dict["cdn_assignment"]:
         assignment[cdn["name"]] = dict()
@@ -0,0 +1,40 @@
+import argparse
+import logging
+
+import input_cache
+import work_queue
+
+"""
+Runs scenarios of a work queue in a shared folder that was filled by control.FileQueueRunner, e.g., on another host.
+Usage:
+    PYTHONPATH=../src python3 queue_worker.py --queue /mnt/shared/queue --num_jobs 4
+"""
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(levelname)s - %(asctime)s - %(processName)s - %(name)s  - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Worker of a shared-folder work queue of scenarios")
+    parser.add_argument("--queue", type=str, required=True, help="folder of the queue")
+    parser.add_argument("--num_jobs", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--lease_time", type=int, default=600,
+                        help="time (s) after which scenarios of workers without heartbeat are run again")
+    parser.add_argument("--heartbeat_interval", type=int, default=60)
+    parser.add_argument("--poll_interval", type=int, default=10)
+    parser.add_argument("--input_cache", type=str, default=None,
+                        help="folder of the on-disk cache of produced inputs, e.g., on a local disk of the host")
+    args = parser.parse_args()
+
+    if args.input_cache is not None:
+        input_cache.set_cache_dir(args.input_cache)
+
+    queue_args = (args.queue, args.lease_time, args.heartbeat_interval, args.poll_interval)
+    if args.num_jobs == 1:
+        work_queue.work(*queue_args)
+    else:
+        import multiprocessing
+        workers = [multiprocessing.Process(target=work_queue.work, args=queue_args) for _ in range(args.num_jobs)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
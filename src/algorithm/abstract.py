@@ -1,3 +1,6 @@
+import logging
+
+
 class AbstractAlgorithm(object):
     def run(self):
         raise NotImplementedError
@@ -5,6 +8,14 @@ class AbstractAlgorithm(object):
     def get_solution(self):
         raise NotImplementedError
 
+    def set_num_threads(self, num_threads):
+        """
+        Overrides the solver threads of the configuration without changing the configuration, e.g., when a runner
+        shares the cores among scenarios (see control.CoreBudgetRunner). Algorithms with a solver override it.
+        """
+        logging.getLogger(self.__module__ + "." + self.__class__.__name__).warning(
+            "{} does not use solver threads. Ignored {} threads".format(self.__class__.__name__, num_threads))
+
 
 class AbstractAlgorithmConfiguration(object):
     def to_dict(self) -> dict:
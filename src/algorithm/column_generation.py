@@ -0,0 +1,474 @@
+import collections
+import itertools
+import time
+
+import networkx as nx
+import numpy as np
+from ortools.linear_solver import pywraplp
+
+import constants
+import model.demand
+from algorithm.abstract import AbstractAlgorithmConfiguration
+from algorithm.mip import AbstractMixedIntegerProgram, build_var_key
+from algorithm.mip_pathbased_lin import PathMixedIntegerProgram
+from instrumentation import instrumented
+
+
+class ColumnGenerationConfiguration(AbstractAlgorithmConfiguration):
+    def __init__(self, model_implementor, num_threads=1, time_limit=None, max_iterations=100, tolerance=1e-6,
+                 num_transit_columns=2):
+        """
+
+        :param model_implementor: solver of the final restricted master MIP
+        :param num_threads:
+        :param time_limit: time limit of the final restricted master MIP
+        :param max_iterations: maximum number of pricing rounds
+        :param tolerance: columns are added if their reduced cost is below -tolerance
+        :param num_transit_columns: number of two-hop paths per source and commodity that are added for the final MIP.
+            The LP relaxation rarely needs paths over intermediate IP nodes, the integer plan does to groom traffic.
+        """
+        self.model_implementor = model_implementor
+        self.num_threads = num_threads
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.num_transit_columns = num_transit_columns
+
+    def to_dict(self):
+        return {
+            'name': self.__class__.__name__,
+            'model_implementor': self.model_implementor,
+            'num_threads': self.num_threads,
+            'time_limit': self.time_limit,
+            'max_iterations': self.max_iterations,
+            'tolerance': self.tolerance,
+            'num_transit_columns': self.num_transit_columns
+        }
+
+    def produce(self, inputinstance):
+        return ColumnGenerationProgram(
+            inputinstance=inputinstance,
+            model_implementor=self.model_implementor,
+            num_threads=self.num_threads,
+            time_limit=self.time_limit,
+            max_iterations=self.max_iterations,
+            tolerance=self.tolerance,
+            num_transit_columns=self.num_transit_columns
+        )
+
+
+class ColumnGenerationProgram(PathMixedIntegerProgram):
+    """
+    Path formulation of the linearized model. Instead of one flow variable per commodity and IP arc, every commodity
+    (end-user node of a hypergiant or background demand) gets variables for a set of IP paths. The rows on the IP trunk
+    variables (degree, fiber capacity, fixed layers, ...) are the same as in PathMixedIntegerProgram.
+    The LP relaxation is solved by column generation: the pricing problem is a shortest path on the IP arcs weighted
+    with the duals of the IP capacity and utilization rows. The final plan is the MIP over all generated columns
+    (price-and-branch), which is a heuristic since columns of an optimal integer solution may be missing.
+    Paths of CDN flows do not transit IP nodes of the hypergiant's peering nodes, background flows do not transit
+    peering routers ('-E'), as in the arc formulation. As there, the peering nodes of an IP node all carry the flow that
+    leaves this IP node, and a user node is not served by peering nodes at its own IP node.
+    """
+    LP_IMPLEMENTOR = pywraplp.Solver.GLOP_LINEAR_PROGRAMMING
+    # Cost of the artificial variables that keep the restricted master LP feasible
+    ARTIFICIAL_COST = 1e6
+    # Added to every arc in the pricing so that the path with the fewest hops is chosen among equally priced ones
+    HOP_COST = 1e-7
+
+    Commodity = collections.namedtuple("Commodity", ["flow_type", "key", "sources", "sink", "volume", "no_transit"])
+
+    def __init__(self, inputinstance, model_implementor=AbstractMixedIntegerProgram.MODEL_IMPLEMENTOR_CBC,
+                 num_threads=None, time_limit=None, max_iterations=100, tolerance=1e-6, num_transit_columns=2):
+        super(ColumnGenerationProgram, self).__init__(inputinstance, model_implementor, num_threads,
+                                                      relaxed=False, time_limit=time_limit)
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.num_transit_columns = num_transit_columns
+        self.mip_impl = self.model_impl
+
+        self.commodities = list()
+        # Per commodity: list of generated paths (source, tuple of IP arcs) and list of their variables
+        self.paths = collections.defaultdict(list)
+        self.path_variables = collections.defaultdict(list)
+        self._known_paths = set()
+        self.artificials = list()
+        self.cg_stats = dict()
+
+        self._ip_node_index = {n: i for i, n in enumerate(self.inputinstance.topology.ip_nodes)}
+
+    def build(self):
+        t_start = time.perf_counter()
+        self.build_commodities()
+
+        # Column generation on the LP relaxation
+        integer_types = self.flow_variable_types
+        self.flow_variable_types = {k: False for k in integer_types}
+        self.model_impl = pywraplp.Solver("master_lp", self.LP_IMPLEMENTOR)
+        self.build_master(with_artificials=True)
+        self.add_initial_columns()
+        self.generate_columns()
+        self.add_transit_columns()
+        self.cg_stats["cg_columns"] = sum(len(paths) for paths in self.paths.values())
+
+        # Restricted master MIP over all generated columns
+        self.flow_variable_types = integer_types
+        self.model_impl = self.mip_impl
+        self.build_master(with_artificials=False)
+        self.cg_stats["cg_time"] = time.perf_counter() - t_start
+        self.is_built = True
+
+    def build_commodities(self):
+        self.commodities = list()
+        for hg in self.inputinstance.demandset or list():
+            no_transit = frozenset(self._ip_node_index[pnode.lower_layer] for pnode in hg.peering_nodes)
+            # Sources are the IP nodes with the tuple of their peering nodes
+            pnodes = collections.defaultdict(list)
+            for pnode in hg.peering_nodes:
+                pnodes[pnode.lower_layer].append(pnode)
+            for unode in hg.user_nodes:
+                self.commodities.append(ColumnGenerationProgram.Commodity(
+                    "flow_cdn", (hg.name, unode),
+                    [(tuple(p), ip_node) for ip_node, p in pnodes.items() if ip_node != unode.lower_layer],
+                    unode.lower_layer, unode.demand_volume, no_transit
+                ))
+        no_transit = frozenset(i for n, i in self._ip_node_index.items() if "-E" in n.id)
+        for k, dem in (self.inputinstance.background_demand or dict()).items():
+            self.commodities.append(ColumnGenerationProgram.Commodity(
+                "flow_e2e", k, [(None, dem.node1)], dem.node2, dem.volume, no_transit
+            ))
+
+    def build_master(self, with_artificials):
+        """
+        Builds the master problem in self.model_impl with all paths generated so far.
+        """
+        self.variables = dict()
+        self.constraints = dict()
+        self.path_variables = collections.defaultdict(list)
+        self.artificials = list()
+
+        self.build_variables()
+        self.build_constraints()
+        self.build_objective()
+        if with_artificials:
+            for row in self.constraints["convexity"].values():
+                var = self.model_impl.NumVar(0, 1, "artificial_{}".format(len(self.artificials)))
+                row.SetCoefficient(var, 1)
+                self.model_impl.Objective().SetCoefficient(var, ColumnGenerationProgram.ARTIFICIAL_COST)
+                self.artificials.append(var)
+        self.fix_layers()
+
+        for commodity in self.commodities:
+            for source, arcs in self.paths[commodity.key]:
+                self.path_variables[commodity.key].append(self.add_path_variable(commodity, source, arcs))
+
+    def build_variables(self):
+        if self.inputinstance.demandset:
+            self.variables["flow_super"] = dict()
+            for h in self.inputinstance.demandset:
+                self.build_variable_flow_super(h)
+        self.build_variable_ip_capacity()
+
+        self.logger.debug("Model has {} variables".format(self.model_impl.NumVariables()))
+
+    def build_constraints(self):
+        self.build_constraint_ip_link_capacity()
+        self.build_constraint_degree_limit()
+        if self.inputinstance.demandset:
+            self.build_constraint_peering_capacity_super()
+        self.build_constraint_path_flows()
+        self.build_constraint_fiber_capacity()
+        self.build_constraint_max_ip_utilization()
+
+        self.logger.debug("Model has {} constraints".format(self.model_impl.NumConstraints()))
+
+    @instrumented
+    def build_constraint_ip_link_capacity(self):
+        """
+        Capacity rows of the IP arcs. The load coefficients are added by the path variables.
+        """
+        self.constraints["ip_capacity"] = dict()
+        lp_capacity = self.inputinstance.topology.parameter[constants.KEY_IP_LIGHTPATH_CAPACITY]
+        for e, f in itertools.filterfalse(
+                lambda x: x[0] == x[1],
+                itertools.product(self.inputinstance.topology.ip_nodes, repeat=2)
+        ):
+            row = self.model_impl.Constraint(-self.model_impl.infinity(), 0, 'ip_capacity_{}_{}'.format(e, f))
+            for var in self.variables['ip_capacity'].select(e, f, '*'):
+                row.SetCoefficient(var, -lp_capacity)
+            self.constraints["ip_capacity"][e, f] = row
+
+        self.build_constraint_ip_link_bidirectional()
+
+    @instrumented
+    def build_constraint_max_ip_utilization(self):
+        if constants.KEY_IP_LINK_UTILIZATION not in self.inputinstance.topology.parameter:
+            self.logger.info("No IP link utilization limit provided. Skipping this constraint.")
+            return
+        self.constraints["max_ip_link_util"] = dict()
+        capacity = self.inputinstance.topology.parameter[constants.KEY_IP_LINK_UTILIZATION] * \
+            self.inputinstance.topology.parameter[constants.KEY_IP_LIGHTPATH_CAPACITY]
+        for e, f in itertools.filterfalse(
+                lambda x: x[0] == x[1],
+                itertools.product(self.inputinstance.topology.ip_nodes, repeat=2)
+        ):
+            row = self.model_impl.Constraint(-self.model_impl.infinity(), 0, "max_ip_link_util_{}_{}".format(e, f))
+            for var in self.variables['ip_capacity'].select(e, f, '*'):
+                row.SetCoefficient(var, -capacity)
+            self.constraints["max_ip_link_util"][e, f] = row
+
+    @instrumented
+    def build_constraint_path_flows(self):
+        """
+        Every commodity is routed completely. The CDN paths from an IP node carry the super-flow of each of its peering
+        nodes. Peering nodes at the IP node of the user node get no paths, hence, no super-flow.
+        """
+        self.constraints["path_flow"] = dict()
+        self.constraints["convexity"] = dict()
+        for hg in self.inputinstance.demandset or list():
+            for unode in hg.user_nodes:
+                row = self.model_impl.Constraint(1, 1, "ip_flow_conservation_super_{}_{}".format(hg.name, unode))
+                for pnode in hg.peering_nodes:
+                    super_var = self.variables["flow_super"][hg.name][unode, pnode]
+                    row.SetCoefficient(super_var, 1)
+                    path_row = self.model_impl.Constraint(0, 0, "path_flow_{}_{}_{}".format(hg.name, unode, pnode))
+                    path_row.SetCoefficient(super_var, -1)
+                    self.constraints["path_flow"][hg.name, unode, pnode] = path_row
+                self.constraints["convexity"][hg.name, unode] = row
+
+        for k in (self.inputinstance.background_demand or dict()).keys():
+            self.constraints["convexity"][k] = self.model_impl.Constraint(1, 1, "path_flow_e2e_{}".format(k))
+
+    def _path_rows(self, commodity, source):
+        if commodity.flow_type == "flow_cdn":
+            return [self.constraints["path_flow"][commodity.key[0], commodity.key[1], pnode] for pnode in source]
+        return [self.constraints["convexity"][commodity.key]]
+
+    def add_path_variable(self, commodity, source, arcs):
+        var = self.model_impl.Var(
+            lb=0,
+            ub=1,
+            integer=self.flow_variable_types[commodity.flow_type],
+            name="path_{}_{}".format(build_var_key(commodity.key), len(self.path_variables[commodity.key]))
+        )
+        for row in self._path_rows(commodity, source):
+            row.SetCoefficient(var, 1)
+        for arc in arcs:
+            for family in ["ip_capacity", "max_ip_link_util"]:
+                if family in self.constraints:
+                    self.constraints[family][arc].SetCoefficient(var, commodity.volume)
+        return var
+
+    def add_path(self, commodity, source, arcs):
+        """
+        Adds a path column to the current master problem.
+        :return: (bool) False if the path was already generated
+        """
+        if (commodity.key, source, arcs) in self._known_paths:
+            return False
+        self._known_paths.add((commodity.key, source, arcs))
+        self.paths[commodity.key].append((source, arcs))
+        self.path_variables[commodity.key].append(self.add_path_variable(commodity, source, arcs))
+        return True
+
+    def add_initial_columns(self):
+        """
+        Adds the direct IP arc from every source (an empty path if a background demand starts at its sink).
+        """
+        for commodity in self.commodities:
+            for source, ip_node in commodity.sources:
+                if ip_node == commodity.sink:
+                    self.add_path(commodity, source, tuple())
+                elif len(self.variables['ip_capacity'].select(ip_node, commodity.sink, '*')) > 0:
+                    self.add_path(commodity, source, ((ip_node, commodity.sink),))
+
+    def generate_columns(self):
+        """
+        Solves the restricted master LP and adds paths with negative reduced cost until there are none.
+        """
+        num_iterations = 0
+        is_feasible = True
+        while True:
+            num_iterations += 1
+            status = self.model_impl.Solve()
+            if status == pywraplp.Solver.INFEASIBLE:
+                # Rows without artificials (e.g., the objective lower bound) cannot be met, the instance is infeasible
+                is_feasible = False
+                break
+            if status != pywraplp.Solver.OPTIMAL:
+                raise RuntimeError("Restricted master LP could not be solved. Status is {}".format(status))
+            if num_iterations > self.max_iterations:
+                self.logger.warning("Stopped column generation after {} iterations".format(self.max_iterations))
+                break
+            num_new = self.price()
+            self.logger.debug("Iteration {}: objective {}, {} new columns".format(
+                num_iterations, self.model_impl.Objective().Value(), num_new))
+            if num_new == 0:
+                break
+
+        if not is_feasible or any(var.solution_value() > self.tolerance for var in self.artificials):
+            # The objective contains the cost of the artificials, it is no bound
+            self.logger.warning("LP relaxation is infeasible.")
+            self.cg_stats["lp_bound"] = None
+        else:
+            self.cg_stats["lp_bound"] = self.model_impl.Objective().Value()
+        self.cg_stats["cg_iterations"] = num_iterations
+        self.logger.info("Column generation finished after {} iterations with {} columns. LP bound is {}".format(
+            num_iterations, sum(len(paths) for paths in self.paths.values()), self.cg_stats["lp_bound"]))
+
+    def add_transit_columns(self):
+        """
+        Adds the two-hop paths over the intermediate IP nodes with the smallest optical detour for every source of
+        every commodity.
+        """
+        if self.num_transit_columns == 0:
+            return
+        topology = self.inputinstance.topology
+        lengths = dict(nx.all_pairs_dijkstra_path_length(topology.graph, weight='weight'))
+        distances = np.array(
+            [[lengths.get(e.lower_layer.id, dict()).get(f.lower_layer.id, np.inf) for f in topology.ip_nodes]
+             for e in topology.ip_nodes],
+            dtype=float
+        ).reshape((len(topology.ip_nodes), len(topology.ip_nodes)))
+        has_path = np.array([[e == f or len(self.variables['ip_capacity'].select(e, f, '*')) > 0
+                              for f in topology.ip_nodes] for e in topology.ip_nodes])
+
+        num_new = 0
+        for commodity in self.commodities:
+            t = self._ip_node_index[commodity.sink]
+            for source, ip_node in commodity.sources:
+                s = self._ip_node_index[ip_node]
+                if s == t:
+                    continue
+                detour = distances[s, :] + distances[:, t]
+                detour[~(has_path[s, :] & has_path[:, t])] = np.inf
+                detour[[s, t] + list(commodity.no_transit)] = np.inf
+                for v in np.argsort(detour, kind="stable")[:self.num_transit_columns].tolist():
+                    if not np.isfinite(detour[v]):
+                        break
+                    arcs = ((ip_node, topology.ip_nodes[v]), (topology.ip_nodes[v], commodity.sink))
+                    if self.add_path(commodity, source, arcs):
+                        num_new += 1
+        self.logger.info("Added {} two-hop paths".format(num_new))
+
+    def get_arc_weights(self):
+        """
+        Returns the pricing weights of the IP arcs (negative duals of the capacity and utilization rows). Arcs without
+        optical path get an infinite weight.
+        """
+        ip_nodes = self.inputinstance.topology.ip_nodes
+        weights = np.full((len(ip_nodes), len(ip_nodes)), np.inf)
+        for (e, f), row in self.constraints["ip_capacity"].items():
+            if len(self.variables['ip_capacity'].select(e, f, '*')) == 0:
+                continue
+            dual = row.dual_value()
+            if "max_ip_link_util" in self.constraints:
+                dual += self.constraints["max_ip_link_util"][e, f].dual_value()
+            weights[self._ip_node_index[e], self._ip_node_index[f]] = max(-dual, 0)
+        np.fill_diagonal(weights, 0)
+        return weights
+
+    @staticmethod
+    def get_shortest_paths(weights, no_transit):
+        """
+        All-pairs shortest paths (Floyd-Warshall) that only use the nodes not in no_transit as intermediate nodes.
+        :return: (tuple) of the distance matrix and the next hop matrix
+        """
+        num_nodes = len(weights)
+        dist = weights + ColumnGenerationProgram.HOP_COST
+        np.fill_diagonal(dist, 0)
+        next_hop = np.tile(np.arange(num_nodes), (num_nodes, 1))
+        for k in range(num_nodes):
+            if k in no_transit:
+                continue
+            alternative = dist[:, k, np.newaxis] + dist[np.newaxis, k, :]
+            better = alternative < dist
+            dist = np.where(better, alternative, dist)
+            next_hop = np.where(better, next_hop[:, k, np.newaxis], next_hop)
+        return dist, next_hop
+
+    def price(self):
+        """
+        Adds the shortest path from every source of every commodity if its reduced cost is negative.
+        :return: number of added columns
+        """
+        ip_nodes = self.inputinstance.topology.ip_nodes
+        weights = self.get_arc_weights()
+        shortest_paths = dict()
+        num_new = 0
+        for commodity in self.commodities:
+            if commodity.no_transit not in shortest_paths:
+                shortest_paths[commodity.no_transit] = self.get_shortest_paths(weights, commodity.no_transit)
+            dist, next_hop = shortest_paths[commodity.no_transit]
+            t = self._ip_node_index[commodity.sink]
+            for source, ip_node in commodity.sources:
+                s = self._ip_node_index[ip_node]
+                if s == t or not np.isfinite(dist[s, t]):
+                    continue
+                path = [s]
+                while path[-1] != t:
+                    path.append(int(next_hop[path[-1], t]))
+                length = sum(weights[m, n] for m, n in zip(path[:-1], path[1:]))
+                reduced_cost = commodity.volume * length - sum(
+                    row.dual_value() for row in self._path_rows(commodity, source))
+                if reduced_cost >= -self.tolerance:
+                    continue
+                arcs = tuple((ip_nodes[m], ip_nodes[n]) for m, n in zip(path[:-1], path[1:]))
+                if self.add_path(commodity, source, arcs):
+                    num_new += 1
+        return num_new
+
+    def _path_flows(self, commodity):
+        """
+        Returns the solution value of every IP arc used by the commodity.
+        """
+        flows = collections.defaultdict(float)
+        for (source, arcs), var in zip(self.paths[commodity.key], self.path_variables[commodity.key]):
+            if var.solution_value() > 0:
+                for arc in arcs:
+                    flows[arc] += var.solution_value()
+        return flows
+
+    def _extract_cdn_assignment(self):
+        assignments = list()
+        if self.inputinstance.demandset is None:
+            return assignments
+        commodities = {c.key: c for c in self.commodities}
+        for hg in self.inputinstance.demandset:
+            unodes_assign = list()
+            for unode in hg.user_nodes:
+                peering_nodes = dict()
+                for pnode in hg.peering_nodes:
+                    var = self.variables["flow_super"][hg.name][unode, pnode]
+                    if var.solution_value() > 0:
+                        peering_nodes[pnode] = var.solution_value()
+                allocations = [
+                    model.demand.Allocation(e, f, value)
+                    for (e, f), value in self._path_flows(commodities[hg.name, unode]).items()
+                ]
+                unodes_assign.append(
+                    model.demand.UserNodeAssignment(unode, peering_nodes, allocations)
+                )
+            assignments.append(
+                model.demand.HypergiantAssignment(
+                    hg.name, unodes_assign
+                )
+            )
+        return assignments
+
+    def _extract_e2e_routing(self):
+        routes = list()
+        if self.inputinstance.background_demand is None:
+            return routes
+        commodities = {c.key: c for c in self.commodities}
+        for k, dem in self.inputinstance.background_demand.items():
+            routed_dem = model.demand.RoutedEndToEndDemand(dem.node1, dem.node2)
+            for (e, f), value in self._path_flows(commodities[k]).items():
+                routed_dem.add_path((e.id, f.id), value * dem.volume)
+            routes.append(routed_dem)
+        return routes
+
+    def get_solution(self):
+        sol = super(ColumnGenerationProgram, self).get_solution()
+        for k, v in self.cg_stats.items():
+            sol.add_metric_value(k, v)
+        return sol
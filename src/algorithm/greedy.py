@@ -1,4 +1,3 @@
-import collections
 import logging
 
 import numpy as np
@@ -29,36 +28,39 @@ class GreedyCDNAssignmentAlgorithm(AbstractAlgorithm):
         self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
         self.inputinstance = inputinstance
         self.mip_config = mip_config
+        # Threads of the MIP instead of the ones of mip_config (see set_num_threads())
+        self.num_threads = None
 
         self.solution = None
 
+    def set_num_threads(self, num_threads):
+        self.num_threads = num_threads
+
     def run(self):
+        topology = self.inputinstance.topology
         assignment = dict()
         for hg in self.inputinstance.demandset:
             assignment[hg.name] = dict()
-            allocation_per_peering_node = collections.defaultdict(float)
-            for unode in sorted(hg.user_nodes, key=lambda x: x.demand_volume,
-                                reverse=True):  # Sort unodes by their demand volume
-                min_plength = np.inf
-                min_pnode = None
-                for pnode in hg.peering_nodes:
-                    if (unode.demand_volume + allocation_per_peering_node[pnode] > pnode.capacity) or (
-                            self.inputinstance.topology.get_required_num_trunks(
-                                unode.demand_volume + allocation_per_peering_node[pnode]
-                            ) > pnode.lower_layer.num_transceiver // 2
-                    ):
-                        # Not enough capacity available at peering node
-                        continue
-
-                    # Choose closest pnode according to optical topo
-                    path_length = self.inputinstance.topology.get_path_length_between_ip_nodes(
-                        unode.lower_layer, pnode.lower_layer
-                    )
-                    if path_length < min_plength:
-                        min_pnode = pnode
-                        min_plength = path_length
-                allocation_per_peering_node[min_pnode] += unode.demand_volume
-                assignment[hg.name][unode.id] = [(min_pnode.id, 1)]
+            # Sort unodes by their demand volume
+            unodes = sorted(hg.user_nodes, key=lambda x: x.demand_volume, reverse=True)
+            distances = topology.get_distances_between_ip_nodes(
+                [unode.lower_layer for unode in unodes], [pnode.lower_layer for pnode in hg.peering_nodes]
+            )
+            capacity = np.array([pnode.capacity for pnode in hg.peering_nodes], dtype=float)
+            max_num_trunks = np.array([pnode.lower_layer.num_transceiver // 2 for pnode in hg.peering_nodes])
+            allocation = np.zeros(len(hg.peering_nodes))
+            for i, unode in enumerate(unodes):
+                new_allocation = allocation + unode.demand_volume
+                # Peering nodes with enough capacity available
+                feasible = (new_allocation <= capacity) & \
+                    (topology.get_required_num_trunks(new_allocation) <= max_num_trunks)
+                # Choose closest pnode according to optical topo
+                path_length = np.where(feasible, distances[i], np.inf)
+                p = int(np.argmin(path_length)) if len(path_length) > 0 else None
+                if p is None or not np.isfinite(path_length[p]):
+                    raise RuntimeError("No peering node of {} available for {}".format(hg.name, unode.id))
+                allocation[p] += unode.demand_volume
+                assignment[hg.name][unode.id] = [(hg.peering_nodes[p].id, 1)]
         self.logger.info(assignment)
         if self.inputinstance.fixed_layers is not None:
             if constants.KEY_CDN_ASSIGNMENT_LAYER not in self.inputinstance.fixed_layers:
@@ -72,6 +74,8 @@ class GreedyCDNAssignmentAlgorithm(AbstractAlgorithm):
                 constants.KEY_CDN_ASSIGNMENT_LAYER: assignment
             }
         mymip = self.mip_config.produce(self.inputinstance)
+        if self.num_threads is not None:
+            mymip.set_num_threads(self.num_threads)
         mymip.run()
 
         self.solution = mymip.get_solution()
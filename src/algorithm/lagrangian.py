@@ -0,0 +1,496 @@
+import logging
+import multiprocessing
+import time
+
+import numpy as np
+from ortools.linear_solver import pywraplp
+
+import constants
+import model.demand
+import model.input
+import model.topology
+from algorithm.abstract import AbstractAlgorithm, AbstractAlgorithmConfiguration
+from algorithm.mip import AbstractMixedIntegerProgram
+from algorithm.mip_pathbased_lin import PathMixedIntegerProgram
+
+
+class LagrangianDecompositionConfiguration(AbstractAlgorithmConfiguration):
+    STEP_SUBGRADIENT = "subgradient"
+    STEP_DEFLECTED = "deflected"
+
+    def __init__(self, model_implementor, num_threads=1, num_workers=1, time_limit=None, max_iterations=50,
+                 step_rule=STEP_DEFLECTED, tolerance=1e-3, lp_initialization=True, fix_routes=True, pruning=None):
+        """
+
+        :param model_implementor: solver of the subproblems and of the final capacity MIP
+        :param num_threads: threads of the final capacity MIP. The subproblems are solved single-threaded
+        :param num_workers: number of processes that solve the subproblems. None for all cores, 1 to solve them in this
+            process. Scenarios that run in a worker of a process pool (e.g., control.ParallelRunner) can not start
+            processes and solve the subproblems in their process
+        :param time_limit: time limit of every subproblem and of the final capacity MIP
+        :param max_iterations: maximum number of multiplier updates
+        :param step_rule: STEP_SUBGRADIENT moves along the subgradient, STEP_DEFLECTED along the subgradient deflected
+            by the previous direction (which stabilizes the multipliers like a bundle method, without a QP)
+        :param tolerance: stops if the relative gap between the estimated plan and the Lagrangian bound is below
+        :param lp_initialization: start with the duals of the coupling rows in the LP relaxation instead of zero
+        :param fix_routes: fix the routes of the subproblems in the capacity MIP. Otherwise, only their CDN assignment
+            is fixed and the MIP routes the flows, which gives better plans but is much slower
+        :param pruning: (algorithm.pruning.FlowVariablePruning) pruning of the flow variables
+        """
+        if step_rule not in [LagrangianDecompositionConfiguration.STEP_SUBGRADIENT,
+                             LagrangianDecompositionConfiguration.STEP_DEFLECTED]:
+            raise ValueError("Unknown step rule: {}".format(step_rule))
+        self.model_implementor = model_implementor
+        self.num_threads = num_threads
+        self.num_workers = num_workers
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.step_rule = step_rule
+        self.tolerance = tolerance
+        self.lp_initialization = lp_initialization
+        self.fix_routes = fix_routes
+        self.pruning = pruning
+
+    def to_dict(self):
+        out = {
+            'name': self.__class__.__name__,
+            'model_implementor': self.model_implementor,
+            'num_threads': self.num_threads,
+            'time_limit': self.time_limit,
+            'max_iterations': self.max_iterations,
+            'step_rule': self.step_rule,
+            'tolerance': self.tolerance,
+            'lp_initialization': self.lp_initialization,
+            'fix_routes': self.fix_routes
+        }
+        if self.pruning is not None:
+            out['pruning'] = self.pruning.to_dict()
+        return out
+
+    def produce(self, inputinstance):
+        return LagrangianDecompositionAlgorithm(
+            inputinstance=inputinstance,
+            model_implementor=self.model_implementor,
+            num_threads=self.num_threads,
+            num_workers=self.num_workers,
+            time_limit=self.time_limit,
+            max_iterations=self.max_iterations,
+            step_rule=self.step_rule,
+            tolerance=self.tolerance,
+            lp_initialization=self.lp_initialization,
+            fix_routes=self.fix_routes,
+            pruning=self.pruning
+        )
+
+
+class LagrangianSubproblem(PathMixedIntegerProgram):
+    """
+    Part of PathMixedIntegerProgram without the rows that couple the flows and the trunks (IP link capacity and
+    maximum IP link utilization). These rows are moved to the objective with multipliers:
+      - KIND_FLOWS: flow variables of the hypergiants and the background demand of the input instance with flow
+        conservation, peering capacity and the fixed CDN layer. The cost of an IP arc is the sum of its multipliers.
+      - KIND_CAPACITY: trunk variables with degree, fiber capacity, bidirectional and fixed IP layer rows. The cost of
+        a trunk is 1 minus the trunk capacity weighted with its multipliers.
+    """
+    KIND_FLOWS = "flows"
+    KIND_CAPACITY = "capacity"
+
+    def __init__(self, inputinstance, kind, model_implementor=AbstractMixedIntegerProgram.MODEL_IMPLEMENTOR_CBC,
+                 time_limit=None, pruning=None):
+        super(LagrangianSubproblem, self).__init__(inputinstance, model_implementor, num_threads=1,
+                                                   time_limit=time_limit, pruning=pruning)
+        self.kind = kind
+        self._ip_node_index = {n: i for i, n in enumerate(self.inputinstance.topology.ip_nodes)}
+
+    def build_variables(self):
+        if self.kind == LagrangianSubproblem.KIND_FLOWS:
+            self.build_arc_masks()
+            if self.inputinstance.demandset:
+                self.build_variable_flow_cdn()
+            if self.inputinstance.background_demand:
+                self.build_variable_flow_e2e()
+            self.count_pruned_variables()
+        else:
+            self.build_variable_ip_capacity()
+
+    def build_constraints(self):
+        if self.kind == LagrangianSubproblem.KIND_FLOWS:
+            if self.inputinstance.demandset:
+                self.build_constraint_peering_capacity_super()
+                self.build_constraint_flow_conservation_cdn()
+            if self.inputinstance.background_demand:
+                self.build_constraint_flow_conservation_e2e()
+        else:
+            self.build_constraint_ip_link_bidirectional()
+            self.build_constraint_degree_limit()
+            self.build_constraint_fiber_capacity()
+
+    def build_objective(self):
+        self.model_impl.Objective().SetMinimization()
+        if self.kind == LagrangianSubproblem.KIND_CAPACITY and self.inputinstance.demandset:
+            self.constraints["objective_lb"] = self.model_impl.Add(
+                self.model_impl.Sum(self.variables["ip_capacity"].select()) >= self.get_objective_lower_bound() * 2
+            )
+
+    def fix_layers(self):
+        if self.kind == LagrangianSubproblem.KIND_FLOWS:
+            self.fix_cdn_layer()
+        else:
+            self.fix_ip_links()
+            self.fix_full_ip_links()
+            self.fix_ip_connectivity()
+            self.limit_reconf_ip_links()
+            self.limit_reconf_ip_links_w_opt()
+
+    def get_flow_variables(self):
+        """
+        :return: (list) of (flow variable, tail index, head index, volume)
+        """
+        flow_vars = list()
+        for hg in self.inputinstance.demandset or list():
+            for (unode, e, f), var in self.variables["flow_cdn"][hg.name].items():
+                flow_vars.append((var, self._ip_node_index[e], self._ip_node_index[f], unode.demand_volume))
+        if self.inputinstance.background_demand:
+            volumes = {dem.key: dem.volume for dem in self.inputinstance.background_demand.values()}
+            for (k1, k2, e, f), var in self.variables["flow_e2e"].items():
+                flow_vars.append((var, self._ip_node_index[e], self._ip_node_index[f], volumes[k1, k2]))
+        return flow_vars
+
+    def set_multipliers(self, capacity_multipliers, utilization_multipliers, trunk_capacity, utilization):
+        """
+        Sets the objective for the multipliers of the IP link capacity and maximum utilization rows.
+        :param capacity_multipliers: (np.ndarray) |V|x|V| indexed like topology.ip_nodes
+        :param utilization_multipliers: (np.ndarray) |V|x|V|
+        :param trunk_capacity: capacity of a trunk
+        :param utilization: maximum utilization of an IP link
+        """
+        objective = self.model_impl.Objective()
+        if self.kind == LagrangianSubproblem.KIND_FLOWS:
+            weights = capacity_multipliers + utilization_multipliers
+            for var, e, f, volume in self.get_flow_variables():
+                objective.SetCoefficient(var, volume * weights[e, f])
+        else:
+            weights = 1 - trunk_capacity * capacity_multipliers - utilization * trunk_capacity * utilization_multipliers
+            for (e, f, _), var in self.variables["ip_capacity"].items():
+                objective.SetCoefficient(var, weights[self._ip_node_index[e], self._ip_node_index[f]])
+
+    def get_result(self):
+        """
+        :return: (dict) with the lower bound and the objective of the subproblem, the loads (KIND_FLOWS) or
+            trunks (KIND_CAPACITY) per IP arc as |V|x|V| matrix and the values of the used flow variables by
+            get_value_key()
+        """
+        num_nodes = len(self._ip_node_index)
+        if self.result_status not in [pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE]:
+            raise RuntimeError("Lagrangian subproblem could not be solved. Status is {}".format(self.result_status))
+        matrix = np.zeros((num_nodes, num_nodes))
+        values = dict()
+        if self.kind == LagrangianSubproblem.KIND_FLOWS:
+            for hg in self.inputinstance.demandset or list():
+                for (unode, e, f), value in self._get_nonzero_values(self.variables["flow_cdn"][hg.name]):
+                    if value > 0.5:
+                        matrix[self._ip_node_index[e], self._ip_node_index[f]] += unode.demand_volume
+                        values[get_value_key("flow_cdn", hg.name, (unode, e, f))] = value
+                for key, value in self._get_nonzero_values(self.variables["flow_super"][hg.name]):
+                    if value > 0.5:
+                        values[get_value_key("flow_super", hg.name, key)] = value
+            if self.inputinstance.background_demand:
+                volumes = {dem.key: dem.volume for dem in self.inputinstance.background_demand.values()}
+                for (k1, k2, e, f), value in self._get_nonzero_values(self.variables["flow_e2e"]):
+                    if value > 0.5:
+                        matrix[self._ip_node_index[e], self._ip_node_index[f]] += volumes[k1, k2]
+                        values[get_value_key("flow_e2e", None, (k1, k2, e, f))] = value
+        else:
+            for (e, f, _), value in self._get_nonzero_values(self.variables["ip_capacity"]):
+                matrix[self._ip_node_index[e], self._ip_node_index[f]] += value
+        return {
+            'bound': self.model_impl.Objective().BestBound(),
+            'objective': self.model_impl.Objective().Value(),
+            'matrix': matrix,
+            'values': values
+        }
+
+
+def get_value_key(family, hg_name, key):
+    """
+    :param family: name of the variable family, e.g., "flow_cdn"
+    :param hg_name: name of the hypergiant of the variable, None for background flows
+    :param key: key of the variable in its family
+    :return: (tuple) key of the variable in the results of the subproblems. Nodes are replaced with their ids, so
+        that the key is the same in every process and model
+    """
+    ids = tuple(k.id if isinstance(k, model.topology.Node) else k for k in key)
+    return family, ids if hg_name is None else (hg_name,) + ids
+
+
+# Subproblems of the worker process by name. Built when first needed, the objective is updated afterwards
+_worker_state = dict()
+
+
+def _init_worker(inputinstance, model_implementor, time_limit, pruning):
+    _worker_state.clear()
+    _worker_state['inputinstance'] = inputinstance
+    _worker_state['model_implementor'] = model_implementor
+    _worker_state['time_limit'] = time_limit
+    _worker_state['pruning'] = pruning
+    _worker_state['subproblems'] = dict()
+
+
+def _get_subproblem(name):
+    subproblem = _worker_state['subproblems'].get(name)
+    if subproblem is None:
+        inputinstance = _worker_state['inputinstance']
+        kind, hg_name = name
+        if kind == LagrangianSubproblem.KIND_CAPACITY:
+            sub_instance = inputinstance
+        elif hg_name is None:
+            sub_instance = model.input.InputInstance(
+                inputinstance.topology, model.demand.DemandSet(), inputinstance.fixed_layers,
+                inputinstance.background_demand
+            )
+        else:
+            sub_instance = model.input.InputInstance(
+                inputinstance.topology, model.demand.DemandSet([inputinstance.demandset.get_hypergiant(hg_name)]),
+                inputinstance.fixed_layers
+            )
+        subproblem = LagrangianSubproblem(
+            sub_instance, kind, _worker_state['model_implementor'], time_limit=_worker_state['time_limit'],
+            pruning=_worker_state['pruning']
+        )
+        subproblem.build()
+        _worker_state['subproblems'][name] = subproblem
+    return subproblem
+
+
+def _solve_subproblem(args):
+    name, capacity_multipliers, utilization_multipliers, trunk_capacity, utilization = args
+    subproblem = _get_subproblem(name)
+    subproblem.set_multipliers(capacity_multipliers, utilization_multipliers, trunk_capacity, utilization)
+    subproblem.solve()
+    return name, subproblem.get_result()
+
+
+class LagrangianDecompositionAlgorithm(AbstractAlgorithm):
+    """
+    Lagrangian decomposition of PathMixedIntegerProgram. The IP link capacity and maximum utilization rows are the
+    only rows that couple the hypergiants. They are relaxed with multipliers, which decomposes the model into one
+    flow subproblem per hypergiant, one for the background demand and one for the trunks. The subproblems are solved
+    in a process pool, the multipliers are updated with Polyak steps towards the estimated number of trunks of the
+    current flows. Finally, the flows with the fewest estimated trunks are fixed and the trunks are determined by the
+    MIP (capacity MIP). If these routes do not fit or without fix_routes, only their CDN assignment stays fixed.
+    """
+    LP_IMPLEMENTOR = pywraplp.Solver.GLOP_LINEAR_PROGRAMMING
+    # Weight of the previous direction for STEP_DEFLECTED
+    DEFLECTION = 0.5
+    # Step size factor of the Polyak step. Halved if the bound did not improve for PATIENCE iterations
+    INITIAL_STEP_FACTOR = 2.0
+    MIN_STEP_FACTOR = 1e-3
+    PATIENCE = 3
+
+    def __init__(self, inputinstance, model_implementor=AbstractMixedIntegerProgram.MODEL_IMPLEMENTOR_CBC,
+                 num_threads=None, num_workers=1, time_limit=None, max_iterations=50,
+                 step_rule=LagrangianDecompositionConfiguration.STEP_DEFLECTED, tolerance=1e-3,
+                 lp_initialization=True, fix_routes=True, pruning=None):
+        self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
+        self.inputinstance = inputinstance
+        self.model_implementor = model_implementor
+        self.num_threads = num_threads
+        self.num_workers = num_workers if num_workers is not None else multiprocessing.cpu_count()
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.step_rule = step_rule
+        self.tolerance = tolerance
+        self.lp_initialization = lp_initialization
+        self.fix_routes = fix_routes
+        self.pruning = pruning
+
+        parameter = self.inputinstance.topology.parameter
+        self.trunk_capacity = parameter[constants.KEY_IP_LIGHTPATH_CAPACITY]
+        # Without a utilization limit, the utilization rows do not exist and their multipliers stay zero
+        self.has_utilization = constants.KEY_IP_LINK_UTILIZATION in parameter
+        self.utilization = parameter.get(constants.KEY_IP_LINK_UTILIZATION, 1)
+
+        self.solution = None
+        self.stats = dict()
+
+    def set_num_threads(self, num_threads):
+        """
+        Threads of the final capacity MIP. The processes that solve the subproblems are capped to the same number.
+        """
+        self.num_threads = num_threads
+        self.num_workers = min(self.num_workers, num_threads)
+
+    def get_subproblem_names(self):
+        names = [(LagrangianSubproblem.KIND_FLOWS, hg.name) for hg in self.inputinstance.demandset or list()]
+        if self.inputinstance.background_demand:
+            names.append((LagrangianSubproblem.KIND_FLOWS, None))
+        names.append((LagrangianSubproblem.KIND_CAPACITY, None))
+        return names
+
+    def get_initial_multipliers(self):
+        """
+        :return: (tuple) of the capacity and utilization multipliers, the negated duals of the LP relaxation if
+            lp_initialization is set, zero otherwise
+        """
+        ip_nodes = self.inputinstance.topology.ip_nodes
+        capacity_multipliers = np.zeros((len(ip_nodes), len(ip_nodes)))
+        utilization_multipliers = np.zeros((len(ip_nodes), len(ip_nodes)))
+        if not self.lp_initialization:
+            return capacity_multipliers, utilization_multipliers
+
+        lp = PathMixedIntegerProgram(
+            self.inputinstance, model_implementor=self.LP_IMPLEMENTOR, relaxed=True, pruning=self.pruning
+        )
+        lp.run()
+        if lp.result_status != pywraplp.Solver.OPTIMAL:
+            self.logger.warning("LP relaxation could not be solved. Starting with zero multipliers.")
+            return capacity_multipliers, utilization_multipliers
+        self.stats["lp_bound"] = lp.model_impl.Objective().Value()
+        ip_node_index = {n: i for i, n in enumerate(ip_nodes)}
+        for multipliers, rows in [(capacity_multipliers, lp.constraints["ip_capacity"]),
+                                  (utilization_multipliers, lp.constraints.get("max_ip_link_util", dict()))]:
+            for (e, f), row in rows.items():
+                multipliers[ip_node_index[e], ip_node_index[f]] = max(0.0, -row.dual_value())
+        return capacity_multipliers, utilization_multipliers
+
+    def estimate_num_trunks(self, loads):
+        """
+        Number of trunks the flows need if the fibers have enough capacity.
+        """
+        load = np.maximum(loads, loads.T)
+        return 2 * np.ceil(np.triu(load, 1) / (self.trunk_capacity * min(1, self.utilization)) - 1e-9).sum()
+
+    def run(self):
+        t_start = time.perf_counter()
+        names = self.get_subproblem_names()
+        capacity_multipliers, utilization_multipliers = self.get_initial_multipliers()
+
+        init_args = (self.inputinstance, self.model_implementor, self.time_limit, self.pruning)
+        num_workers = min(self.num_workers, len(names))
+        if num_workers > 1 and multiprocessing.current_process().daemon:
+            # Workers of a process pool (e.g., control.ParallelRunner) can not have child processes
+            self.logger.warning("Solving the subproblems in this process since it is a worker of a process pool")
+            num_workers = 1
+        pool = None
+        if num_workers > 1:
+            pool = multiprocessing.Pool(num_workers, initializer=_init_worker, initargs=init_args)
+        else:
+            _init_worker(*init_args)
+
+        best_bound = -np.inf
+        best_estimate = np.inf
+        best_values = None
+        step_factor = LagrangianDecompositionAlgorithm.INITIAL_STEP_FACTOR
+        num_not_improved = 0
+        direction = None
+        iteration = 0
+        try:
+            for iteration in range(1, self.max_iterations + 1):
+                tasks = [
+                    (name, capacity_multipliers, utilization_multipliers, self.trunk_capacity, self.utilization)
+                    for name in names
+                ]
+                results = dict(pool.map(_solve_subproblem, tasks) if pool is not None else
+                               map(_solve_subproblem, tasks))
+
+                bound = sum(r['bound'] for r in results.values())
+                loads = sum(r['matrix'] for (kind, _), r in results.items() if kind == LagrangianSubproblem.KIND_FLOWS)
+                trunks = results[LagrangianSubproblem.KIND_CAPACITY, None]['matrix']
+                estimate = self.estimate_num_trunks(loads)
+                if estimate < best_estimate:
+                    best_estimate = estimate
+                    best_values = dict()
+                    for (kind, _), r in results.items():
+                        best_values.update(r['values'])
+                if bound > best_bound + 1e-9:
+                    best_bound = bound
+                    num_not_improved = 0
+                else:
+                    num_not_improved += 1
+                    if num_not_improved >= LagrangianDecompositionAlgorithm.PATIENCE:
+                        step_factor /= 2
+                        num_not_improved = 0
+                self.logger.info("Iteration {}: bound {}, estimated plan {}".format(iteration, bound, best_estimate))
+
+                if best_estimate - best_bound <= self.tolerance * best_estimate or \
+                        step_factor < LagrangianDecompositionAlgorithm.MIN_STEP_FACTOR:
+                    break
+
+                # Subgradients of the relaxed rows load <= capacity * trunks
+                subgradient = np.concatenate([
+                    loads - self.trunk_capacity * trunks,
+                    (loads - self.utilization * self.trunk_capacity * trunks) * self.has_utilization
+                ])
+                np.fill_diagonal(subgradient[:len(loads)], 0)
+                np.fill_diagonal(subgradient[len(loads):], 0)
+                if direction is None or self.step_rule == LagrangianDecompositionConfiguration.STEP_SUBGRADIENT:
+                    direction = subgradient
+                else:
+                    direction = subgradient + LagrangianDecompositionAlgorithm.DEFLECTION * direction
+                norm = (direction ** 2).sum()
+                if norm == 0:
+                    break
+                target = max(best_estimate, bound + 1e-3 * max(1.0, abs(bound)))
+                step = step_factor * (target - bound) / norm
+                capacity_multipliers = np.maximum(0, capacity_multipliers + step * direction[:len(loads)])
+                utilization_multipliers = np.maximum(0, utilization_multipliers + step * direction[len(loads):])
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            else:
+                _worker_state.clear()
+
+        self.stats["lagrangian_bound"] = best_bound
+        self.stats["lagrangian_iterations"] = iteration
+        mip = self.solve_capacity_mip(best_values)
+        self.solution = mip.get_solution()
+        if mip.result_status in [pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE]:
+            objective = mip.model_impl.Objective().Value()
+            self.stats["lagrangian_gap"] = max(0.0, float((objective - best_bound) / objective)) if objective > 0 \
+                else 0.0
+        self.stats["lagrangian_time"] = time.perf_counter() - t_start
+        for k, v in self.stats.items():
+            self.solution.add_metric_value(k, v)
+
+    def solve_capacity_mip(self, flow_values):
+        """
+        Fixes the CDN assignment (and the routes if fix_routes is set) to the given values and solves the MIP for the
+        remaining variables. If the routes do not fit, only the CDN assignment stays fixed.
+        :param flow_values: (dict) of get_value_key() -> value of the used flow variables
+        :return: (PathMixedIntegerProgram) solved MIP
+        """
+        mip = PathMixedIntegerProgram(
+            self.inputinstance, model_implementor=self.model_implementor, num_threads=self.num_threads,
+            time_limit=self.time_limit, pruning=self.pruning
+        )
+        mip.build()
+        # Pairs of route variable and its key in flow_values
+        route_vars = list()
+        for hg in self.inputinstance.demandset or list():
+            for key, var in mip.variables["flow_super"][hg.name].items():
+                value = flow_values.get(get_value_key("flow_super", hg.name, key), 0)
+                var.SetBounds(value, value)
+            route_vars += [(var, get_value_key("flow_cdn", hg.name, key))
+                           for key, var in mip.variables["flow_cdn"][hg.name].items()]
+        if self.inputinstance.background_demand:
+            route_vars += [(var, get_value_key("flow_e2e", None, key)) for key, var in mip.variables["flow_e2e"].items()]
+
+        self.stats["lagrangian_routes_fixed"] = self.fix_routes
+        if self.fix_routes:
+            bounds = [(var.lb(), var.ub()) for var, _ in route_vars]
+            for var, key in route_vars:
+                value = flow_values.get(key, 0)
+                var.SetBounds(value, value)
+            mip.solve()
+            if mip.result_status in [pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE]:
+                return mip
+            self.logger.info("Routes of the subproblems do not fit. Solving with the CDN assignment fixed.")
+            self.stats["lagrangian_routes_fixed"] = False
+            for (var, _), (lb, ub) in zip(route_vars, bounds):
+                var.SetBounds(lb, ub)
+        mip.solve()
+        return mip
+
+    def get_solution(self):
+        return self.solution
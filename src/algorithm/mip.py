@@ -1,8 +1,11 @@
 import logging
-import gurobipy as grb
-from ortools.linear_solver import pywraplp
+import time
+
+import numpy as np
+from ortools.linear_solver import linear_solver_pb2, pywraplp
 
 from algorithm.abstract import AbstractAlgorithm
+import instrumentation
 import model.solution
 import model.metrics
 
@@ -11,7 +14,59 @@ def build_var_key(args):
     return str(args).replace(" ", "")
 
 
-def add_variables_from_iterator(model_impl, is_integer, iterator, lb, ub, name):
+class IndexedVariableDict(dict):
+    """
+    Dict of variables with tuple keys. Offers select() like gurobipy's tupledict but does not scan all keys on every
+    call. Instead, an index is built once for every combination of fixed key positions that is queried
+    (e.g., by user node, by tail IP node, by head IP node or by (tail, head)). Subsequent selects with the same
+    combination only cost O(result).
+    """
+    WILDCARD = '*'
+
+    def __init__(self, *args, **kwargs):
+        super(IndexedVariableDict, self).__init__(*args, **kwargs)
+        self._indexes = dict()
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            for positions, index in self._indexes.items():
+                index.setdefault(tuple(key[i] for i in positions), list()).append(key)
+        super(IndexedVariableDict, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super(IndexedVariableDict, self).__delitem__(key)
+        self._indexes.clear()
+
+    def _get_index(self, positions):
+        index = self._indexes.get(positions)
+        if index is None:
+            index = dict()
+            for key in self.keys():
+                index.setdefault(tuple(key[i] for i in positions), list()).append(key)
+            self._indexes[positions] = index
+        return index
+
+    def select(self, *pattern):
+        """
+        Returns the variables whose keys match the pattern. '*' matches any value at this position, missing trailing
+        positions are treated as '*'. Order of the returned variables is the insertion order.
+        :param pattern:
+        :return: (list) of matching variables
+        """
+        positions = tuple(
+            i for i, p in enumerate(pattern) if not (isinstance(p, str) and p == IndexedVariableDict.WILDCARD)
+        )
+        if len(positions) == 0:
+            return list(self.values())
+        values = tuple(pattern[i] for i in positions)
+        if len(self) > 0 and len(positions) == len(next(iter(self.keys()))):
+            # Fully specified key
+            return [self[values]] if values in self else list()
+        return [self[k] for k in self._get_index(positions).get(values, ())]
+
+
+def add_variables_from_iterator(model_impl, is_integer, iterator, lb, ub, name, container=IndexedVariableDict,
+                                names=True):
     """
     Adds a variable for every element returned by iterator. name is extended by __repr__(element). Similar to gurobi.addVars()
     :param is_integer:
@@ -19,38 +74,118 @@ def add_variables_from_iterator(model_impl, is_integer, iterator, lb, ub, name):
     :param lb:
     :param ub:
     :param name:
-    :return: (tupledict) containing references to the new variables
+    :param container: type of the returned container, must provide select()
+    :param names: False to add the variables without names
+    :return: (IndexedVariableDict) containing references to the new variables
     """
-    new_vars = grb.tupledict()
+    new_vars = container()
 
     for varkey in iterator:
         new_vars[varkey] = model_impl.Var(
             lb=lb,
             ub=ub,
             integer=is_integer,
-            name="{}_{}".format(name, build_var_key(varkey))
+            name="{}_{}".format(name, build_var_key(varkey)) if names else ""
         )
     return new_vars
 
 
+def get_variable_indices(container):
+    """
+    Column indices of the variables in the container in iteration order. Variables of a container are usually added
+    in one block, so the indices are a range and do not have to be queried one by one.
+    :param container: dict of variables
+    :return: (np.ndarray)
+    """
+    variables = list(container.values())
+    if len(variables) == 0:
+        return np.zeros(0, dtype=np.int64)
+    first = variables[0].index()
+    if variables[-1].index() - first == len(variables) - 1:
+        return np.arange(first, first + len(variables))
+    return np.fromiter((var.index() for var in variables), dtype=np.int64, count=len(variables))
+
+
 class AbstractMixedIntegerProgram(AbstractAlgorithm):
     MODEL_IMPLEMENTOR_CBC = pywraplp.Solver.CBC_MIXED_INTEGER_PROGRAMMING
-#    MODEL_IMPLEMENTOR_SCIP = pywraplp.Solver.SCIP_MIXED_INTEGER_PROGRAMMING
+    MODEL_IMPLEMENTOR_SCIP = pywraplp.Solver.SCIP_MIXED_INTEGER_PROGRAMMING
 #    MODEL_IMPLEMENTOR_GLPK = pywraplp.Solver.GLPK_MIXED_INTEGER_PROGRAMMING
     MODEL_IMPLEMENTOR_CPLEX = pywraplp.Solver.CPLEX_MIXED_INTEGER_PROGRAMMING
 
-    def __init__(self, inputinstance, model_impl, num_threads=1, time_limit=None):
+    # Backends that solve the model as MIP. Other backends (e.g., GLOP for relaxations) have no branch-and-bound nodes
+    MIP_IMPLEMENTORS = {MODEL_IMPLEMENTOR_CBC, MODEL_IMPLEMENTOR_SCIP, MODEL_IMPLEMENTOR_CPLEX}
+
+    VARIABLE_CONTAINER = IndexedVariableDict
+
+    # Backends that use solution hints (SetHint() has no effect on the others, e.g., CBC and CPLEX)
+    HINT_IMPLEMENTORS = {MODEL_IMPLEMENTOR_SCIP}
+
+    # Parameters that stop the solver at the first integer solution
+    SOLUTION_LIMIT_PARAMETERS = {
+        pywraplp.Solver.SCIP_MIXED_INTEGER_PROGRAMMING: "limits/solutions = 1"
+    }
+    # Default file of infeasible models at DEBUG level (see get_solution())
+    INFEASIBLE_MODEL_FNAME = "debug_inf_model.lp"
+
+    def __init__(self, inputinstance, model_impl, num_threads=1, time_limit=None, warm_start=None,
+                 measure_first_incumbent=False, names=True):
+        """
+
+        :param inputinstance:
+        :param model_impl:
+        :param num_threads:
+        :param time_limit:
+        :param warm_start: (algorithm.warm_start.AbstractWarmStartProvider) provides a solution that is passed as hint
+            to the solver before solving. Only used by solvers in HINT_IMPLEMENTORS (SCIP, not CBC or CPLEX). Whether
+            the hint was passed to the solver is recorded as metric warm_start_applied.
+        :param measure_first_incumbent: Solve a copy of the model until the first integer solution before the actual
+            solve to record the time to the first incumbent. Only supported by solvers in SOLUTION_LIMIT_PARAMETERS,
+            time_to_first_incumbent_supported = False is recorded for the others
+        :param names: Name variables and constraints while building. If False, the model is built without names, which
+            saves the string formatting for every row and column. Names are only generated by write() in this case.
+        """
         self.inputinstance = inputinstance
         self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
         self.model_impl = pywraplp.Solver("linearized_model", model_impl)
         self.model_impl_type = model_impl
         self.num_threads = num_threads
         self.time_limit = time_limit
+        self.is_built = False
+        # Solver wall time (ms) at which the current model was built or last updated
+        self.wall_time_offset = 0
+
+        self.warm_start = warm_start
+        self.measure_first_incumbent = measure_first_incumbent
+        self.solve_stats = dict()
+        self.instrumentation = instrumentation.Instrumentation()
+        self.names = names
+        self._solution_values = None
+        # If set, get_solution() writes an infeasible model to this file. Otherwise, it is only written at DEBUG level
+        self.infeasible_model_fname = None
+
+    def set_num_threads(self, num_threads):
+        self.num_threads = num_threads
 
     def build(self):
-        self.build_variables()
-        self.build_constraints()
-        self.build_objective()
+        with self.instrumentation.timer("build"):
+            self.build_variables()
+            self.build_constraints()
+            self.build_objective()
+        self.is_built = True
+
+    def get_model_size(self):
+        """
+        :return: (tuple) number of variables and number of constraints of the model
+        """
+        return self.model_impl.NumVariables(), self.model_impl.NumConstraints()
+
+    def get_name(self, template, *args):
+        """
+        :return: the formatted name of a new variable or constraint or an empty string if names are disabled
+        """
+        if not self.names:
+            return ""
+        return template.format(*args)
 
     def build_variables(self):
         raise NotImplementedError
@@ -74,21 +209,118 @@ class AbstractMixedIntegerProgram(AbstractAlgorithm):
         if self.time_limit is not None:
             self.model_impl.SetTimeLimit(self.time_limit * 1000)
 
-        self.result_status = self.model_impl.Solve()
+        if self.measure_first_incumbent:
+            self.solve_until_first_incumbent()
+        with self.instrumentation.timer("solve"):
+            self.result_status = self.model_impl.Solve()
+        self._solution_values = None
         self.logger.info("Solver finished. Solution status is {}".format(self.result_status))
 
     def write(self, fname="debug.lp"):
-        with open(fname, "w") as fd:
-            if ".lp" in fname:
-                fd.write(self.model_impl.ExportModelAsLpFormat(False))
-            elif ".mps" in fname:
-                fd.write(self.model_impl.ExportModelAsMpsFormat(False, False))
+        if self.names:
+            with open(fname, "w") as fd:
+                if ".lp" in fname:
+                    fd.write(self.model_impl.ExportModelAsLpFormat(False))
+                elif ".mps" in fname:
+                    fd.write(self.model_impl.ExportModelAsMpsFormat(False, False))
+        else:
+            proto = linear_solver_pb2.MPModelProto()
+            self.model_impl.ExportModelToProto(proto)
+            self.set_names(proto)
+            with open(fname, "w") as fd:
+                if ".lp" in fname:
+                    fd.write(pywraplp.ExportModelAsLpFormat(proto, pywraplp.ModelExportOptions()))
+                elif ".mps" in fname:
+                    fd.write(pywraplp.ExportModelAsMpsFormat(proto, pywraplp.ModelExportOptions()))
         self.logger.info("Wrote model to {}".format(fname))
 
+    def set_names(self, proto):
+        """
+        Names the variables and constraints of a model built without names. Variables in the variables dict are named
+        by their family and key. Constraints in the constraints dict are named by their family and key, all other
+        constraints by the instrumented method that added them (see instrumentation.Instrumentation.family_starts) and
+        a running number. Remaining variables and constraints keep the generic names of the solver.
+        :param proto: (linear_solver_pb2.MPModelProto) exported model
+        """
+        starts = self.instrumentation.family_starts
+        counts = dict()
+        for i, (_, first_row, family) in enumerate(starts):
+            if family is None:
+                continue
+            last_row = starts[i + 1][1] if i + 1 < len(starts) else len(proto.constraint)
+            for row in range(first_row, last_row):
+                proto.constraint[row].name = "{}_{}".format(family, counts.get(family, 0))
+                counts[family] = counts.get(family, 0) + 1
+
+        def name_all(items, name, value):
+            if isinstance(value, dict):
+                for key, nested in value.items():
+                    name_all(items, "{}_{}".format(name, build_var_key(key)), nested)
+            else:
+                items[value.index()].name = name
+
+        for family, value in getattr(self, "variables", dict()).items():
+            name_all(proto.variable, family, value)
+        for family, value in getattr(self, "constraints", dict()).items():
+            name_all(proto.constraint, family, value)
+
+    def solve_until_first_incumbent(self):
+        """
+        Solves a copy of the model (including the hint) until the first integer solution is found and records the
+        solver wall time (ms) as time_to_first_incumbent.
+        """
+        if self.model_impl_type not in AbstractMixedIntegerProgram.SOLUTION_LIMIT_PARAMETERS:
+            self.logger.warning("Time to first incumbent can not be measured with solver {}".format(
+                self.model_impl_type))
+            self.solve_stats["time_to_first_incumbent_supported"] = False
+            return
+        self.solve_stats["time_to_first_incumbent_supported"] = True
+        proto = linear_solver_pb2.MPModelProto()
+        self.model_impl.ExportModelToProto(proto)
+        probe = pywraplp.Solver("first_incumbent", self.model_impl_type)
+        probe.LoadModelFromProto(proto)
+        if self.num_threads is not None:
+            probe.SetNumThreads(self.num_threads)
+        if self.time_limit is not None:
+            probe.SetTimeLimit(self.time_limit * 1000)
+        probe.SetSolverSpecificParametersAsString(
+            AbstractMixedIntegerProgram.SOLUTION_LIMIT_PARAMETERS[self.model_impl_type]
+        )
+        if probe.Solve() in [pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE]:
+            self.solve_stats["time_to_first_incumbent"] = probe.WallTime()
+
     def run(self):
-        self.build()
+        if not self.is_built:
+            self.build()
+        if self.warm_start is not None:
+            self.apply_warm_start()
         self.solve()
 
+    def apply_warm_start(self):
+        """
+        Gets a solution from the warm start provider and passes it as hint to the solver. Records in
+        warm_start_applied whether the solver got a hint it uses. The provider is not called for solvers that ignore
+        hints, since it can be as expensive as a solve.
+        """
+        self.solve_stats["warm_start_applied"] = False
+        if self.model_impl_type not in AbstractMixedIntegerProgram.HINT_IMPLEMENTORS:
+            self.logger.warning("Solver {} ignores warm start hints. Skipped the warm start provider".format(
+                self.model_impl_type))
+            return
+        t_start = time.perf_counter()
+        solution = self.warm_start.get_solution(self.inputinstance)
+        self.solve_stats["warm_start_time"] = time.perf_counter() - t_start
+        if solution is None:
+            self.logger.info("Warm start provider returned no solution")
+            return
+        self.solve_stats["warm_start_objective"] = sum(link["num_trunks"] for link in solution["ip_links"])
+        self.solve_stats["warm_start_hinted_variables"] = self.set_solution_hint(solution)
+        self.solve_stats["warm_start_applied"] = True
+        self.logger.info("Warm start with objective {}".format(self.solve_stats["warm_start_objective"]))
+
+    def set_solution_hint(self, solution):
+        raise NotImplementedError
+
     def _extract_ip_links(self):
         raise NotImplementedError
 
@@ -98,31 +330,80 @@ class AbstractMixedIntegerProgram(AbstractAlgorithm):
     def _extract_e2e_routing(self):
         raise NotImplementedError
 
+    def get_solution_values(self):
+        """
+        Fetches the values of all variables of the last solve at once instead of calling solution_value() per variable.
+        :return: (np.ndarray) values ordered by variable index
+        """
+        if self._solution_values is None:
+            response = linear_solver_pb2.MPSolutionResponse()
+            self.model_impl.FillSolutionResponseProto(response)
+            self._solution_values = np.array(response.variable_value, dtype=float)
+        return self._solution_values
+
+    def get_gap(self):
+        """
+        :return: relative gap between the objective and the best bound of the last solve
+        """
+        objective = self.model_impl.Objective().Value()
+        if objective == 0:
+            return 0.0
+        return abs(objective - self.model_impl.Objective().BestBound()) / abs(objective)
+
     def get_solution(self):
         if self.result_status in [pywraplp.Solver.INFEASIBLE, pywraplp.Solver.ABNORMAL]:
-            print("Problem instance is infeasible")
-            self.write("debug_inf_model.lp")
+            self.logger.warning("Problem instance is infeasible")
+            fname = self.infeasible_model_fname
+            if fname is None and self.logger.getEffectiveLevel() == logging.DEBUG:
+                fname = AbstractMixedIntegerProgram.INFEASIBLE_MODEL_FNAME
+            if fname is not None:
+                self.write(fname)
             sol = model.solution.SolutionInstance(list(), list(), list())
             sol.add_metric_value(
-                "solver_time", self.model_impl.WallTime()
+                "solver_time", self.model_impl.WallTime() - self.wall_time_offset
             )
+            for k, v in self.solve_stats.items():
+                sol.add_metric_value(k, v)
+            self.add_instrumentation_metrics(sol)
             return sol
         assert self.model_impl.VerifySolution(1e-6, True)
 
-        ip_links = self._extract_ip_links()
-        cdn_assignment = self._extract_cdn_assignment()
-        e2e_routing = self._extract_e2e_routing()
+        with self.instrumentation.timer("extract_ip_links"):
+            ip_links = self._extract_ip_links()
+        with self.instrumentation.timer("extract_cdn_assignment"):
+            cdn_assignment = self._extract_cdn_assignment()
+        with self.instrumentation.timer("extract_e2e_routing"):
+            e2e_routing = self._extract_e2e_routing()
         sol = model.solution.SolutionInstance(ip_links, cdn_assignment, e2e_routing)
 
         sol.add_metric_value(
             "objective", self.model_impl.Objective().Value()
         )
         sol.add_metric_value(
-            "solver_time", self.model_impl.WallTime()
+            "solver_time", self.model_impl.WallTime() - self.wall_time_offset
         )
         sol.add_metric_value(
             "best_bound", self.model_impl.Objective().BestBound()
         )
-        model.metrics.MetricsCalculator.calculate_all(sol)
+        sol.add_metric_value(
+            "mip_gap", self.get_gap()
+        )
+        for k, v in self.solve_stats.items():
+            sol.add_metric_value(k, v)
+        with self.instrumentation.timer("calculate_metrics"):
+            model.metrics.MetricsCalculator.calculate_all(sol)
+        self.add_instrumentation_metrics(sol)
 
         return sol
+
+    def add_instrumentation_metrics(self, sol):
+        """
+        Adds the timings, the model size per family, solver statistics and the peak memory usage to the solution.
+        The number of branch-and-bound nodes is only added for MIP backends.
+        """
+        for k, v in self.instrumentation.to_metrics().items():
+            sol.update_metric_group(k, v)
+        if self.model_impl_type in AbstractMixedIntegerProgram.MIP_IMPLEMENTORS:
+            sol.add_metric_value("solver_nodes", self.model_impl.nodes())
+        sol.add_metric_value("solver_iterations", self.model_impl.iterations())
+        sol.add_metric_value("peak_rss_mb", instrumentation.get_peak_rss_mb())
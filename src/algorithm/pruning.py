@@ -0,0 +1,100 @@
+import numpy as np
+
+
+class FlowVariablePruning(object):
+    """
+    Decides on which IP arcs (e, f) flow variables are created for a commodity. An arc is kept if it lies on a route
+    from one of the commodity's sources to its sink that has at most max_ip_hops IP hops and whose optical length is at
+    most max_stretch times the optical distance between source and sink. Since every IP node pair can be connected by
+    a lightpath, the shortest such route via (e, f) is source -> e -> f -> sink.
+    MODE_EXACT keeps exactly the arcs on an admissible route from any of the sources. Arcs into the used source and
+    out of the sink are dropped as they only form cycles.
+    MODE_HEURISTIC evaluates all routes against the closest source only. This prunes more and needs a single pass
+    per commodity, but restricts CDN assignments to peering nodes within the stretch of the closest one.
+    """
+    MODE_EXACT = "exact"
+    MODE_HEURISTIC = "heuristic"
+
+    def __init__(self, mode=MODE_EXACT, max_ip_hops=None, max_stretch=None):
+        """
+
+        :param mode: MODE_EXACT or MODE_HEURISTIC
+        :param max_ip_hops: maximum number of IP hops of a route. None for no limit
+        :param max_stretch: maximum ratio of the optical length of a route and the optical distance between source and
+            sink. None for no limit
+        """
+        if mode not in [FlowVariablePruning.MODE_EXACT, FlowVariablePruning.MODE_HEURISTIC]:
+            raise ValueError("Unknown pruning mode: {}".format(mode))
+        if max_ip_hops is not None and max_ip_hops < 1:
+            raise ValueError("At least one IP hop is required.")
+        if max_stretch is not None and max_stretch < 1:
+            raise ValueError("Stretch has to be at least 1.")
+        self.mode = mode
+        self.max_ip_hops = max_ip_hops
+        self.max_stretch = max_stretch
+
+        self._ip_node_index = None
+        self._distances = None
+
+    def to_dict(self):
+        return {
+            'name': self.__class__.__name__,
+            'mode': self.mode,
+            'max_ip_hops': self.max_ip_hops,
+            'max_stretch': self.max_stretch
+        }
+
+    def prepare(self, topology):
+        """
+        Computes the optical distances between all IP nodes of the topology.
+        :param topology: (model.topology.Topology)
+        """
+        self._ip_node_index = {n: i for i, n in enumerate(topology.ip_nodes)}
+        self._distances = topology.get_distances_between_ip_nodes(topology.ip_nodes, topology.ip_nodes)
+
+    def get_arc_mask(self, sources, sink):
+        """
+        Returns the arcs that are kept for a commodity.
+        :param sources: IP nodes the commodity can originate from
+        :param sink: IP node the commodity is destined to
+        :return: (np.ndarray) |V|x|V| boolean matrix indexed like topology.ip_nodes
+        """
+        dist = self._distances
+        num_nodes = dist.shape[0]
+        t = self._ip_node_index[sink]
+        # A source at the sink itself needs no arcs
+        src = np.array(sorted(set(self._ip_node_index[s] for s in sources) - {t}), dtype=np.int64)
+        not_t = np.arange(num_nodes) != t
+        if len(src) == 0:
+            return np.zeros((num_nodes, num_nodes), dtype=bool)
+
+        if self.mode == FlowVariablePruning.MODE_HEURISTIC:
+            closest = src[np.argmin(dist[src, t])]
+            mask = self._admissible(
+                dist[src].min(axis=0), ~np.isin(np.arange(num_nodes), src), dist[closest, t], not_t, t
+            )
+        else:
+            mask = np.zeros((num_nodes, num_nodes), dtype=bool)
+            for s in src.tolist():
+                admissible = self._admissible(dist[s], np.arange(num_nodes) != s, dist[s, t], not_t, t)
+                admissible[:, s] = False
+                mask |= admissible
+
+        mask[np.diag_indices(num_nodes)] = False
+        mask[t, :] = False
+        return mask
+
+    def _admissible(self, dist_from_source, not_source, reference, not_t, t):
+        """
+        Checks the route source -> e -> f -> sink for every arc (e, f).
+        """
+        if not np.isfinite(reference):
+            return np.zeros(self._distances.shape, dtype=bool)
+        mask = np.ones(self._distances.shape, dtype=bool)
+        if self.max_ip_hops is not None:
+            hops = not_source[:, np.newaxis].astype(int) + 1 + not_t[np.newaxis, :].astype(int)
+            mask &= hops <= self.max_ip_hops
+        if self.max_stretch is not None:
+            length = dist_from_source[:, np.newaxis] + self._distances + self._distances[:, t][np.newaxis, :]
+            mask &= length <= self.max_stretch * reference + 1e-9
+        return mask
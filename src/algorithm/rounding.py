@@ -0,0 +1,595 @@
+import collections
+import heapq
+import itertools
+import logging
+import time
+
+import numpy as np
+from ortools.linear_solver import pywraplp
+
+import constants
+import model.metrics
+import model.solution
+from algorithm.abstract import AbstractAlgorithm, AbstractAlgorithmConfiguration
+from algorithm.mip import AbstractMixedIntegerProgram
+from algorithm.mip_pathbased_lin import PathMixedIntegerProgram
+
+
+class LPRoundingConfiguration(AbstractAlgorithmConfiguration):
+    STRATEGY_DETERMINISTIC = "deterministic"
+    STRATEGY_RANDOMIZED = "randomized"
+    STRATEGY_DIVE = "dive"
+
+    def __init__(self, model_implementor, num_threads=1, time_limit=None, strategy=STRATEGY_DETERMINISTIC,
+                 num_rounds=10, seed=0, pruning=None):
+        """
+
+        :param model_implementor: solver of the repair MIP that is only used if no rounded plan is feasible
+        :param num_threads:
+        :param time_limit: time limit of the repair MIP
+        :param strategy: STRATEGY_DETERMINISTIC rounds every value to the largest one, STRATEGY_RANDOMIZED rounds
+            num_rounds times randomly according to the LP values and keeps the best plan, STRATEGY_DIVE fixes the CDN
+            assignment user node by user node and solves the LP again after every step before rounding
+        :param num_rounds: number of rounds of STRATEGY_RANDOMIZED (including one deterministic round)
+        :param seed: seed of STRATEGY_RANDOMIZED
+        :param pruning: (algorithm.pruning.FlowVariablePruning) pruning of the flow variables of the LP relaxation
+        """
+        if strategy not in [LPRoundingConfiguration.STRATEGY_DETERMINISTIC, LPRoundingConfiguration.STRATEGY_RANDOMIZED,
+                            LPRoundingConfiguration.STRATEGY_DIVE]:
+            raise ValueError("Unknown rounding strategy: {}".format(strategy))
+        self.model_implementor = model_implementor
+        self.num_threads = num_threads
+        self.time_limit = time_limit
+        self.strategy = strategy
+        self.num_rounds = num_rounds
+        self.seed = seed
+        self.pruning = pruning
+
+    def to_dict(self):
+        out = {
+            'name': self.__class__.__name__,
+            'model_implementor': self.model_implementor,
+            'num_threads': self.num_threads,
+            'time_limit': self.time_limit,
+            'strategy': self.strategy,
+            'num_rounds': self.num_rounds,
+            'seed': self.seed
+        }
+        if self.pruning is not None:
+            out['pruning'] = self.pruning.to_dict()
+        return out
+
+    def produce(self, inputinstance):
+        return LPRoundingAlgorithm(
+            inputinstance=inputinstance,
+            model_implementor=self.model_implementor,
+            num_threads=self.num_threads,
+            time_limit=self.time_limit,
+            strategy=self.strategy,
+            num_rounds=self.num_rounds,
+            seed=self.seed,
+            pruning=self.pruning
+        )
+
+
+class LPRoundingAlgorithm(AbstractAlgorithm):
+    """
+    Solves the LP relaxation of PathMixedIntegerProgram and rounds its solution to an integer plan:
+      1. Every user node is assigned to one peering node (largest super-flow first). Peering nodes without enough
+         remaining capacity are skipped.
+      2. Every commodity is routed on a single IP path by following its largest LP flows from the source to the sink.
+         If the LP flow ends, the path is completed with the fewest IP hops. Then, every commodity is rerouted on
+         the path that needs the fewest additional trunks given the loads of all other commodities.
+      3. Every IP link gets the minimum number of trunks for the rounded loads. The trunks are split among the optical
+         candidate paths according to the LP values and moved to other candidate paths while fibers are overloaded.
+    The plan is checked by fixing all variables of the LP to it. If no plan is feasible, the MIP is solved with the
+    rounded CDN assignment fixed.
+    """
+    LP_IMPLEMENTOR = pywraplp.Solver.GLOP_LINEAR_PROGRAMMING
+    EPS = 1e-6
+    # Passes of rip-up and reroute over all commodities after the paths are rounded
+    REROUTE_PASSES = 2
+    # Added to every IP arc when rerouting so that the path with the fewest hops is chosen among equally priced ones
+    HOP_COST = 1e-3
+
+    Commodity = collections.namedtuple("Commodity", ["key", "sink", "no_transit", "arcs"])
+
+    def __init__(self, inputinstance, model_implementor=AbstractMixedIntegerProgram.MODEL_IMPLEMENTOR_CBC,
+                 num_threads=None, time_limit=None, strategy=LPRoundingConfiguration.STRATEGY_DETERMINISTIC,
+                 num_rounds=10, seed=0, pruning=None):
+        self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
+        self.inputinstance = inputinstance
+        self.model_implementor = model_implementor
+        self.num_threads = num_threads
+        self.time_limit = time_limit
+        self.strategy = strategy
+        self.num_rounds = num_rounds
+        self.rng = np.random.RandomState(seed=seed)
+        self.pruning = pruning
+
+        self.lp = None
+        self.commodities = dict()
+        self.solution = None
+        self.stats = dict()
+
+        self._bounds = None
+        self._fibers_of_path = None
+
+    def set_num_threads(self, num_threads):
+        self.num_threads = num_threads
+
+    def run(self):
+        t_start = time.perf_counter()
+        self.lp = PathMixedIntegerProgram(
+            self.inputinstance, model_implementor=self.LP_IMPLEMENTOR, relaxed=True, pruning=self.pruning
+        )
+        self.lp.build()
+        variables = self.lp.model_impl.variables()
+        self._bounds = [(var.lb(), var.ub()) for var in variables]
+        self.lp.solve()
+        self.stats["rounding_lp_solves"] = 1
+        if self.lp.result_status != pywraplp.Solver.OPTIMAL:
+            self.logger.warning("LP relaxation could not be solved. Status is {}".format(self.lp.result_status))
+            self.solution = self.lp.get_solution()
+            return
+        lp_bound = self.lp.model_impl.Objective().Value()
+        self.logger.info("LP bound is {}".format(lp_bound))
+        self.build_commodities()
+
+        if self.strategy == LPRoundingConfiguration.STRATEGY_DIVE:
+            self.dive()
+        rngs = [None]
+        if self.strategy == LPRoundingConfiguration.STRATEGY_RANDOMIZED:
+            rngs += [self.rng] * (self.num_rounds - 1)
+
+        # Checking a plan overwrites the LP solution values. Keep them
+        lp_values = [var.solution_value() for var in variables]
+        best_objective = np.inf
+        best_values = None
+        first_assignment = None
+        num_feasible = 0
+        for rng in rngs:
+            assignment, values = self.round(lp_values, rng)
+            if first_assignment is None:
+                first_assignment = assignment
+            if values is None or not self.check(values):
+                continue
+            num_feasible += 1
+            objective = sum(values[var.index()] for var in self.lp.variables["ip_capacity"].values())
+            if objective < best_objective:
+                best_objective = objective
+                best_values = values
+        self.stats["rounding_rounds"] = len(rngs)
+        self.stats["rounding_feasible_rounds"] = num_feasible
+
+        if best_values is not None:
+            self.fix(best_values)
+            self.lp.solve()
+            self.solution = self.get_rounded_solution(lp_bound)
+            objective = best_objective
+        else:
+            self.logger.info("No rounded plan is feasible. Solving the MIP with the rounded CDN assignment fixed.")
+            mip = self.repair(first_assignment)
+            self.solution = mip.get_solution()
+            objective = mip.model_impl.Objective().Value() if mip.result_status in [
+                pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE
+            ] else None
+
+        self.stats["rounding_time"] = time.perf_counter() - t_start
+        self.stats["lp_bound"] = lp_bound
+        if objective is not None:
+            self.stats["heuristic_gap"] = max(0.0, float((objective - lp_bound) / objective)) if objective > 0 else 0.0
+        for k, v in self.stats.items():
+            self.solution.add_metric_value(k, v)
+
+    def build_commodities(self):
+        """
+        Collects the flow variables of every commodity by tail IP node.
+        """
+        self.commodities = dict()
+        for hg in self.inputinstance.demandset or list():
+            no_transit = frozenset(pnode.lower_layer for pnode in hg.peering_nodes)
+            for unode in hg.user_nodes:
+                self.commodities[hg.name, unode] = LPRoundingAlgorithm.Commodity(
+                    (hg.name, unode), unode.lower_layer, no_transit, collections.defaultdict(dict)
+                )
+            for (unode, e, f), var in self.lp.variables["flow_cdn"][hg.name].items():
+                self.commodities[hg.name, unode].arcs[e][f] = var
+
+        if self.inputinstance.background_demand:
+            no_transit = frozenset(e for e in self.inputinstance.topology.ip_nodes if "-E" in e.id)
+            for dem in self.inputinstance.background_demand.values():
+                self.commodities[dem.key] = LPRoundingAlgorithm.Commodity(
+                    dem.key, dem.node2, no_transit, collections.defaultdict(dict)
+                )
+            for (k1, k2, e, f), var in self.lp.variables["flow_e2e"].items():
+                self.commodities[k1, k2].arcs[e][f] = var
+
+    def dive(self):
+        """
+        Fixes the user nodes whose super-flow is integral and the most integral fractional one to their largest
+        super-flow and solves the LP again until all user nodes are assigned. An assignment that makes the LP
+        infeasible is forbidden instead.
+        """
+        while True:
+            integral = list()
+            fractional = list()
+            for hg in self.inputinstance.demandset or list():
+                for unode in hg.user_nodes:
+                    super_vars = [self.lp.variables["flow_super"][hg.name][unode, pnode] for pnode in hg.peering_nodes]
+                    if len(super_vars) == 0 or any(var.lb() > 0.5 for var in super_vars):
+                        continue
+                    var = max(super_vars, key=lambda x: x.solution_value())
+                    if var.solution_value() >= 1 - LPRoundingAlgorithm.EPS:
+                        integral.append(var)
+                    else:
+                        fractional.append(var)
+            if len(integral) + len(fractional) == 0:
+                return
+
+            to_fix = integral
+            candidate = None
+            if len(fractional) > 0:
+                candidate = max(fractional, key=lambda x: x.solution_value())
+                to_fix = integral + [candidate]
+            for var in to_fix:
+                var.SetLb(1)
+            self.lp.solve()
+            self.stats["rounding_lp_solves"] += 1
+            if self.lp.result_status == pywraplp.Solver.OPTIMAL:
+                continue
+
+            for var in to_fix:
+                var.SetLb(0)
+            if candidate is not None:
+                candidate.SetUb(0)
+            self.lp.solve()
+            self.stats["rounding_lp_solves"] += 1
+            if self.lp.result_status != pywraplp.Solver.OPTIMAL:
+                if candidate is not None:
+                    candidate.SetUb(1)
+                self.lp.solve()
+                self.stats["rounding_lp_solves"] += 1
+                self.logger.warning("Stopped diving since no assignment is feasible anymore.")
+                return
+
+    def round(self, lp_values, rng=None):
+        """
+        Rounds the LP solution.
+        :param lp_values: solution values of all LP variables
+        :param rng: (np.random.RandomState) for randomized rounding, None to round deterministically
+        :return: (tuple) of the CDN assignment (dict of (hg name, user node) -> peering node) and the values of all
+            variables. Values are None if a commodity can not be routed.
+        """
+        values = np.zeros(len(lp_values))
+        assignment = self.round_assignment(lp_values, rng)
+        # Routes as [commodity, source, volume, path]
+        routes = list()
+        for hg in self.inputinstance.demandset or list():
+            for unode in hg.user_nodes:
+                pnode = assignment[hg.name, unode]
+                values[self.lp.variables["flow_super"][hg.name][unode, pnode].index()] = 1
+                routes.append([self.commodities[hg.name, unode], pnode.lower_layer, unode.demand_volume, None])
+        for dem in (self.inputinstance.background_demand or dict()).values():
+            routes.append([self.commodities[dem.key], dem.node1, dem.volume, None])
+
+        loads = collections.defaultdict(float)
+        for route in routes:
+            commodity, source, volume, _ = route
+            route[3] = self.round_path(commodity, source, lp_values, rng)
+            if route[3] is None:
+                self.logger.debug("Could not route {} from {}".format(commodity.key, source))
+                return assignment, None
+            for e, f in route[3]:
+                loads[e, f] += volume
+        self.reroute(routes, loads)
+
+        for commodity, source, volume, path in routes:
+            for e, f in path:
+                values[commodity.arcs[e][f].index()] = 1
+        for (e, f, i), num_trunks in self.round_capacity(loads, lp_values).items():
+            values[self.lp.variables["ip_capacity"][e, f, i].index()] = num_trunks
+        return assignment, values
+
+    def round_assignment(self, lp_values, rng=None):
+        """
+        Assigns every user node to the peering node with the largest super-flow (randomized: drawn according to the
+        super-flows) that has enough capacity left. User nodes are assigned by decreasing demand volume.
+        """
+        topology = self.inputinstance.topology
+        assignment = dict()
+        for hg in self.inputinstance.demandset or list():
+            if len(hg.peering_nodes) == 0:
+                continue
+            remaining = np.array([pnode.capacity for pnode in hg.peering_nodes], dtype=float)
+            distances = topology.get_distances_between_ip_nodes(
+                [unode.lower_layer for unode in hg.user_nodes], [pnode.lower_layer for pnode in hg.peering_nodes]
+            )
+            order = sorted(range(len(hg.user_nodes)), key=lambda x: hg.user_nodes[x].demand_volume, reverse=True)
+            for i in order:
+                unode = hg.user_nodes[i]
+                super_vars = [self.lp.variables["flow_super"][hg.name][unode, pnode] for pnode in hg.peering_nodes]
+                flows = np.array([lp_values[var.index()] for var in super_vars])
+                forced = np.array([var.lb() > 0.5 for var in super_vars])
+                # Peering nodes at the user node's IP node can not serve it unless the LP does so
+                allowed = np.array([var.ub() > 0.5 for var in super_vars]) & (
+                    (flows > LPRoundingAlgorithm.EPS) |
+                    np.array([pnode.lower_layer != unode.lower_layer for pnode in hg.peering_nodes])
+                )
+                if forced.any():
+                    p = int(np.argmax(forced))
+                else:
+                    # By decreasing flow, then by increasing distance
+                    candidates = np.lexsort((distances[i], -flows)).tolist()
+                    weights = np.where(allowed, flows, 0)
+                    if rng is not None and weights.sum() > LPRoundingAlgorithm.EPS:
+                        first = int(rng.choice(len(weights), p=weights / weights.sum()))
+                        candidates = [first] + [c for c in candidates if c != first]
+                    candidates = [c for c in candidates if allowed[c]] or candidates
+                    fitting = [c for c in candidates if remaining[c] >= unode.demand_volume - LPRoundingAlgorithm.EPS]
+                    # If no peering node has capacity left, the plan is infeasible and repaired by the MIP
+                    p = fitting[0] if len(fitting) > 0 else max(candidates, key=lambda x: remaining[x])
+                remaining[p] -= unode.demand_volume
+                assignment[hg.name, unode] = hg.peering_nodes[p]
+        return assignment
+
+    def round_path(self, commodity, source, lp_values, rng=None):
+        """
+        Follows the largest LP flow (randomized: drawn according to the flows) from the source to the sink.
+        :return: (list) of IP arcs or None if the sink can not be reached
+        """
+        path = list()
+        visited = {source}
+        node = source
+        while node != commodity.sink:
+            flows = [
+                (f, lp_values[var.index()]) for f, var in commodity.arcs.get(node, dict()).items()
+                if f not in visited and var.ub() > 0.5 and (f == commodity.sink or f not in commodity.no_transit) and
+                lp_values[var.index()] > LPRoundingAlgorithm.EPS
+            ]
+            if len(flows) == 0:
+                rest = self.get_min_hop_path(commodity, node, visited)
+                if rest is None:
+                    return None
+                return path + rest
+            if rng is None:
+                head = max(flows, key=lambda x: x[1])[0]
+            else:
+                weights = np.array([v for _, v in flows])
+                head = flows[int(rng.choice(len(flows), p=weights / weights.sum()))][0]
+            path.append((node, head))
+            visited.add(head)
+            node = head
+        return path
+
+    def get_min_hop_path(self, commodity, source, visited):
+        """
+        Breadth-first search on the IP arcs of the commodity that avoids the visited nodes.
+        """
+        predecessor = {source: None}
+        queue = collections.deque([source])
+        while len(queue) > 0:
+            node = queue.popleft()
+            if node == commodity.sink:
+                path = list()
+                while predecessor[node] is not None:
+                    path.append((predecessor[node], node))
+                    node = predecessor[node]
+                return path[::-1]
+            if node != source and node in commodity.no_transit:
+                continue
+            for f, var in commodity.arcs.get(node, dict()).items():
+                if f not in predecessor and f not in visited and var.ub() > 0.5:
+                    predecessor[f] = node
+                    queue.append(f)
+        return None
+
+    def get_num_trunks(self, load):
+        """
+        :return: minimum number of trunks of an IP link with the given load
+        """
+        if load <= LPRoundingAlgorithm.EPS:
+            return 0
+        topology = self.inputinstance.topology
+        return max(np.ceil(load / topology.parameter[constants.KEY_IP_LIGHTPATH_CAPACITY] - LPRoundingAlgorithm.EPS),
+                   topology.get_required_num_trunks(load))
+
+    def get_additional_trunks(self, loads, e, f, volume):
+        """
+        :return: number of trunks that have to be added to the IP link if the volume is added to the arc (e, f)
+        """
+        reverse = loads.get((f, e), 0)
+        return self.get_num_trunks(max(loads.get((e, f), 0) + volume, reverse)) - \
+            self.get_num_trunks(max(loads.get((e, f), 0), reverse))
+
+    def reroute(self, routes, loads):
+        """
+        Rip-up and reroute: every commodity (by decreasing volume) is removed and routed again on the path that needs
+        the fewest additional trunks if this is cheaper than its current path.
+        :param routes: list of [commodity, source, volume, path], paths are updated
+        :param loads: (dict) of IP arc -> load, updated
+        """
+        for _ in range(LPRoundingAlgorithm.REROUTE_PASSES):
+            changed = False
+            for route in sorted(routes, key=lambda x: x[2], reverse=True):
+                commodity, source, volume, path = route
+                for e, f in path:
+                    loads[e, f] -= volume
+                cost = sum(self.get_additional_trunks(loads, e, f, volume) + LPRoundingAlgorithm.HOP_COST
+                           for e, f in path)
+                new_cost, new_path = self.get_cheapest_path(commodity, source, volume, loads)
+                if new_path is not None and new_cost < cost - LPRoundingAlgorithm.EPS:
+                    route[3] = path = new_path
+                    changed = True
+                for e, f in path:
+                    loads[e, f] += volume
+            if not changed:
+                return
+
+    def get_cheapest_path(self, commodity, source, volume, loads):
+        """
+        Dijkstra on the IP arcs of the commodity weighted with the number of additional trunks.
+        :return: (tuple) of cost and path, (np.inf, None) if the sink can not be reached
+        """
+        distance = {source: 0}
+        predecessor = {source: None}
+        heap = [(0, 0, source)]
+        counter = itertools.count(1)
+        done = set()
+        while len(heap) > 0:
+            cost, _, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            if node == commodity.sink:
+                path = list()
+                while predecessor[node] is not None:
+                    path.append((predecessor[node], node))
+                    node = predecessor[node]
+                return cost, path[::-1]
+            if node != source and node in commodity.no_transit:
+                continue
+            for f, var in commodity.arcs.get(node, dict()).items():
+                if f in done or var.ub() < 0.5:
+                    continue
+                new_cost = cost + self.get_additional_trunks(loads, node, f, volume) + LPRoundingAlgorithm.HOP_COST
+                if new_cost < distance.get(f, np.inf):
+                    distance[f] = new_cost
+                    predecessor[f] = node
+                    heapq.heappush(heap, (new_cost, next(counter), f))
+        return np.inf, None
+
+    def round_capacity(self, loads, lp_values):
+        """
+        Deploys the minimum number of trunks on every IP link (in both directions) for the rounded loads, but at least
+        the lower bounds of fixed layers. Trunks are split among the candidate paths by largest remainder of the LP
+        values. Afterwards, trunks are moved away from overloaded fibers to other candidate paths of the same IP link.
+        :param loads: (dict) of IP arc -> load
+        :return: (dict) of (e, f, path number) -> number of trunks
+        """
+        topology = self.inputinstance.topology
+        ip_capacity = self.lp.variables["ip_capacity"]
+        trunks = dict()
+        for e, f in itertools.filterfalse(lambda x: x[0].id >= x[1].id, itertools.product(topology.ip_nodes, repeat=2)):
+            vars_ef = ip_capacity.select(e, f, '*')
+            vars_fe = ip_capacity.select(f, e, '*')
+            if len(vars_ef) == 0:
+                continue
+            num_trunks = self.get_num_trunks(max(loads.get((e, f), 0), loads.get((f, e), 0)))
+
+            lower = np.ceil(np.maximum(
+                [var.lb() for var in vars_ef], [var.lb() for var in vars_fe]
+            ) - LPRoundingAlgorithm.EPS)
+            upper = np.minimum([var.ub() for var in vars_ef], [var.ub() for var in vars_fe])
+            num_paths = lower.copy()
+            missing = num_trunks - num_paths.sum()
+            if missing > 0:
+                weights = np.array([lp_values[u.index()] + lp_values[v.index()] for u, v in zip(vars_ef, vars_fe)])
+                weights = np.where(num_paths < upper, weights, 0)
+                if weights.sum() <= LPRoundingAlgorithm.EPS:
+                    weights = (num_paths < upper).astype(float)
+                if weights.sum() > 0:
+                    share = missing * weights / weights.sum()
+                    num_paths += np.floor(share)
+                    remainder = int(missing - np.floor(share).sum())
+                    num_paths[np.argsort(-(share - np.floor(share)), kind="stable")[:remainder]] += 1
+            for i, n in enumerate(num_paths.tolist()):
+                trunks[e, f, i] = n
+                trunks[f, e, i] = n
+
+        self.repair_fiber_capacity(trunks, lower_bounds={k: ip_capacity[k].lb() for k in trunks})
+        return trunks
+
+    def get_fibers_of_paths(self):
+        """
+        :return: (dict) of (e, f, path number) -> fiber keys with a fiber capacity row
+        """
+        if self._fibers_of_path is None:
+            topology = self.inputinstance.topology
+            self._fibers_of_path = collections.defaultdict(list)
+            for key in topology.opt_edges.keys():
+                for path in topology.candidate_paths_per_opt_edge[key]:
+                    self._fibers_of_path[path].append(key)
+        return self._fibers_of_path
+
+    def repair_fiber_capacity(self, trunks, lower_bounds):
+        """
+        Moves single trunks (in both directions) from paths over overloaded fibers to other candidate paths of the
+        same IP link whose fibers have capacity left.
+        """
+        topology = self.inputinstance.topology
+        fibers_of_path = self.get_fibers_of_paths()
+        usage = collections.defaultdict(float)
+        for path, n in trunks.items():
+            for key in fibers_of_path.get(path, list()):
+                usage[key] += n
+
+        def fibers(e, f, i):
+            return fibers_of_path.get((e, f, i), list()) + fibers_of_path.get((f, e, i), list())
+
+        for key, oedge in topology.opt_edges.items():
+            for e, f, i in topology.candidate_paths_per_opt_edge[key]:
+                while usage[key] > oedge.capacity and trunks.get((e, f, i), 0) > lower_bounds.get((e, f, i), 0):
+                    alternatives = [
+                        j for j in range(len(topology.get_all_optical_candidate_paths_between_ip_nodes(e, f)))
+                        if j != i and all(
+                            usage[k] + 1 <= topology.opt_edges[k].capacity for k in fibers(e, f, j)
+                        )
+                    ]
+                    if len(alternatives) == 0:
+                        break
+                    for k in fibers(e, f, i):
+                        usage[k] -= 1
+                    for k in fibers(e, f, alternatives[0]):
+                        usage[k] += 1
+                    for a, b in [(e, f), (f, e)]:
+                        trunks[a, b, i] -= 1
+                        trunks[a, b, alternatives[0]] += 1
+
+    def fix(self, values):
+        for var, value in zip(self.lp.model_impl.variables(), values.tolist()):
+            var.SetBounds(value, value)
+
+    def check(self, values):
+        """
+        Checks the rounded plan by fixing all variables of the LP to it. Restores the bounds afterwards.
+        """
+        self.fix(values)
+        self.lp.solve()
+        self.stats["rounding_lp_solves"] += 1
+        feasible = self.lp.result_status == pywraplp.Solver.OPTIMAL
+        for var, (lb, ub) in zip(self.lp.model_impl.variables(), self._bounds):
+            var.SetBounds(lb, ub)
+        return feasible
+
+    def get_rounded_solution(self, lp_bound):
+        sol = model.solution.SolutionInstance(
+            self.lp._extract_ip_links(), self.lp._extract_cdn_assignment(), self.lp._extract_e2e_routing()
+        )
+        sol.add_metric_value("objective", self.lp.model_impl.Objective().Value())
+        sol.add_metric_value("solver_time", self.lp.model_impl.WallTime())
+        sol.add_metric_value("best_bound", lp_bound)
+        model.metrics.MetricsCalculator.calculate_all(sol)
+        for k, v in self.lp.pruning_stats.items():
+            sol.add_metric_value(k, v)
+        return sol
+
+    def repair(self, assignment):
+        """
+        Solves the MIP with the CDN assignment fixed.
+        :return: (PathMixedIntegerProgram) solved MIP
+        """
+        mip = PathMixedIntegerProgram(
+            self.inputinstance, model_implementor=self.model_implementor, num_threads=self.num_threads,
+            time_limit=self.time_limit, pruning=self.pruning
+        )
+        mip.build()
+        for (hg_name, unode), pnode in assignment.items():
+            for var in mip.variables["flow_super"][hg_name].select(unode, '*'):
+                var.SetBounds(0, 0)
+            mip.variables["flow_super"][hg_name][unode, pnode].SetBounds(1, 1)
+        mip.solve()
+        return mip
+
+    def get_solution(self):
+        return self.solution
@@ -0,0 +1,207 @@
+import numpy as np
+from ortools.linear_solver import linear_solver_pb2
+
+
+def match_keys(left, right):
+    """
+    Vectorized join of two integer key arrays.
+    :param left: (np.ndarray) keys
+    :param right: (np.ndarray) keys
+    :return: (tuple) of index arrays (i, j) so that left[i] == right[j] for every matching pair. Pairs are ordered by i
+        and, for the same i, by j.
+    """
+    order = np.argsort(right, kind="stable")
+    sorted_right = right[order]
+    lo = np.searchsorted(sorted_right, left, side="left")
+    hi = np.searchsorted(sorted_right, left, side="right")
+    counts = hi - lo
+    idx_left = np.repeat(np.arange(len(left)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    idx_right = order[np.repeat(lo, counts) + offsets]
+    return idx_left, idx_right
+
+
+class SparseModel(object):
+    """
+    Collects the variables and rows of a linear model in flat arrays (the constraint matrix in COO format) and loads
+    the whole model into a pywraplp solver with a single call via MPModelProto. The arrays are freed before loading,
+    but the proto and its copy in the solver wrapper are alive at the same time as the solver model, so loading needs
+    more memory than building the model row by row.
+    """
+
+    def __init__(self, name="linearized_model"):
+        self.name = name
+        self.num_variables = 0
+        self.num_rows = 0
+
+        self._var_lb = list()
+        self._var_ub = list()
+        self._var_integer = list()
+        self._var_names = list()
+        self._bound_overrides = list()
+
+        self._row_lb = list()
+        self._row_ub = list()
+        self._row_names = list()
+
+        self._coo_rows = list()
+        self._coo_cols = list()
+        self._coo_vals = list()
+
+        self.objective = np.zeros(0)
+        self.maximize = False
+
+    def add_variables(self, num, lb, ub, is_integer, names):
+        """
+        Adds a block of variables.
+        :param num: number of variables
+        :param lb: lower bound (scalar or array)
+        :param ub: upper bound (scalar or array)
+        :param is_integer: (bool)
+        :param names: list of names
+        :return: (np.ndarray) column indices of the new variables
+        """
+        self._var_lb.append(np.broadcast_to(np.asarray(lb, dtype=float), (num,)).copy())
+        self._var_ub.append(np.broadcast_to(np.asarray(ub, dtype=float), (num,)).copy())
+        self._var_integer.append(np.full(num, is_integer, dtype=bool))
+        self._var_names.extend(names)
+        cols = np.arange(self.num_variables, self.num_variables + num)
+        self.num_variables += num
+        return cols
+
+    def set_variable_bounds(self, cols, lb, ub):
+        """
+        Overwrites the bounds of already added variables. Applied when the model is exported.
+        """
+        self._bound_overrides.append((cols, lb, ub))
+
+    def add_rows(self, num, lb, ub, names):
+        """
+        Adds a block of rows (constraints).
+        :param num: number of rows
+        :param lb: lower bound (scalar or array)
+        :param ub: upper bound (scalar or array)
+        :param names: list of names
+        :return: (np.ndarray) indices of the new rows
+        """
+        self._row_lb.append(np.broadcast_to(np.asarray(lb, dtype=float), (num,)).copy())
+        self._row_ub.append(np.broadcast_to(np.asarray(ub, dtype=float), (num,)).copy())
+        self._row_names.extend(names)
+        rows = np.arange(self.num_rows, self.num_rows + num)
+        self.num_rows += num
+        return rows
+
+    def add_coefficients(self, rows, cols, vals):
+        """
+        Adds entries to the constraint matrix. Entries with the same row and column are summed up.
+        :param rows: row indices
+        :param cols: column indices
+        :param vals: coefficients (scalar or array)
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        self._coo_rows.append(rows)
+        self._coo_cols.append(np.asarray(cols, dtype=np.int64))
+        self._coo_vals.append(np.broadcast_to(np.asarray(vals, dtype=float), rows.shape).copy())
+
+    def set_objective(self, cols, vals, maximize=False):
+        self.objective = np.zeros(self.num_variables)
+        self.objective[cols] = vals
+        self.maximize = maximize
+
+    def to_csr(self):
+        """
+        Converts the collected COO entries to CSR. Duplicates are summed up and zero entries are dropped, as done by
+        the solver when rows are built from expressions.
+        :return: (tuple) of indptr, column indices and values
+        """
+        if len(self._coo_rows) > 0:
+            rows = np.concatenate(self._coo_rows)
+            cols = np.concatenate(self._coo_cols)
+            vals = np.concatenate(self._coo_vals)
+        else:
+            rows = cols = np.zeros(0, dtype=np.int64)
+            vals = np.zeros(0)
+
+        order = np.lexsort((cols, rows))
+        rows = rows[order]
+        cols = cols[order]
+        vals = vals[order]
+
+        if len(rows) > 0:
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+            group = np.cumsum(first) - 1
+            vals = np.bincount(group, weights=vals)
+            rows = rows[first]
+            cols = cols[first]
+
+        nonzero = vals != 0
+        rows = rows[nonzero]
+        cols = cols[nonzero]
+        vals = vals[nonzero]
+        indptr = np.zeros(self.num_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.num_rows), out=indptr[1:])
+        return indptr, cols, vals
+
+    def to_proto(self):
+        """
+        Fills an MPModelProto with the model. The indices and coefficients of a row are added to its repeated fields
+        at once from slices of the CSR arrays.
+        :return: (linear_solver_pb2.MPModelProto)
+        """
+        proto = linear_solver_pb2.MPModelProto()
+        proto.name = self.name
+        proto.maximize = self.maximize
+
+        objective = self.objective
+        if len(objective) < self.num_variables:
+            objective = np.concatenate([objective, np.zeros(self.num_variables - len(objective))])
+        lower = np.concatenate(self._var_lb) if self.num_variables > 0 else np.zeros(0)
+        upper = np.concatenate(self._var_ub) if self.num_variables > 0 else np.zeros(0)
+        for cols, lb, ub in self._bound_overrides:
+            lower[cols] = lb
+            upper[cols] = ub
+        integer = np.concatenate(self._var_integer).tolist() if self.num_variables > 0 else list()
+        for lb, ub, is_int, obj, name in zip(lower.tolist(), upper.tolist(), integer, objective.tolist(),
+                                             self._var_names):
+            proto.variable.add(lower_bound=lb, upper_bound=ub, is_integer=is_int, objective_coefficient=obj,
+                               name=name)
+        del objective, lower, upper, integer
+
+        indptr, cols, vals = self.to_csr()
+        cols = cols.tolist()
+        vals = vals.tolist()
+        indptr = indptr.tolist()
+        lower = np.concatenate(self._row_lb).tolist() if self.num_rows > 0 else list()
+        upper = np.concatenate(self._row_ub).tolist() if self.num_rows > 0 else list()
+        for r, (lb, ub, name) in enumerate(zip(lower, upper, self._row_names)):
+            constraint = proto.constraint.add(lower_bound=lb, upper_bound=ub, name=name)
+            constraint.var_index.extend(cols[indptr[r]:indptr[r + 1]])
+            constraint.coefficient.extend(vals[indptr[r]:indptr[r + 1]])
+        return proto
+
+    def release(self):
+        """
+        Frees the collected variables, rows and coefficients. Only the number of variables and rows is kept.
+        """
+        self._var_lb = self._var_ub = self._var_integer = self._var_names = self._bound_overrides = list()
+        self._row_lb = self._row_ub = self._row_names = list()
+        self._coo_rows = self._coo_cols = self._coo_vals = list()
+        self.objective = np.zeros(0)
+
+    def load(self, solver):
+        """
+        Loads the model into the (empty) solver. The collected arrays are freed before (see release()), hence, the
+        model can only be loaded once.
+        :param solver: pywraplp.Solver
+        :return: (list) of the solver's variables, ordered by column index
+        """
+        # Newer OR-Tools versions drop the names in LoadModelFromProto
+        load_model = getattr(solver, "LoadModelFromProtoKeepNames", solver.LoadModelFromProto)
+        proto = self.to_proto()
+        self.release()
+        error = load_model(proto)
+        del proto
+        if error:
+            raise RuntimeError("Could not load model: {}".format(error))
+        return solver.variables()
@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+
+import model.input
+from algorithm.greedy import GreedyCDNAssignmentAlgorithm
+
+
+class AbstractWarmStartProvider(object):
+    """
+    Provides a solution of an input instance that is passed to the solver as hint (see
+    AbstractMixedIntegerProgram.apply_warm_start()). Solutions are returned as dict in the format of the solution files
+    (model.solution.SolutionInstance.to_dict()) so that nodes are matched by id.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
+
+    def to_dict(self):
+        raise NotImplementedError
+
+    def get_solution(self, inputinstance):
+        """
+        :param inputinstance: (model.input.InputInstance)
+        :return: (dict) solution or None if there is none
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _solve(algorithm):
+        algorithm.run()
+        solution = algorithm.get_solution()
+        if len(solution.ip_links) == 0:
+            return None
+        return solution.to_dict()
+
+
+class PreviousSolutionWarmStartProvider(AbstractWarmStartProvider):
+    def __init__(self, fname):
+        """
+
+        :param fname: solution file of a previous run, e.g., the previous timestamp as found by
+            helpers.find_previous_solution_file()
+        """
+        super(PreviousSolutionWarmStartProvider, self).__init__()
+        self.fname = fname
+
+    def to_dict(self):
+        return {
+            'name': self.__class__.__name__,
+            'fname': self.fname
+        }
+
+    def get_solution(self, inputinstance):
+        if not os.path.exists(self.fname):
+            self.logger.warning("Solution file {} does not exist.".format(self.fname))
+            return None
+        with open(self.fname, "r") as fd:
+            solution = json.load(fd)
+        if len(solution["ip_links"]) == 0:
+            return None
+        return solution
+
+
+class GreedyWarmStartProvider(AbstractWarmStartProvider):
+    def __init__(self, mip_config):
+        """
+
+        :param mip_config: configuration of the MIP that the greedy CDN assignment is solved with
+        """
+        super(GreedyWarmStartProvider, self).__init__()
+        self.mip_config = mip_config
+
+    def to_dict(self):
+        return {
+            'name': self.__class__.__name__,
+            'mip_config': self.mip_config.to_dict()
+        }
+
+    def get_solution(self, inputinstance):
+        # The greedy algorithm fixes the CDN layer of the input instance it is given
+        greedy_instance = model.input.InputInstance(
+            inputinstance.topology, inputinstance.demandset, fixed_layers=dict(inputinstance.fixed_layers),
+            background_demand=inputinstance.background_demand
+        )
+        return self._solve(GreedyCDNAssignmentAlgorithm(greedy_instance, self.mip_config))
+
+
+class LPRoundingWarmStartProvider(AbstractWarmStartProvider):
+    def __init__(self, rounding_config):
+        """
+
+        :param rounding_config: (algorithm.rounding.LPRoundingConfiguration)
+        """
+        super(LPRoundingWarmStartProvider, self).__init__()
+        self.rounding_config = rounding_config
+
+    def to_dict(self):
+        return {
+            'name': self.__class__.__name__,
+            'rounding_config': self.rounding_config.to_dict()
+        }
+
+    def get_solution(self, inputinstance):
+        return self._solve(self.rounding_config.produce(inputinstance))
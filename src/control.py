@@ -1,7 +1,40 @@
 import multiprocessing
+import collections
 import logging
+import asyncio
+import json
+import os
+import queue
+import time
 
+import input_cache
+import isolation
 import scenario
+import scheduling
+import work_queue
+
+
+def is_solved(scenario_config, folder_listings):
+    """
+    Checks if a scenario configuration was already solved without producing it. Only the outputs are produced, which
+    just hash the configuration. Folders are listed once and the listings are reused for all configurations.
+    :param scenario_config: (scenario.ScenarioConfiguration)
+    :param folder_listings: (dict) folder -> set of file names, filled on demand
+    :return: True if one of the outputs has a solution
+    """
+    for out_cfg in scenario_config.outputs:
+        out = out_cfg.produce(scenario_config)
+        sol_fname = out.get_solution_fname()
+        if sol_fname is None:
+            if out.solution_exists():
+                return True
+            continue
+        folder, fname = os.path.split(sol_fname)
+        if folder not in folder_listings:
+            folder_listings[folder] = set(os.listdir(folder)) if os.path.isdir(folder) else set()
+        if fname in folder_listings[folder]:
+            return True
+    return False
 
 
 class AbstractRunner(object):
@@ -9,26 +42,265 @@ class AbstractRunner(object):
         self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
         self._scenario_configs = list_of_scenario_configs
 
+    def get_unsolved_configs(self):
+        """
+        Filters out the configurations that were already solved before dispatching them, so that their inputs and
+        models are never built (see is_solved()).
+        :return: (list) of unsolved scenario configurations
+        """
+        folder_listings = dict()
+        unsolved = [sconfig for sconfig in self._scenario_configs if not is_solved(sconfig, folder_listings)]
+        self.logger.info("Skipping {} of {} scenarios that have already been solved".format(
+            len(self._scenario_configs) - len(unsolved), len(self._scenario_configs)))
+        return unsolved
+
     def run_all(self):
         raise NotImplementedError
 
+    def log_cache_stats(self, scenario_stats):
+        """
+        Logs the hit rate of the input caches of all workers (see input_cache).
+        :param scenario_stats: list of hits and misses of the input cache per scenario (see input_cache.get_stats())
+        """
+        total = collections.Counter()
+        for stats in scenario_stats:
+            total.update(stats)
+        input_cache.log_stats(total, self.logger)
+
 
 class SequentialRunner(AbstractRunner):
     def __init__(self, list_of_scenario_configs):
         super(SequentialRunner, self).__init__(list_of_scenario_configs)
 
     def run_all(self):
-        for sconfig in self._scenario_configs:
+        stats_before = input_cache.get_stats()
+        for sconfig in self.get_unsolved_configs():
             sconfig.produce().run()
+        self.log_cache_stats([{k: v - stats_before[k] for k, v in input_cache.get_stats().items()}])
 
 
 class ParallelRunner(AbstractRunner):
-    def __init__(self, list_of_scenario_configs, num_jobs=2):
+    def __init__(self, list_of_scenario_configs, num_jobs=2, longest_first=True, cost_model=None):
+        """
+
+        :param list_of_scenario_configs:
+        :param num_jobs: number of worker processes
+        :param longest_first: Start the scenarios with the longest estimated run time first (see
+            scheduling.CostModel) so that no long scenario starts when the others are done. Otherwise, they are run in
+            list order.
+        :param cost_model: (scheduling.CostModel) default: scheduling.CostModel()
+        """
         super(ParallelRunner, self).__init__(list_of_scenario_configs)
+        self.num_jobs = num_jobs
+        self.longest_first = longest_first
+        self.cost_model = cost_model if cost_model is not None else scheduling.CostModel()
         self.worker_pool = multiprocessing.Pool(num_jobs)
 
     def run_all(self):
-        self.worker_pool.map(
-            scenario.run_scenario,
-            self._scenario_configs
-        )
+        configs = self.get_unsolved_configs()
+        if not self.longest_first:
+            self.worker_pool.map(
+                scenario.run_scenario,
+                configs
+            )
+            return
+
+        costs = self.cost_model.estimate(configs, self.worker_pool)
+        order = sorted(range(len(configs)), key=lambda i: costs[i], reverse=True)
+        durations = [0.0] * len(configs)
+        t_start = time.perf_counter()
+        cache_stats = list()
+        for i, duration, stats in self.worker_pool.imap_unordered(
+                scheduling.run_scenario_timed,
+                [(i, configs[i]) for i in order],
+                chunksize=1
+        ):
+            durations[i] = duration
+            cache_stats.append(stats)
+        self.log_schedule(time.perf_counter() - t_start, durations, order)
+        self.log_cache_stats(cache_stats)
+
+    def log_schedule(self, makespan, durations, order):
+        """
+        Logs the makespan and core utilization of the run and the makespan that the measured run times would have had
+        in list order with the chunking of Pool.map().
+        """
+        if len(durations) == 0:
+            return
+        utilization = sum(durations) / (self.num_jobs * makespan) if makespan > 0 else 0
+        list_order_makespan = scheduling.get_makespan(
+            durations, self.num_jobs, scheduling.get_map_chunksize(len(durations), self.num_jobs))
+        self.logger.info(
+            "Ran {} scenarios longest first in {:.1f}s with {:.0%} core utilization. In list order: {:.1f}s "
+            "(simulated), longest first: {:.1f}s (simulated)".format(
+                len(durations), makespan, utilization, list_order_makespan,
+                scheduling.get_makespan([durations[i] for i in order], self.num_jobs)))
+
+
+class CoreBudgetRunner(ParallelRunner):
+    """
+    Runs scenarios in parallel on a fixed number of cores and assigns the solver threads of every scenario when it is
+    started (see algorithm.abstract.AbstractAlgorithm.set_num_threads()). Scenarios are started longest first (see
+    scheduling.CostModel). A scenario gets the share of the idle cores that its estimated run time has of all
+    scenarios that wait: At the start of a sweep, many scenarios run single-threaded. The last ones get the cores that
+    become idle. The threads of the configurations are ignored and their hashes do not change.
+    """
+
+    def __init__(self, list_of_scenario_configs, num_cores=None, max_threads=None, cost_model=None):
+        """
+
+        :param list_of_scenario_configs:
+        :param num_cores: cores shared by all scenarios, default: all cores of the machine
+        :param max_threads: maximum solver threads of one scenario, default: num_cores
+        :param cost_model: (scheduling.CostModel) default: scheduling.CostModel()
+        """
+        num_cores = num_cores if num_cores is not None else os.cpu_count()
+        super(CoreBudgetRunner, self).__init__(list_of_scenario_configs, num_jobs=num_cores, longest_first=True,
+                                               cost_model=cost_model)
+        self.num_cores = num_cores
+        self.max_threads = max_threads if max_threads is not None else num_cores
+
+    def get_num_threads(self, cost, waiting_costs, idle_cores):
+        """
+        :param cost: estimated run time of the scenario to start
+        :param waiting_costs: estimated run times of all waiting scenarios, including this one
+        :param idle_cores: cores that are not used by running scenarios
+        :return: (int) solver threads of the scenario
+        """
+        total = sum(waiting_costs)
+        share = int(idle_cores * cost / total) if total > 0 else idle_cores // len(waiting_costs)
+        return max(1, min(share, self.max_threads, idle_cores))
+
+    def run_all(self):
+        configs = self.get_unsolved_configs()
+        costs = self.cost_model.estimate(configs, self.worker_pool)
+        waiting = sorted(range(len(configs)), key=lambda i: costs[i], reverse=True)
+        order = list(waiting)
+        finished = queue.Queue()
+        durations = [0.0] * len(configs)
+        threads = [1] * len(configs)
+        cache_stats = list()
+        idle_cores = self.num_cores
+        num_running = 0
+        t_start = time.perf_counter()
+        while waiting or num_running > 0:
+            while waiting and idle_cores > 0:
+                i = waiting[0]
+                threads[i] = self.get_num_threads(costs[i], [costs[j] for j in waiting], idle_cores)
+                waiting.pop(0)
+                idle_cores -= threads[i]
+                num_running += 1
+                self.logger.info("Starting scenario {} with {} threads ({} idle cores, {} waiting)".format(
+                    i, threads[i], idle_cores, len(waiting)))
+                self.worker_pool.apply_async(
+                    scheduling.run_scenario_timed,
+                    ((i, configs[i]), threads[i]),
+                    callback=finished.put,
+                    error_callback=lambda e, i=i: finished.put((i, 0.0, None))
+                )
+            i, durations[i], stats = finished.get()
+            if stats is not None:
+                cache_stats.append(stats)
+            idle_cores += threads[i]
+            num_running -= 1
+        makespan = time.perf_counter() - t_start
+        if makespan > 0 and len(configs) > 0:
+            self.logger.info("Ran {} scenarios on {} cores in {:.1f}s with {:.0%} core utilization".format(
+                len(configs), self.num_cores, makespan,
+                sum(d * t for d, t in zip(durations, threads)) / (self.num_cores * makespan)))
+        self.log_cache_stats(cache_stats)
+
+
+class FileQueueRunner(AbstractRunner):
+    """
+    Publishes the scenarios to a work queue in a shared folder and runs local workers on it (see
+    work_queue.FileWorkQueue). Workers on other hosts that share the folder take part by running
+    work_queue.work() (e.g., scripts/queue_worker.py) with the same folder. Returns when all published scenarios of the
+    queue are done.
+    Output writers of the scenarios should not use the SQLite catalog if the output folder is shared as well (see
+    output.catalog.SolutionCatalog).
+    """
+
+    def __init__(self, list_of_scenario_configs, queue_path, num_jobs=1, lease_time=600, heartbeat_interval=60,
+                 poll_interval=10):
+        """
+
+        :param list_of_scenario_configs:
+        :param queue_path: folder of the queue, shared by all hosts
+        :param num_jobs: number of local worker processes, 0 to only publish the scenarios
+        :param lease_time: time (s) after which scenarios of workers without heartbeat are run again
+        :param heartbeat_interval: time (s) between two heartbeats of a worker
+        :param poll_interval: time (s) between two checks for scenarios claimed by other workers
+        """
+        super(FileQueueRunner, self).__init__(list_of_scenario_configs)
+        self.queue_path = queue_path
+        self.num_jobs = num_jobs
+        self.queue_args = (queue_path, lease_time, heartbeat_interval, poll_interval)
+
+    def run_all(self):
+        work_queue.FileWorkQueue(*self.queue_args).publish(self.get_unsolved_configs())
+        if self.num_jobs == 0:
+            return
+        workers = [multiprocessing.Process(target=work_queue.work, args=self.queue_args) for _ in range(self.num_jobs)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+
+class IsolatedRunner(AbstractRunner):
+    """
+    Runs every scenario in its own subprocess with a wall-clock deadline and a memory limit (see
+    isolation.IsolatedScenario). Scenarios that hang, exceed the memory or crash the solver are killed without
+    affecting the others. run_all() returns the outcome of every scenario.
+    """
+
+    def __init__(self, list_of_scenario_configs, num_jobs=2, timeout=None, max_rss_mb=None, outcome_fname=None):
+        """
+
+        :param list_of_scenario_configs:
+        :param num_jobs: number of concurrent subprocesses
+        :param timeout: wall-clock deadline (s) of a scenario including building the inputs, None for no deadline.
+            Should be well above the time limit of the solver.
+        :param max_rss_mb: resident set size of a subprocess at which it is killed, None for no limit
+        :param outcome_fname: append the outcomes as JSON lines to this file
+        """
+        super(IsolatedRunner, self).__init__(list_of_scenario_configs)
+        self.num_jobs = num_jobs
+        self.timeout = timeout
+        self.max_rss_mb = max_rss_mb
+        self.outcome_fname = outcome_fname
+
+    async def _run_limited(self, semaphore, isolated):
+        async with semaphore:
+            outcome = await isolated.run()
+        self.logger.info("Scenario {} {} after {:.1f}s".format(outcome.index, outcome.status, outcome.wall_time))
+        if self.outcome_fname is not None:
+            with open(self.outcome_fname, "a") as fd:
+                fd.write(json.dumps(outcome.to_dict()) + "\n")
+        return outcome
+
+    async def run_all_async(self):
+        """
+        Runs the scenarios. Cancelling this coroutine kills all running subprocesses.
+        :return: (list) of isolation.Outcome in the order of the unsolved scenarios
+        """
+        semaphore = asyncio.Semaphore(self.num_jobs)
+        tasks = [
+            asyncio.ensure_future(self._run_limited(
+                semaphore, isolation.IsolatedScenario(i, sconfig, self.timeout, self.max_rss_mb)))
+            for i, sconfig in enumerate(self.get_unsolved_configs())
+        ]
+        try:
+            outcomes = await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        counts = collections.Counter(outcome.status for outcome in outcomes)
+        self.logger.info("Outcomes: {}".format(dict(counts)))
+        return outcomes
+
+    def run_all(self):
+        return asyncio.run(self.run_all_async())
@@ -4,6 +4,7 @@ import itertools
 import numpy as np
 
 import constants
+import generator.topology_generator
 import model.demand
 
 
@@ -980,3 +981,229 @@ class ShuffledCombinedDemandGenerator(AbstractDemandGenerator):
             bg_demand = cdn_demand_matr
 
         return cdn_demand, bg_demand
+
+
+class GravityDemandGeneratorConfiguration(AbstractDemandGeneratorConfiguration):
+    def __init__(self, num_hypergiants, peering_sites_per_hypergiant=2, cdn_volume=1000, background_volume=0,
+                 peering_capacity_factor=2.0, hypergiant_zipf=1.0, population_sigma=1.0, seed=0, parameter=None):
+        """
+
+        :param num_hypergiants:
+        :param peering_sites_per_hypergiant: PoPs at which every hypergiant peers
+        :param cdn_volume: total end-user demand of all hypergiants (Gbps)
+        :param background_volume: total background demand between the PoPs (Gbps), 0 for none
+        :param peering_capacity_factor: every hypergiant can serve this multiple of its demand from its peering sites
+        :param hypergiant_zipf: exponent of the Zipf distribution of the hypergiant shares
+        :param population_sigma: sigma of the lognormal PoP weights (0: all PoPs are equal)
+        :param seed:
+        :param parameter: hypergiant parameters by name
+        """
+        self.num_hypergiants = num_hypergiants
+        self.peering_sites_per_hypergiant = peering_sites_per_hypergiant
+        self.cdn_volume = cdn_volume
+        self.background_volume = background_volume
+        self.peering_capacity_factor = peering_capacity_factor
+        self.hypergiant_zipf = hypergiant_zipf
+        self.population_sigma = population_sigma
+        self.seed = seed
+        self.parameter = parameter
+        if self.parameter is None:
+            self.parameter = dict()
+
+    def to_dict(self):
+        return {
+            'name': self.__class__.__name__,
+            'num_hypergiants': self.num_hypergiants,
+            'peering_sites_per_hypergiant': self.peering_sites_per_hypergiant,
+            'cdn_volume': self.cdn_volume,
+            'background_volume': self.background_volume,
+            'peering_capacity_factor': self.peering_capacity_factor,
+            'hypergiant_zipf': self.hypergiant_zipf,
+            'population_sigma': self.population_sigma,
+            'seed': self.seed,
+            'parameter': self.parameter
+        }
+
+    def produce(self, topology):
+        return GravityDemandGenerator(
+            topology=topology,
+            num_hypergiants=self.num_hypergiants,
+            peering_sites_per_hypergiant=self.peering_sites_per_hypergiant,
+            cdn_volume=self.cdn_volume,
+            background_volume=self.background_volume,
+            peering_capacity_factor=self.peering_capacity_factor,
+            hypergiant_zipf=self.hypergiant_zipf,
+            population_sigma=self.population_sigma,
+            seed=self.seed,
+            parameter=self.parameter
+        )
+
+    def config_name_prefix(self):
+        # Takes the place of the timestamp of the CSV based configurations
+        return "_{}".format(self.seed)
+
+
+class GravityDemandGenerator(AbstractDemandGenerator):
+    """
+    Generates seeded hypergiant and background demand for a topology with PoPs (IP nodes "<PoP>-<router>", see
+    generator.topology_generator.IPRoutersPerPoPGenerator):
+      - Every PoP gets a lognormal weight (its population). End users of a PoP are located at one of its core routers.
+      - Hypergiant h gets the share (h + 1)^-zipf of cdn_volume, which is split over the PoPs by weight.
+      - Peering sites are drawn by weight without replacement. Peering nodes are located at a peering router ("-E") of
+        the site if it has one.
+      - Background demand between the core routers of two PoPs is proportional to the product of their weights
+        (gravity model).
+    """
+
+    def __init__(self, topology, num_hypergiants, peering_sites_per_hypergiant, cdn_volume, background_volume,
+                 peering_capacity_factor, hypergiant_zipf, population_sigma, seed, parameter):
+        self.logger = logging.getLogger(self.__module__ + '.' + self.__class__.__name__)
+        self.topology = topology
+        self.num_hypergiants = num_hypergiants
+        self.peering_sites_per_hypergiant = peering_sites_per_hypergiant
+        self.cdn_volume = cdn_volume
+        self.background_volume = background_volume
+        self.peering_capacity_factor = peering_capacity_factor
+        self.hypergiant_zipf = hypergiant_zipf
+        self.population_sigma = population_sigma
+        self.parameter = parameter
+        self.rng = np.random.RandomState(seed=seed)
+
+    def get_pops(self):
+        """
+        :return: (tuple) of list of PoP names, dict of PoP -> core routers and dict of PoP -> peering routers
+        """
+        core_routers = dict()
+        peering_routers = dict()
+        for ipn in self.topology.ip_nodes:
+            pop, router = generator.topology_generator.split_ip_node_id(ipn.id)
+            core_routers.setdefault(pop, list())
+            peering_routers.setdefault(pop, list())
+            if router.startswith("E"):
+                peering_routers[pop].append(ipn)
+            else:
+                core_routers[pop].append(ipn)
+        pops = [pop for pop in core_routers if len(core_routers[pop]) > 0]
+        if len(pops) == 0:
+            raise ValueError("Topology has no core routers")
+        return pops, core_routers, peering_routers
+
+    def generate(self):
+        pops, core_routers, peering_routers = self.get_pops()
+        weights = self.rng.lognormal(mean=0, sigma=self.population_sigma, size=len(pops))
+        weights /= weights.sum()
+        # Core router of the end users of every PoP
+        user_routers = [core_routers[pop][self.rng.randint(len(core_routers[pop]))] for pop in pops]
+
+        shares = np.arange(1, self.num_hypergiants + 1, dtype=float) ** -self.hypergiant_zipf
+        shares /= shares.sum()
+
+        cdns = model.demand.DemandSet()
+        for h in range(self.num_hypergiants):
+            name = "hg{}".format(h)
+            volume = self.cdn_volume * shares[h]
+            num_sites = min(self.peering_sites_per_hypergiant, len(pops))
+            sites = self.rng.choice(len(pops), size=num_sites, replace=False, p=weights)
+            peering_nodes = list()
+            for p in sorted(sites):
+                routers = peering_routers[pops[p]] or core_routers[pops[p]]
+                parent = routers[self.rng.randint(len(routers))]
+                peering_nodes.append(
+                    model.demand.PeeringNode(
+                        nid="{}-{}".format(parent.id, name),
+                        parent=parent,
+                        capacity=float(volume * self.peering_capacity_factor / num_sites)
+                    )
+                )
+            user_nodes = list()
+            for p, router in enumerate(user_routers):
+                demand = float(volume * weights[p])
+                if demand < constants.MIN_DEMAND:
+                    continue
+                user_nodes.append(
+                    model.demand.EndUserNode(
+                        nid="{}-{}".format(router.id, name),
+                        parent=router,
+                        demand_volume=demand
+                    )
+                )
+            cdns.append(
+                model.demand.Hypergiant(
+                    name=name,
+                    peering_nodes=peering_nodes,
+                    user_nodes=user_nodes,
+                    parameters=self.parameter.get(name, None)
+                )
+            )
+
+        matrix = None
+        if self.background_volume > 0:
+            gravity = np.outer(weights, weights)
+            np.fill_diagonal(gravity, 0)
+            gravity *= self.background_volume / gravity.sum() if gravity.sum() > 0 else 0
+            matrix = model.demand.DemandMatrix()
+            for i, j in itertools.permutations(range(len(pops)), 2):
+                if gravity[i, j] < constants.MIN_DEMAND:
+                    continue
+                dem = model.demand.EndToEndDemand(user_routers[i], user_routers[j], volume=float(gravity[i, j]))
+                matrix[dem.key] = dem
+        self.logger.info("Generated {} hypergiants for {} PoPs and {} background demands".format(
+            len(cdns), len(pops), len(matrix) if matrix is not None else 0))
+        return cdns, matrix
+
+
+class SNDlibDemandMatrixGeneratorConfiguration(AbstractDemandGeneratorConfiguration):
+    def __init__(self, fname, scale=1.0, router="1"):
+        """
+
+        :param fname: SNDlib native (.txt) or XML (.xml) file with DEMANDS
+        :param scale: factor for the demand values
+        :param router: demands are located at the IP nodes "<PoP>-<router>"
+        """
+        self.fname = fname
+        self.scale = scale
+        self.router = router
+
+    def to_dict(self):
+        return {
+            'name': self.__class__.__name__,
+            'fname': self.fname,
+            'scale': self.scale,
+            'router': self.router
+        }
+
+    def produce(self, topology):
+        return SNDlibDemandMatrixGenerator(topology, self.fname, self.scale, self.router)
+
+    def config_name_prefix(self):
+        return ""
+
+
+class SNDlibDemandMatrixGenerator(AbstractDemandGenerator):
+    """
+    Reads the demands of an SNDlib file as background demand. Demands between the same PoPs are summed up.
+    """
+
+    def __init__(self, topology, fname, scale, router):
+        self.logger = logging.getLogger(self.__module__ + '.' + self.__class__.__name__)
+        self.topology = topology
+        self.fname = fname
+        self.scale = scale
+        self.router = router
+
+    def generate(self):
+        _, _, demands = generator.topology_generator.OpticalTopologyFromFileGenerator.parse(self.fname)
+        matrix = model.demand.DemandMatrix()
+        for src, dst, value in demands:
+            if src == dst or value * self.scale < constants.MIN_DEMAND:
+                continue
+            src = self.topology.get_node_by_id(generator.topology_generator.get_ip_node_id(
+                generator.topology_generator.get_pop_name(src), self.router))
+            dst = self.topology.get_node_by_id(generator.topology_generator.get_ip_node_id(
+                generator.topology_generator.get_pop_name(dst), self.router))
+            dem = model.demand.EndToEndDemand(src, dst, volume=value * self.scale)
+            if dem.key in matrix:
+                matrix[dem.key].volume += dem.volume
+            else:
+                matrix[dem.key] = dem
+        return None, matrix
@@ -1,8 +1,13 @@
+import itertools
 import logging
 import csv
-import constants
+import math
+import xml.etree.ElementTree
 
+import networkx as nx
+import numpy as np
 
+import constants
 import model.topology
 
 
@@ -300,3 +305,421 @@ class ComposedTopologyGenerator(AbstractTopologyGenerator):
             topology = model.topology.Topology(parameter=self.parameter)
         topology = self.opt_topo_generator.generate(topology)
         return self.ip_topo_generator.generate(topology)
+
+
+def get_haversine_distance(lon1, lat1, lon2, lat2):
+    """
+    :return: great-circle distance in km between two coordinates in degrees
+    """
+    lon1, lat1, lon2, lat2 = map(math.radians, [lon1, lat1, lon2, lat2])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(a))
+
+
+def get_pop_name(name):
+    """
+    Sanitizes a PoP name from a file for node ids: replaces "-" and whitespace with "_".
+    """
+    return "_".join(str(name).replace("-", "_").split())
+
+
+def get_ip_node_id(pop, router):
+    """
+    :return: id "<PoP>-<router>" of a router of a PoP. Router names must not contain "-", PoP names may
+    """
+    return "{}-{}".format(pop, router)
+
+
+def split_ip_node_id(nid):
+    """
+    Inverse of get_ip_node_id(): the PoP is the part before the last "-". Ids without "-" are PoPs without router name
+    :return: (tuple) of PoP and router name
+    """
+    pop, _, router = nid.rpartition("-")
+    if pop == "":
+        return nid, ""
+    return pop, router
+
+
+def get_optical_node_pop(nid):
+    """
+    :return: PoP of the optical node "O-<PoP>"
+    """
+    return nid.split("-", 1)[1]
+
+
+def add_fiber_graph(topology, graph, fiber_capacity):
+    """
+    Adds an optical node "O-<PoP>" per node of the graph and bidirectional fibers for its edges.
+    :param topology: (model.topology.Topology)
+    :param graph: (nx.Graph) with PoP names as nodes and edge attribute 'weight'
+    :param fiber_capacity: capacity of every fiber
+    """
+    for name in graph.nodes:
+        topology.add_node(model.topology.OpticalNode(nid="O-{}".format(name)))
+    for e, f, weight in graph.edges(data='weight', default=1):
+        e = topology.get_node_by_id("O-{}".format(e))
+        f = topology.get_node_by_id("O-{}".format(f))
+        topology.add_edge(model.topology.OpticalLink(e, f, capacity=fiber_capacity), weight)
+        topology.add_edge(model.topology.OpticalLink(f, e, capacity=fiber_capacity), weight)
+    return topology
+
+
+class SyntheticOpticalTopologyGeneratorConfiguration(AbstractTopologyGeneratorConfiguration):
+    FIBER_CAPACITY = 10
+
+    GRAPH_RING = "ring"
+    GRAPH_MESH = "mesh"
+    GRAPH_WAXMAN = "waxman"
+
+    def __init__(self, num_nodes, graph_type=GRAPH_MESH, fiber_capacity=None, mean_degree=3, waxman_alpha=0.4,
+                 waxman_beta=0.2, size_km=1000, seed=0):
+        """
+
+        :param num_nodes: number of optical nodes (PoPs)
+        :param graph_type: GRAPH_RING, GRAPH_MESH (ring plus the shortest chords up to mean_degree) or GRAPH_WAXMAN
+        :param fiber_capacity:
+        :param mean_degree: mean nodal degree of GRAPH_MESH
+        :param waxman_alpha: alpha of the Waxman model (edge density)
+        :param waxman_beta: beta of the Waxman model (ratio of long to short edges)
+        :param size_km: PoPs are placed uniformly in a square with this edge length. Fiber weights are distances in km
+        :param seed:
+        """
+        if graph_type not in [self.GRAPH_RING, self.GRAPH_MESH, self.GRAPH_WAXMAN]:
+            raise ValueError("Unknown graph type: {}".format(graph_type))
+        self.num_nodes = num_nodes
+        self.graph_type = graph_type
+        self.fiber_capacity = fiber_capacity
+        if self.fiber_capacity is None:
+            self.fiber_capacity = self.FIBER_CAPACITY
+        self.mean_degree = mean_degree
+        self.waxman_alpha = waxman_alpha
+        self.waxman_beta = waxman_beta
+        self.size_km = size_km
+        self.seed = seed
+
+    def to_dict(self):
+        return {
+            'name': self.__class__.__name__,
+            'num_nodes': self.num_nodes,
+            'graph_type': self.graph_type,
+            'fiber_capacity': self.fiber_capacity,
+            'mean_degree': self.mean_degree,
+            'waxman_alpha': self.waxman_alpha,
+            'waxman_beta': self.waxman_beta,
+            'size_km': self.size_km,
+            'seed': self.seed
+        }
+
+    def produce(self):
+        return SyntheticOpticalTopologyGenerator(
+            num_nodes=self.num_nodes,
+            graph_type=self.graph_type,
+            fiber_capacity=self.fiber_capacity,
+            mean_degree=self.mean_degree,
+            waxman_alpha=self.waxman_alpha,
+            waxman_beta=self.waxman_beta,
+            size_km=self.size_km,
+            seed=self.seed
+        )
+
+    def config_name_prefix(self):
+        return ""
+
+
+class SyntheticOpticalTopologyGenerator(AbstractTopologyGenerator):
+    """
+    Generates a seeded random optical topology. PoPs are named P0, P1, ... and placed uniformly in a square. All graphs
+    are connected; the ring and mesh graphs are 2-edge-connected.
+    """
+
+    def __init__(self, num_nodes, graph_type, fiber_capacity, mean_degree, waxman_alpha, waxman_beta, size_km, seed):
+        super(SyntheticOpticalTopologyGenerator, self).__init__()
+        self.num_nodes = num_nodes
+        self.graph_type = graph_type
+        self.fiber_capacity = fiber_capacity
+        self.mean_degree = mean_degree
+        self.waxman_alpha = waxman_alpha
+        self.waxman_beta = waxman_beta
+        self.size_km = size_km
+        self.rng = np.random.RandomState(seed=seed)
+
+    def get_distance(self, pos, m, n):
+        return max(1, int(round(np.linalg.norm(pos[m] - pos[n]))))
+
+    def generate_ring(self, pos):
+        """
+        Ring through the PoPs in the order of their angle around the center, which avoids crossing fibers.
+        """
+        graph = nx.Graph()
+        graph.add_nodes_from(range(self.num_nodes))
+        center = pos.mean(axis=0)
+        order = np.argsort(np.arctan2(pos[:, 1] - center[1], pos[:, 0] - center[0]))
+        if self.num_nodes > 1:
+            for m, n in zip(order, np.roll(order, -1)):
+                if m != n and not graph.has_edge(m, n):
+                    graph.add_edge(int(m), int(n))
+        return graph
+
+    def generate_mesh(self, pos):
+        graph = self.generate_ring(pos)
+        num_edges = int(round(self.num_nodes * self.mean_degree / 2))
+        chords = sorted(
+            (np.linalg.norm(pos[m] - pos[n]), m, n) for m, n in itertools.combinations(range(self.num_nodes), 2)
+            if not graph.has_edge(m, n)
+        )
+        for _, m, n in chords[:max(0, num_edges - graph.number_of_edges())]:
+            graph.add_edge(m, n)
+        return graph
+
+    def generate_waxman(self, pos):
+        """
+        Waxman graph: PoPs m, n are connected with probability alpha * exp(-d(m, n) / (beta * L)), where L is the
+        maximum distance. Components are joined by their closest pair of PoPs.
+        """
+        graph = nx.Graph()
+        graph.add_nodes_from(range(self.num_nodes))
+        dist = np.linalg.norm(pos[:, np.newaxis, :] - pos[np.newaxis, :, :], axis=2)
+        max_dist = dist.max() if self.num_nodes > 1 else 1
+        prob = self.waxman_alpha * np.exp(-dist / (self.waxman_beta * max_dist))
+        draw = self.rng.uniform(size=dist.shape)
+        for m, n in itertools.combinations(range(self.num_nodes), 2):
+            if draw[m, n] < prob[m, n]:
+                graph.add_edge(m, n)
+        components = [list(c) for c in nx.connected_components(graph)]
+        while len(components) > 1:
+            first = components.pop(0)
+            others = [n for c in components for n in c]
+            sub = dist[np.ix_(first, others)]
+            i, j = np.unravel_index(np.argmin(sub), sub.shape)
+            graph.add_edge(first[i], others[j])
+            components = [list(c) for c in nx.connected_components(graph)]
+        return graph
+
+    def generate(self, topology=None):
+        if topology is None:
+            topology = model.topology.Topology()
+        pos = self.rng.uniform(0, self.size_km, size=(self.num_nodes, 2))
+        if self.graph_type == SyntheticOpticalTopologyGeneratorConfiguration.GRAPH_RING:
+            graph = self.generate_ring(pos)
+        elif self.graph_type == SyntheticOpticalTopologyGeneratorConfiguration.GRAPH_MESH:
+            graph = self.generate_mesh(pos)
+        else:
+            graph = self.generate_waxman(pos)
+
+        pop_graph = nx.Graph()
+        pop_graph.add_nodes_from("P{}".format(n) for n in range(self.num_nodes))
+        for m, n in sorted(tuple(sorted(e)) for e in graph.edges):
+            pop_graph.add_edge("P{}".format(m), "P{}".format(n), weight=self.get_distance(pos, m, n))
+        self.logger.info("Generated {} graph with {} PoPs and {} fibers".format(
+            self.graph_type, pop_graph.number_of_nodes(), pop_graph.number_of_edges()))
+        return add_fiber_graph(topology, pop_graph, self.fiber_capacity)
+
+
+class OpticalTopologyFromFileGeneratorConfiguration(AbstractTopologyGeneratorConfiguration):
+    FIBER_CAPACITY = 10
+
+    def __init__(self, fname, fiber_capacity=None):
+        """
+
+        :param fname: local SNDlib native (.txt) or XML (.xml) file or Topology Zoo GraphML (.graphml) or GML (.gml)
+            file
+        :param fiber_capacity:
+        """
+        self.fname = fname
+        self.fiber_capacity = fiber_capacity
+        if self.fiber_capacity is None:
+            self.fiber_capacity = self.FIBER_CAPACITY
+
+    def to_dict(self):
+        return {
+            'name': self.__class__.__name__,
+            'fname': self.fname,
+            'fiber_capacity': self.fiber_capacity
+        }
+
+    def produce(self):
+        return OpticalTopologyFromFileGenerator(self.fname, self.fiber_capacity)
+
+    def config_name_prefix(self):
+        return ""
+
+
+class OpticalTopologyFromFileGenerator(AbstractTopologyGenerator):
+    """
+    Reads the optical topology from an SNDlib or Topology Zoo file. PoP names are sanitized with get_pop_name().
+    Fiber weights are great-circle distances in km if the nodes have coordinates, 1 otherwise. Parallel links are
+    merged.
+    """
+
+    def __init__(self, fname, fiber_capacity):
+        super(OpticalTopologyFromFileGenerator, self).__init__()
+        self.fname = fname
+        self.fiber_capacity = fiber_capacity
+
+    @staticmethod
+    def parse_sndlib_native(fname):
+        """
+        :return: (tuple) of dict of node name -> (lon, lat), list of (node, node) links and list of
+            (node, node, demand value) demands
+        """
+        section = None
+        nodes = dict()
+        links = list()
+        demands = list()
+        with open(fname) as fd:
+            for line in fd:
+                line = line.split("#")[0].strip()
+                if len(line) == 0:
+                    continue
+                if line.endswith("(") and "(" not in line[:-1]:
+                    section = line[:-1].strip()
+                    continue
+                if line == ")":
+                    section = None
+                    continue
+                tokens = line.replace("(", " ( ").replace(")", " ) ").split()
+                if section == "NODES":
+                    # <id> ( <lon> <lat> )
+                    nodes[tokens[0]] = (float(tokens[2]), float(tokens[3]))
+                elif section == "LINKS":
+                    # <id> ( <source> <target> ) ...
+                    links.append((tokens[2], tokens[3]))
+                elif section == "DEMANDS":
+                    # <id> ( <source> <target> ) <routing unit> <demand value> <max path length>
+                    demands.append((tokens[2], tokens[3], float(tokens[6])))
+        return nodes, links, demands
+
+    @staticmethod
+    def parse_sndlib_xml(fname):
+        """
+        :return: same as parse_sndlib_native()
+        """
+        root = xml.etree.ElementTree.parse(fname).getroot()
+        namespace = root.tag[:root.tag.index("}") + 1] if root.tag.startswith("{") else ""
+
+        nodes = dict()
+        for node in root.iter(namespace + "node"):
+            x = node.find("{0}coordinates/{0}x".format(namespace))
+            y = node.find("{0}coordinates/{0}y".format(namespace))
+            nodes[node.get("id")] = (float(x.text), float(y.text)) if x is not None and y is not None else None
+        links = [
+            (link.find(namespace + "source").text, link.find(namespace + "target").text)
+            for link in root.iter(namespace + "link")
+        ]
+        demands = [
+            (demand.find(namespace + "source").text, demand.find(namespace + "target").text,
+             float(demand.find(namespace + "demandValue").text))
+            for demand in root.iter(namespace + "demand")
+        ]
+        return nodes, links, demands
+
+    @staticmethod
+    def parse_topology_zoo(fname):
+        """
+        :return: (tuple) of dict of node name -> (lon, lat) or None and list of (node, node) links
+        """
+        if fname.endswith(".gml"):
+            graph = nx.read_gml(fname, label=None)
+        else:
+            graph = nx.read_graphml(fname)
+        labels = {n: data.get("label", n) for n, data in graph.nodes(data=True)}
+        if len(set(labels.values())) < len(labels):
+            # Topology Zoo labels are not always unique
+            labels = {n: "{}_{}".format(label, n) for n, label in labels.items()}
+        nodes = dict()
+        for n, data in graph.nodes(data=True):
+            if "Longitude" in data and "Latitude" in data:
+                nodes[labels[n]] = (float(data["Longitude"]), float(data["Latitude"]))
+            else:
+                nodes[labels[n]] = None
+        links = [(labels[m], labels[n]) for m, n in graph.edges()]
+        return nodes, links
+
+    @classmethod
+    def parse(cls, fname):
+        """
+        :return: (tuple) of dict of node name -> (lon, lat) or None, list of (node, node) links and list of
+            (node, node, demand value) demands (empty for Topology Zoo)
+        """
+        if fname.endswith(".txt"):
+            return cls.parse_sndlib_native(fname)
+        if fname.endswith(".xml"):
+            return cls.parse_sndlib_xml(fname)
+        if fname.endswith(".graphml") or fname.endswith(".gml"):
+            return cls.parse_topology_zoo(fname) + (list(),)
+        raise ValueError("Unknown topology file format: {}".format(fname))
+
+    def generate(self, topology=None):
+        if topology is None:
+            topology = model.topology.Topology()
+        nodes, links, _ = self.parse(self.fname)
+
+        graph = nx.Graph()
+        graph.add_nodes_from(get_pop_name(n) for n in nodes)
+        for m, n in links:
+            if m == n or graph.has_edge(get_pop_name(m), get_pop_name(n)):
+                continue
+            weight = 1
+            if nodes.get(m) is not None and nodes.get(n) is not None:
+                weight = max(1, int(round(get_haversine_distance(*nodes[m], *nodes[n]))))
+            graph.add_edge(get_pop_name(m), get_pop_name(n), weight=weight)
+        self.logger.info("Read {} PoPs and {} fibers from {}".format(
+            graph.number_of_nodes(), graph.number_of_edges(), self.fname))
+        return add_fiber_graph(topology, graph, self.fiber_capacity)
+
+
+class IPRoutersPerPoPGeneratorConfiguration(AbstractTopologyGeneratorConfiguration):
+    NUM_TRANSCEIVER = 10
+
+    def __init__(self, num_core_routers=1, num_peering_routers=1, num_transceiver=None):
+        """
+
+        :param num_core_routers: IP routers "<PoP>-<i>" per PoP, which connect the end users
+        :param num_peering_routers: peering routers "<PoP>-E<i>" per PoP, which connect the hypergiants
+        :param num_transceiver: transceivers per router
+        """
+        self.num_core_routers = num_core_routers
+        self.num_peering_routers = num_peering_routers
+        self.num_transceiver = num_transceiver
+        if self.num_transceiver is None:
+            self.num_transceiver = self.NUM_TRANSCEIVER
+
+    def to_dict(self):
+        return {
+            'name': self.__class__.__name__,
+            'num_core_routers': self.num_core_routers,
+            'num_peering_routers': self.num_peering_routers,
+            'num_transceiver': self.num_transceiver
+        }
+
+    def produce(self):
+        return IPRoutersPerPoPGenerator(self.num_core_routers, self.num_peering_routers, self.num_transceiver)
+
+    def config_name_prefix(self):
+        return ""
+
+
+class IPRoutersPerPoPGenerator(AbstractTopologyGenerator):
+    """
+    Adds the same number of core and peering routers to every optical node "O-<PoP>" of the topology.
+    """
+
+    def __init__(self, num_core_routers, num_peering_routers, num_transceiver):
+        super(IPRoutersPerPoPGenerator, self).__init__()
+        self.num_core_routers = num_core_routers
+        self.num_peering_routers = num_peering_routers
+        self.num_transceiver = num_transceiver
+
+    def generate(self, topology=None):
+        if topology is None:
+            raise ValueError("No optical topology provided.")
+        for opt_node in list(topology.opt_nodes):
+            pop = get_optical_node_pop(opt_node.id)
+            router_ids = [get_ip_node_id(pop, i + 1) for i in range(self.num_core_routers)] + \
+                [get_ip_node_id(pop, "E{}".format(i + 1)) for i in range(self.num_peering_routers)]
+            for nid in router_ids:
+                topology.add_node(
+                    model.topology.IPNode(nid=nid, parent=opt_node, num_transceiver=self.num_transceiver)
+                )
+        return topology
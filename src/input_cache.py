@@ -0,0 +1,261 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import collections
+
+"""
+In-process cache of the topologies and demand sets produced from configurations (see
+scenario.ScenarioConfiguration.produce()). Scenarios of a sweep that share their inputs, e.g., with different
+algorithms, fixed layers or comments, get the same objects instead of parsing the input files again. Cached objects
+are shared between scenarios and must not be modified after they were generated.
+Entries are keyed by the configuration dict and the size and modification time of the input files it refers to, so
+changed files are read again. The least recently used entries are evicted.
+Optionally, the produced inputs are also stored on disk (see set_cache_dir()), so that restarted processes load them
+instead of producing them again.
+"""
+
+# Version of the on-disk cache files. Has to be increased when the pickled classes change, e.g., of the topology
+FILE_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache(object):
+    def __init__(self, max_entries):
+        """
+
+        :param max_entries: number of cached objects, 0 disables the cache
+        """
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_produce(self, key, produce, is_valid=None):
+        """
+        :param key: hashable key of the object
+        :param produce: function without arguments that produces the object if it is not cached
+        :param is_valid: function that checks if a cached object can be used, it is produced again otherwise
+        """
+        if key in self.entries and (is_valid is None or is_valid(self.entries[key])):
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        value = produce()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        if self.max_entries > 0:
+            self.entries[key] = value
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+_topologies = LRUCache(8)
+_demands = LRUCache(16)
+# Inherited by subprocesses through the environment (see set_cache_dir())
+_cache_dir = os.environ.get("INPUT_CACHE_DIR")
+# Content hashes of input files by (path, size, modification time)
+_file_hashes = dict()
+
+
+def configure(max_topologies=8, max_demands=16):
+    """
+    Sets the number of cached topologies and demand sets (with their background demands) of this process. 0
+    disables the cache.
+    """
+    global _topologies, _demands
+    _topologies = LRUCache(max_topologies)
+    _demands = LRUCache(max_demands)
+
+
+def set_cache_dir(path):
+    """
+    Enables the on-disk cache of produced inputs. Inputs are stored as <path>/inputs_v<version>_<hash>.pkl (see
+    get_content_hash()). Files are never removed. The directory is also set as environment variable INPUT_CACHE_DIR,
+    so that subprocesses (e.g., of control.IsolatedRunner) use it.
+    :param path: directory or None to disable the cache
+    """
+    global _cache_dir
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+        os.environ["INPUT_CACHE_DIR"] = path
+    else:
+        os.environ.pop("INPUT_CACHE_DIR", None)
+    _cache_dir = path
+
+
+def get_cache_dir():
+    return _cache_dir
+
+
+def _get_file_fingerprints(value, out):
+    if isinstance(value, dict):
+        for v in value.values():
+            _get_file_fingerprints(v, out)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _get_file_fingerprints(v, out)
+    elif isinstance(value, str) and os.path.isfile(value):
+        stat = os.stat(value)
+        out.append((value, stat.st_size, stat.st_mtime_ns))
+    return out
+
+
+def get_key(config_dict):
+    """
+    :return: (tuple) content key of a generator configuration: its dict and the size and modification time of the
+        files it refers to
+    """
+    return json.dumps(config_dict, sort_keys=True, default=str), tuple(_get_file_fingerprints(config_dict, list()))
+
+
+def produce_topology(topology_configuration):
+    """
+    :return: (model.topology.Topology) of the configuration, cached
+    """
+    key = get_key(topology_configuration.to_dict())
+    return _topologies.get_or_produce(key, lambda: topology_configuration.produce().generate())
+
+
+def produce_demand(demand_configuration, topology_configuration, topology):
+    """
+    :param topology: topology produced by produce_topology() from topology_configuration
+    :return: (demand set, background demand) of the configuration, cached
+    """
+    key = (get_key(demand_configuration.to_dict()), get_key(topology_configuration.to_dict()))
+    # Demand sets refer to the nodes of their topology. They can not be used with a topology that was produced again
+    _, demands = _demands.get_or_produce(
+        key,
+        lambda: (topology, demand_configuration.produce(topology).generate()),
+        lambda entry: entry[0] is topology
+    )
+    return demands
+
+
+def _get_file_hash(fname, size, mtime_ns):
+    file_hash = _file_hashes.get((fname, size, mtime_ns))
+    if file_hash is None:
+        sha = hashlib.sha256()
+        with open(fname, "rb") as fd:
+            for block in iter(lambda: fd.read(1 << 20), b""):
+                sha.update(block)
+        file_hash = sha.hexdigest()
+        _file_hashes[fname, size, mtime_ns] = file_hash
+    return file_hash
+
+
+def get_content_hash(topology_configuration, demand_configuration):
+    """
+    Hash of the generator parameters and the contents of the input files they refer to.
+    :return: (str)
+    """
+    config_dicts = [topology_configuration.to_dict(), demand_configuration.to_dict()]
+    file_hashes = [(fname, _get_file_hash(fname, size, mtime_ns))
+                   for fname, size, mtime_ns in _get_file_fingerprints(config_dicts, list())]
+    return hashlib.sha256(bytes(json.dumps([config_dicts, file_hashes], sort_keys=True, default=str),
+                                encoding="utf-8")).hexdigest()
+
+
+def _get_cache_fname(topology_configuration, demand_configuration):
+    # Files of other versions are never unpickled, their classes might have changed
+    return os.path.join(_cache_dir, "inputs_v{}_{}.pkl".format(
+        FILE_VERSION, get_content_hash(topology_configuration, demand_configuration)))
+
+
+def load_inputs(topology_configuration, demand_configuration):
+    """
+    Loads the inputs from the on-disk cache into the in-process cache. Inputs that are in the in-process cache
+    already are not loaded.
+    :return: (topology, demand set, background demand) or None if the on-disk cache is disabled or has no entry
+    """
+    if _cache_dir is None:
+        return None
+    topology_key = get_key(topology_configuration.to_dict())
+    demand_key = (get_key(demand_configuration.to_dict()), topology_key)
+    if topology_key in _topologies.entries and demand_key in _demands.entries:
+        return None
+    fname = _get_cache_fname(topology_configuration, demand_configuration)
+    if not os.path.exists(fname):
+        return None
+    try:
+        with open(fname, "rb") as fd:
+            data = pickle.load(fd)
+    except Exception as e:
+        logger.warning("Could not load inputs from {}: {}".format(fname, e))
+        return None
+    topology = data["topology"]
+    _topologies.put(topology_key, topology)
+    _demands.put(demand_key, (topology, (data["demandset"], data["background_demand"])))
+    logger.info("Loaded inputs from {}".format(fname))
+    return topology, data["demandset"], data["background_demand"]
+
+
+def store_inputs(topology_configuration, demand_configuration, topology, demandset, background_demand):
+    """
+    Writes produced inputs to the on-disk cache, including the optical path table of the topology.
+    """
+    if _cache_dir is None:
+        return
+    fname = _get_cache_fname(topology_configuration, demand_configuration)
+    if os.path.exists(fname):
+        return
+    # Computed here so that loading the inputs does not enumerate the paths again
+    topology.optical_path_table
+    tmp_fname = fname + ".{}.tmp".format(os.getpid())
+    try:
+        with open(tmp_fname, "wb") as fd:
+            # One pickle, so that the demand set refers to the nodes of the loaded topology
+            pickle.dump({
+                'topology': topology,
+                'demandset': demandset,
+                'background_demand': background_demand
+            }, fd, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, RecursionError) as e:
+        # Nodes and links refer to each other, large topologies can exceed the recursion limit
+        logger.warning("Could not write inputs to {}: {}".format(fname, e))
+        os.remove(tmp_fname)
+        return
+    os.replace(tmp_fname, fname)
+    logger.info("Wrote inputs to {}".format(fname))
+
+
+def get_stats():
+    """
+    :return: (dict) hits and misses of the topology and demand caches of this process
+    """
+    return {
+        'topology_hits': _topologies.hits,
+        'topology_misses': _topologies.misses,
+        'demand_hits': _demands.hits,
+        'demand_misses': _demands.misses
+    }
+
+
+def get_hit_rate(stats):
+    """
+    :param stats: (dict) see get_stats(), e.g., summed up over several processes
+    :return: (float) share of produced topologies and demand sets that were cached, None if nothing was produced
+    """
+    hits = stats['topology_hits'] + stats['demand_hits']
+    total = hits + stats['topology_misses'] + stats['demand_misses']
+    return hits / total if total > 0 else None
+
+
+def log_stats(stats, log=None):
+    """
+    Logs the hit rate of the stats (see get_stats())
+    """
+    hit_rate = get_hit_rate(stats)
+    if hit_rate is None:
+        return
+    (log or logger).info(
+        "Input cache hit rate {:.0%} (topologies: {} hits, {} misses; demands: {} hits, {} misses)".format(
+            hit_rate, stats['topology_hits'], stats['topology_misses'], stats['demand_hits'], stats['demand_misses']))
@@ -0,0 +1,106 @@
+import contextlib
+import functools
+import resource
+import time
+
+# Dict-valued metric groups written by Instrumentation.to_metrics()
+METRIC_GROUPS = ["timings", "num_variables", "num_constraints"]
+
+
+def get_peak_rss_mb():
+    """
+    :return: peak resident set size of this process in MB. Worker processes that are reused (e.g., by
+        control.ParallelRunner) report the peak over all scenarios they ran
+    """
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Instrumentation(object):
+    """
+    Collects wall-clock timings (s) of the phases of a scenario and the number of variables and constraints per family.
+    Timings of phases with the same name are summed up. Counts are exclusive, i.e., variables and rows added by a
+    nested instrumented phase are only counted for the nested phase. The first variable and row of every phase are
+    recorded in family_starts to name models that were built without names (see
+    algorithm.mip.AbstractMixedIntegerProgram.set_names()).
+    """
+
+    def __init__(self):
+        self.timings = dict()
+        self.num_variables = dict()
+        self.num_constraints = dict()
+        self._child_counts = list()
+        # (first variable, first row, family) whenever the innermost phase changes. family is None outside of phases
+        self.family_starts = list()
+        self._families = list()
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - t_start
+
+    @contextlib.contextmanager
+    def phase(self, name, get_model_size):
+        """
+        Times the phase and counts the variables and constraints it adds.
+        :param name: name of the phase, e.g., the method name
+        :param get_model_size: function returning (number of variables, number of constraints) of the model
+        """
+        num_vars, num_rows = get_model_size()
+        family = get_family(name)
+        self.family_starts.append((num_vars, num_rows, family))
+        self._families.append(family)
+        self._child_counts.append([0, 0])
+        try:
+            with self.timer(name):
+                yield
+        finally:
+            child_vars, child_rows = self._child_counts.pop()
+            new_vars, new_rows = get_model_size()
+            self._families.pop()
+            self.family_starts.append((new_vars, new_rows, self._families[-1] if self._families else None))
+            new_vars -= num_vars
+            new_rows -= num_rows
+            if self._child_counts:
+                self._child_counts[-1][0] += new_vars
+                self._child_counts[-1][1] += new_rows
+            if new_vars - child_vars > 0:
+                self.num_variables[family] = self.num_variables.get(family, 0) + new_vars - child_vars
+            if new_rows - child_rows > 0:
+                self.num_constraints[family] = self.num_constraints.get(family, 0) + new_rows - child_rows
+
+    def reset_timings(self):
+        self.timings = dict()
+
+    def to_metrics(self):
+        return {
+            "timings": dict(self.timings),
+            "num_variables": dict(self.num_variables),
+            "num_constraints": dict(self.num_constraints)
+        }
+
+
+def get_family(name):
+    """
+    Variable or constraint family of a build method, e.g., build_variable_flow_cdn -> flow_cdn. Other methods (fix_*,
+    limit_*) are their own family.
+    """
+    for prefix in ["build_variable_", "build_constraint_", "build_"]:
+        if name.startswith(prefix):
+            return name[len(prefix):]
+    return name
+
+
+def instrumented(method):
+    """
+    Records the timing and the added variables and constraints of a model building method. The instance needs the
+    attribute instrumentation and the method get_model_size() (see algorithm.mip.AbstractMixedIntegerProgram).
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.instrumentation.phase(method.__name__, self.get_model_size):
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import pickle
+import asyncio
+import logging
+import tempfile
+import traceback
+
+import output.file_writer
+
+"""
+Runs scenarios in their own subprocess (see control.IsolatedRunner). A subprocess that runs past its deadline or uses
+more memory than allowed is killed without affecting the others. Usage of the subprocess:
+    python3 isolation.py <pickled scenario configuration> <result file>
+"""
+
+# Outcomes of a scenario
+STATUS_SOLVED = "solved"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+STATUS_MEMORY = "memory_limit"
+STATUS_CANCELLED = "cancelled"
+STATUS_CRASHED = "crashed"
+
+# Time (s) between SIGTERM and SIGKILL
+KILL_GRACE_TIME = 5
+
+
+def get_rss_mb(pid):
+    """
+    :return: current resident set size of the process in MB or None if it is unknown (not Linux or process is gone)
+    """
+    try:
+        with open("/proc/{}/statm".format(pid), "r") as fd:
+            return int(fd.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Outcome(object):
+    def __init__(self, index, config_hash, status, wall_time=None, peak_rss_mb=None, returncode=None, error=None):
+        """
+
+        :param index: position of the scenario in the list of the runner
+        :param config_hash: see output.file_writer.get_config_hash()
+        :param status: one of the STATUS_* constants
+        :param wall_time: time (s) until the subprocess finished or was killed
+        :param peak_rss_mb: highest observed resident set size of the subprocess
+        :param returncode: exit code of the subprocess, negative for the signal that ended it
+        :param error: traceback or reason of the failure
+        """
+        self.index = index
+        self.config_hash = config_hash
+        self.status = status
+        self.wall_time = wall_time
+        self.peak_rss_mb = peak_rss_mb
+        self.returncode = returncode
+        self.error = error
+
+    def to_dict(self):
+        return {
+            'index': self.index,
+            'config_hash': self.config_hash,
+            'status': self.status,
+            'wall_time': self.wall_time,
+            'peak_rss_mb': self.peak_rss_mb,
+            'returncode': self.returncode,
+            'error': self.error
+        }
+
+
+class IsolatedScenario(object):
+    """
+    One scenario in a subprocess, monitored from the event loop of the runner.
+    """
+
+    def __init__(self, index, scenario_config, timeout=None, max_rss_mb=None, poll_interval=1):
+        """
+
+        :param timeout: wall-clock deadline (s) of the subprocess, None for no deadline
+        :param max_rss_mb: resident set size at which the subprocess is killed, None for no limit
+        :param poll_interval: time (s) between two checks of the deadline and the memory
+        """
+        self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
+        self.index = index
+        self.scenario_config = scenario_config
+        self.config_hash = output.file_writer.get_config_hash(scenario_config)
+        self.timeout = timeout
+        self.max_rss_mb = max_rss_mb
+        self.poll_interval = poll_interval
+
+    async def _kill(self, proc):
+        if proc.returncode is not None:
+            return
+        proc.terminate()
+        try:
+            await asyncio.wait_for(proc.wait(), KILL_GRACE_TIME)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+
+    async def _watch(self, proc, t_start):
+        """
+        Waits for the subprocess and kills it when it exceeds the deadline or the memory limit.
+        :return: (status or None if the subprocess ended by itself, peak RSS in MB)
+        """
+        peak_rss = None
+        while True:
+            wait_time = self.poll_interval
+            if self.timeout is not None:
+                wait_time = max(0, min(wait_time, t_start + self.timeout - time.perf_counter()))
+            try:
+                await asyncio.wait_for(proc.wait(), wait_time)
+                return None, peak_rss
+            except asyncio.TimeoutError:
+                pass
+            rss = get_rss_mb(proc.pid)
+            if rss is not None:
+                peak_rss = max(rss, peak_rss or 0)
+            if self.max_rss_mb is not None and rss is not None and rss > self.max_rss_mb:
+                await self._kill(proc)
+                return STATUS_MEMORY, peak_rss
+            if self.timeout is not None and time.perf_counter() - t_start >= self.timeout:
+                await self._kill(proc)
+                return STATUS_TIMEOUT, peak_rss
+
+    async def run(self):
+        """
+        :return: (Outcome)
+        """
+        with tempfile.TemporaryDirectory(prefix="scenario_") as tmp_dir:
+            config_fname = os.path.join(tmp_dir, "config.pkl")
+            result_fname = os.path.join(tmp_dir, "result.json")
+            with open(config_fname, "wb") as fd:
+                pickle.dump(self.scenario_config, fd)
+            # The subprocess has to import the same modules to unpickle the configuration
+            env = dict(os.environ)
+            env["PYTHONPATH"] = os.pathsep.join(os.path.abspath(p) for p in sys.path if p)
+
+            t_start = time.perf_counter()
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__), config_fname, result_fname, env=env)
+            try:
+                status, peak_rss = await self._watch(proc, t_start)
+            except asyncio.CancelledError:
+                await self._kill(proc)
+                self.logger.warning("Cancelled scenario {}".format(self.config_hash))
+                return Outcome(self.index, self.config_hash, STATUS_CANCELLED, time.perf_counter() - t_start,
+                               returncode=proc.returncode)
+            wall_time = time.perf_counter() - t_start
+
+            error = None
+            if status is None:
+                if os.path.exists(result_fname):
+                    with open(result_fname, "r") as fd:
+                        result = json.load(fd)
+                    status, error = result["status"], result.get("error")
+                else:
+                    status, error = STATUS_CRASHED, "Subprocess ended with code {}".format(proc.returncode)
+            elif status == STATUS_TIMEOUT:
+                error = "Deadline of {}s exceeded".format(self.timeout)
+            elif status == STATUS_MEMORY:
+                error = "Memory limit of {} MB exceeded".format(self.max_rss_mb)
+        if status != STATUS_SOLVED and status != STATUS_SKIPPED:
+            self.logger.error("Scenario {} {}: {}".format(self.config_hash, status, error))
+        return Outcome(self.index, self.config_hash, status, wall_time, peak_rss, proc.returncode, error)
+
+
+def run_in_subprocess(config_fname, result_fname):
+    """
+    Runs the pickled scenario configuration and writes the status (and traceback) as JSON.
+    """
+    try:
+        with open(config_fname, "rb") as fd:
+            sconfig = pickle.load(fd)
+        sol = sconfig.produce().run()
+        result = {'status': STATUS_SOLVED if sol is not None else STATUS_SKIPPED}
+    except Exception:
+        result = {'status': STATUS_FAILED, 'error': traceback.format_exc()}
+    with open(result_fname, "w") as fd:
+        json.dump(result, fp=fd)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(levelname)s - %(asctime)s - %(process)d - %(name)s  - %(message)s')
+    run_in_subprocess(sys.argv[1], sys.argv[2])
@@ -52,10 +52,30 @@ class PeeringNode(Node):
 
 
 class DemandSet(list):
-    pass
+    """
+    List of hypergiants with an index by name. The index is rebuilt when hypergiants were added or removed.
+    """
+    _hypergiants_by_name = None
+    _indexed_length = -1
+
+    def get_hypergiant(self, name):
+        if self._indexed_length != len(self):
+            self._hypergiants_by_name = dict()
+            for hg in self:
+                self._hypergiants_by_name.setdefault(hg.name, hg)
+            self._indexed_length = len(self)
+        try:
+            return self._hypergiants_by_name[name]
+        except KeyError:
+            raise ValueError("Hypergiant not found: {}".format(name))
 
 
 class Hypergiant(object):
+    # Defaults also apply to instances unpickled from older versions
+    _peering_nodes_by_id = None
+    _peering_nodes_by_router = None
+    _indexed_length = -1
+
     def __init__(self, name, peering_nodes=None, user_nodes=None, parameters=None):
         self.name = name
         self._peering_nodes = peering_nodes
@@ -82,11 +102,36 @@ class Hypergiant(object):
     def parameters(self):
         return self._parameters
 
+    def _update_index(self):
+        if self._indexed_length == len(self._peering_nodes):
+            return
+        self._peering_nodes_by_id = dict()
+        self._peering_nodes_by_router = dict()
+        for p in self._peering_nodes:
+            self._peering_nodes_by_id.setdefault(p.id, p)
+            self._peering_nodes_by_router.setdefault(p.lower_layer.id, p)
+        self._indexed_length = len(self._peering_nodes)
+
+    def get_peering_node_by_id(self, nid):
+        """
+        :return: (PeeringNode) with exactly this id or None
+        """
+        self._update_index()
+        return self._peering_nodes_by_id.get(nid)
+
     def get_peering_node(self, name):
-        for p in self.peering_nodes:
-            if name in p.id:
-                return p
-        raise ValueError("Peering node not found.")
+        """
+        Returns the peering node given by its id or by its IP node (id or object).
+        """
+        if isinstance(name, Node):
+            name = name.id
+        self._update_index()
+        p = self._peering_nodes_by_id.get(name)
+        if p is None:
+            p = self._peering_nodes_by_router.get(name)
+        if p is None:
+            raise ValueError("Peering node not found.")
+        return p
 
 
 class UserNodeAssignment(object):
@@ -0,0 +1,253 @@
+import hashlib
+import logging
+import os
+
+import networkx as nx
+import numpy as np
+
+
+def _paths_from_predecessors(pred, source, target):
+    """
+    Enumerates all paths from source to target in the shortest path DAG given by the predecessor lists. The order is
+    the same as the one of networkx.all_shortest_paths, so path numbers stay compatible with stored solutions.
+    """
+    if target == source:
+        yield [source]
+    for node in pred[target]:
+        for path in _paths_from_predecessors(pred, source, node):
+            yield path + [target]
+
+
+def get_distance_matrix(graph, node_ids):
+    """
+    All-pairs shortest path lengths (Floyd-Warshall, vectorized over the node pairs).
+    :param graph: (nx.Graph) with edge attribute 'weight'
+    :param node_ids: order of the rows and columns
+    :return: (np.ndarray) |N|x|N| matrix, np.inf for disconnected pairs
+    """
+    node_index = {nid: i for i, nid in enumerate(node_ids)}
+    dist = np.full((len(node_ids), len(node_ids)), np.inf)
+    for m, n, weight in graph.edges(data='weight', default=1):
+        dist[node_index[m], node_index[n]] = dist[node_index[n], node_index[m]] = weight
+    np.fill_diagonal(dist, 0)
+    for k in range(len(node_ids)):
+        np.minimum(dist, dist[:, k, np.newaxis] + dist[np.newaxis, k, :], out=dist)
+    return dist
+
+
+def get_optical_topology_hash(graph):
+    """
+    Hashes everything of the optical graph that determines the shortest paths and their order (nodes, edges and
+    weights in insertion order).
+    :param graph: (nx.Graph)
+    :return: (str)
+    """
+    adjacency = [(n, [(m, d.get('weight', 1)) for m, d in neighbors.items()]) for n, neighbors in graph.adj.items()]
+    return hashlib.sha256(bytes(str(adjacency), encoding="utf-8")).hexdigest()
+
+
+class OpticalPathTable(object):
+    """
+    All shortest paths between every (ordered) pair of optical nodes, computed once per optical topology.
+    Paths are numbered in the order of the node pairs and, per pair, in the order of networkx.all_shortest_paths.
+    Nodes, fibers and paths are stored as indices in flat arrays:
+      - pair_ptr: paths of the node pair (a, b) are pair_ptr[a * N + b] to pair_ptr[a * N + b + 1] - 1
+      - path_node_ptr/path_node_idx: nodes of every path (CSR)
+      - path_edge_ptr/path_edge_idx: fibers (directed as traversed) of every path (CSR)
+      - edge_path_ptr/edge_path_idx: paths traversing every fiber (CSR, reverse index)
+    Tables are shared within the process by the hash of the optical topology and can be cached on disk
+    (see set_cache_dir()).
+    """
+    FILE_VERSION = 2
+    ARRAYS = ["pair_ptr", "path_node_ptr", "path_node_idx", "edge_nodes", "path_edge_ptr", "path_edge_idx",
+              "edge_path_ptr", "edge_path_idx"]
+
+    _tables = dict()
+    _cache_dir = None
+
+    def __init__(self, topology_hash, node_ids, pair_ptr, path_node_ptr, path_node_idx, edge_nodes, path_edge_ptr,
+                 path_edge_idx, edge_path_ptr, edge_path_idx):
+        self.topology_hash = topology_hash
+        self.node_ids = list(node_ids)
+        self.node_index = {nid: i for i, nid in enumerate(self.node_ids)}
+        self.pair_ptr = pair_ptr
+        self.path_node_ptr = path_node_ptr
+        self.path_node_idx = path_node_idx
+        self.edge_nodes = edge_nodes
+        self.path_edge_ptr = path_edge_ptr
+        self.path_edge_idx = path_edge_idx
+        self.edge_path_ptr = edge_path_ptr
+        self.edge_path_idx = edge_path_idx
+        self.edge_index = {
+            (self.node_ids[m], self.node_ids[n]): i for i, (m, n) in enumerate(self.edge_nodes.tolist())
+        }
+        self._paths_of_pair = dict()
+
+    @property
+    def num_paths(self):
+        return len(self.path_node_ptr) - 1
+
+    @classmethod
+    def set_cache_dir(cls, path):
+        """
+        Enables the on-disk cache. Tables are stored as <path>/optical_paths_<topology hash>.npz.
+        :param path: directory or None to disable the cache
+        """
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        cls._cache_dir = path
+
+    @classmethod
+    def get(cls, graph):
+        """
+        Returns the table of the optical graph. Reuses a table of an identical graph from this process or from the
+        on-disk cache if available.
+        :param graph: (nx.Graph) optical topology
+        :return: (OpticalPathTable)
+        """
+        topology_hash = get_optical_topology_hash(graph)
+        table = cls._tables.get(topology_hash)
+        if table is not None:
+            return table
+
+        fname = None
+        if cls._cache_dir is not None:
+            fname = os.path.join(cls._cache_dir, "optical_paths_{}.npz".format(topology_hash))
+            table = cls.load(fname)
+        if table is None:
+            table = cls.build(graph, topology_hash)
+            if fname is not None:
+                table.save(fname)
+        cls._tables[topology_hash] = table
+        return table
+
+    @classmethod
+    def build(cls, graph, topology_hash=None):
+        """
+        Computes the shortest paths between all pairs of nodes with one Dijkstra per source node.
+        """
+        if topology_hash is None:
+            topology_hash = get_optical_topology_hash(graph)
+        node_ids = list(graph.nodes)
+        num_nodes = len(node_ids)
+        node_index = {nid: i for i, nid in enumerate(node_ids)}
+
+        pair_ptr = np.zeros(num_nodes * num_nodes + 1, dtype=np.int64)
+        path_node_ptr = [0]
+        path_node_idx = list()
+        edge_index = dict()
+        path_edge_ptr = [0]
+        path_edge_idx = list()
+        for a, source in enumerate(node_ids):
+            pred, _ = nx.dijkstra_predecessor_and_distance(graph, source, weight='weight')
+            for b, target in enumerate(node_ids):
+                num_paths = 0
+                if target in pred:
+                    for path in _paths_from_predecessors(pred, source, target):
+                        num_paths += 1
+                        nodes = [node_index[n] for n in path]
+                        path_node_idx += nodes
+                        path_node_ptr.append(len(path_node_idx))
+                        path_edge_idx += [
+                            edge_index.setdefault(e, len(edge_index)) for e in zip(nodes[:-1], nodes[1:])
+                        ]
+                        path_edge_ptr.append(len(path_edge_idx))
+                pair_ptr[a * num_nodes + b + 1] = num_paths
+        np.cumsum(pair_ptr, out=pair_ptr)
+
+        edge_nodes = np.array(list(edge_index.keys()), dtype=np.int64).reshape((len(edge_index), 2))
+        path_edge_ptr = np.array(path_edge_ptr, dtype=np.int64)
+        path_edge_idx = np.array(path_edge_idx, dtype=np.int64)
+
+        # Reverse index: paths of every edge, ordered by path id
+        path_of_entry = np.repeat(np.arange(len(path_edge_ptr) - 1), np.diff(path_edge_ptr))
+        order = np.argsort(path_edge_idx, kind="stable")
+        edge_path_ptr = np.zeros(len(edge_index) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(path_edge_idx, minlength=len(edge_index)), out=edge_path_ptr[1:])
+        edge_path_idx = path_of_entry[order]
+
+        return cls(topology_hash, node_ids, pair_ptr, np.array(path_node_ptr, dtype=np.int64),
+                   np.array(path_node_idx, dtype=np.int64), edge_nodes, path_edge_ptr, path_edge_idx,
+                   edge_path_ptr, edge_path_idx)
+
+    def save(self, fname):
+        """
+        Writes the table. Node ids are stored as strings with a flag for integer ids, so they are loaded with their
+        type. Tables with other node id types are not written.
+        """
+        if not all(isinstance(nid, (str, int, np.integer)) for nid in self.node_ids):
+            logging.getLogger(__name__).warning(
+                "Optical path table not written to {}: node ids are neither str nor int".format(fname))
+            return
+        tmp_fname = fname + ".{}.tmp".format(os.getpid())
+        with open(tmp_fname, "wb") as fd:
+            np.savez(
+                fd,
+                version=np.array(OpticalPathTable.FILE_VERSION),
+                node_ids=np.array([str(nid) for nid in self.node_ids]),
+                node_id_is_int=np.array([not isinstance(nid, str) for nid in self.node_ids], dtype=bool),
+                **{name: getattr(self, name) for name in OpticalPathTable.ARRAYS}
+            )
+        os.replace(tmp_fname, fname)
+        logging.getLogger(__name__).info("Wrote optical path table to {}".format(fname))
+
+    @classmethod
+    def load(cls, fname):
+        """
+        :return: (OpticalPathTable) or None if the file does not exist or has another version
+        """
+        if not os.path.exists(fname):
+            return None
+        with np.load(fname, allow_pickle=False) as data:
+            if int(data["version"]) != OpticalPathTable.FILE_VERSION:
+                return None
+            topology_hash = os.path.basename(fname)[len("optical_paths_"):-len(".npz")]
+            node_ids = [int(nid) if is_int else nid
+                        for nid, is_int in zip(data["node_ids"].tolist(), data["node_id_is_int"].tolist())]
+            return cls(topology_hash, node_ids, *[data[name] for name in OpticalPathTable.ARRAYS])
+
+    def get_path_ids(self, src_id, dst_id):
+        """
+        :return: (range) ids of all shortest paths between the optical nodes
+        """
+        pair = self.node_index[src_id] * len(self.node_ids) + self.node_index[dst_id]
+        return range(int(self.pair_ptr[pair]), int(self.pair_ptr[pair + 1]))
+
+    def get_paths(self, src_id, dst_id):
+        """
+        :return: (list) of all shortest paths between the optical nodes as lists of node ids
+        """
+        paths = self._paths_of_pair.get((src_id, dst_id))
+        if paths is None:
+            paths = [self.get_path_nodes(p) for p in self.get_path_ids(src_id, dst_id)]
+            self._paths_of_pair[(src_id, dst_id)] = paths
+        return paths
+
+    def get_pairs_of_paths(self, path_ids):
+        """
+        :param path_ids: (np.ndarray) path ids
+        :return: (tuple) of arrays with the index of the first and of the last node of the path and with the number of
+            the path among the paths of this node pair
+        """
+        pair = np.searchsorted(self.pair_ptr, path_ids, side="right") - 1
+        return pair // len(self.node_ids), pair % len(self.node_ids), path_ids - self.pair_ptr[pair]
+
+    def get_path_nodes(self, path_id):
+        return [self.node_ids[n] for n in
+                self.path_node_idx[self.path_node_ptr[path_id]:self.path_node_ptr[path_id + 1]].tolist()]
+
+    def get_path_edges(self, path_id):
+        """
+        :return: (list) of the fibers of the path as (node id, node id) in the direction of the path
+        """
+        return [tuple(self.node_ids[n] for n in self.edge_nodes[e]) for e in
+                self.path_edge_idx[self.path_edge_ptr[path_id]:self.path_edge_ptr[path_id + 1]].tolist()]
+
+    def get_paths_of_edge(self, src_id, dst_id):
+        """
+        :return: (np.ndarray) ids of the paths traversing the fiber from src_id to dst_id
+        """
+        edge = self.edge_index.get((src_id, dst_id))
+        if edge is None:
+            return np.zeros(0, dtype=np.int64)
+        return self.edge_path_idx[self.edge_path_ptr[edge]:self.edge_path_ptr[edge + 1]]
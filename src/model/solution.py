@@ -10,6 +10,18 @@ class SolutionInstance(object):
             raise RuntimeError("Metric already exists.")
         self._metrics[name] = value
 
+    def update_metric_group(self, name, values):
+        """
+        Adds values to the dict-valued metric name, e.g., the timings of all phases of a run.
+        :param name: name of the metric, created if it does not exist
+        :param values: (dict)
+        """
+        group = self._metrics.setdefault(name, dict())
+        for k in values:
+            if k in group:
+                raise RuntimeError("Metric already exists.")
+        group.update(values)
+
     def to_dict(self):
         return {
             'ip_links': [ip_link.to_dict() for ip_link in self.ip_links],
@@ -1,8 +1,10 @@
 import networkx as nx
 import numpy as np
 import collections
+import itertools
 
 import constants
+from model.optical_paths import OpticalPathTable, get_distance_matrix
 
 
 class NodeIdGenerator(object):
@@ -147,52 +149,138 @@ class Topology(object):
 
         self.opt_edges = dict()
 
-        self.candidate_paths_per_opt_edge = collections.defaultdict(list)
+        # Id indexes. If ids are not unique, the first node with the id is returned
+        self._ip_nodes_by_id = dict()
+        self._opt_nodes_by_id = dict()
+
+        self._optical_path_table = None
+        self._optical_distances = None
+        self._candidate_paths_per_opt_edge = None
 
     @property
     def nodes(self):
         return self.ip_nodes + self.opt_nodes
 
     def add_node(self, node):
-        if node in self.nodes:
+        if self._contains(node):
             raise RuntimeError("Node already added to topology")
         if isinstance(node, IPNode):
             self.ip_nodes.append(node)
+            self._ip_nodes_by_id.setdefault(node.id, node)
         elif isinstance(node, OpticalNode):
             self.opt_nodes.append(node)
+            self._opt_nodes_by_id.setdefault(node.id, node)
             # Add optical nodes the the networkx Graph since we want to calculate paths between them later
             self.graph.add_node(node.id)
+            self._optical_path_table = None
+            self._optical_distances = None
         else:
             raise RuntimeError("Node type unknown")
+        self._candidate_paths_per_opt_edge = None
+
+    def _contains(self, node):
+        if isinstance(node, IPNode):
+            nodes_by_id, nodes = self._ip_nodes_by_id, self.ip_nodes
+        elif isinstance(node, OpticalNode):
+            nodes_by_id, nodes = self._opt_nodes_by_id, self.opt_nodes
+        else:
+            return False
+        if node.id not in nodes_by_id:
+            return False
+        # Nodes compare by identity. Fall back to a scan if another node has the same id
+        return nodes_by_id[node.id] is node or node in nodes
 
     def get_node_by_id(self, nid):
-        for n in self.nodes:
-            if n.id == nid:
-                return n
-        raise ValueError("Node not found: {}".format(nid))
+        node = self._ip_nodes_by_id.get(nid)
+        if node is None:
+            node = self._opt_nodes_by_id.get(nid)
+        if node is None:
+            raise ValueError("Node not found: {}".format(nid))
+        return node
+
+    def get_optical_node_by_id(self, nid):
+        try:
+            return self._opt_nodes_by_id[nid]
+        except KeyError:
+            raise ValueError("Node not found: {}".format(nid))
 
     def add_edge(self, edge, weight=1):
         assert isinstance(edge, OpticalLink)
         if edge.get_key() not in self.opt_edges:
             self.opt_edges[edge.get_key()] = edge
             self.graph.add_edge(edge.node1.id, edge.node2.id, weight=weight)
-            self.candidate_paths_per_opt_edge[(edge.node1.id, edge.node2.id)] = list()
+            self._optical_path_table = None
+            self._optical_distances = None
+            self._candidate_paths_per_opt_edge = None
         else:
             raise RuntimeError("Edge already exists")
 
+    @property
+    def optical_path_table(self):
+        """
+        Shortest paths between all optical nodes. Shared with all topologies with the same optical graph.
+        :return: (model.optical_paths.OpticalPathTable)
+        """
+        if self._optical_path_table is None:
+            self._optical_path_table = OpticalPathTable.get(self.graph)
+        return self._optical_path_table
+
+    @property
+    def candidate_paths_per_opt_edge(self):
+        """
+        Candidate paths of IP links that traverse each fiber.
+        :return: (dict) of fiber key (node1 id, node2 id) -> list of (IP node, IP node, path number)
+        """
+        if self._candidate_paths_per_opt_edge is None:
+            table = self.optical_path_table
+            ip_node_pairs = collections.defaultdict(list)
+            for src, dst in itertools.product(self.ip_nodes, repeat=2):
+                if src != dst:
+                    ip_node_pairs[table.node_index[src.lower_layer.id], table.node_index[dst.lower_layer.id]].append(
+                        (src, dst)
+                    )
+
+            candidates = collections.defaultdict(list)
+            for key in dict.fromkeys(itertools.chain(self.opt_edges.keys(), table.edge_index.keys())):
+                candidates[key] = list()
+                path_ids = table.get_paths_of_edge(*key)
+                for a, b, path_num in zip(*[x.tolist() for x in table.get_pairs_of_paths(path_ids)]):
+                    candidates[key] += [(src, dst, path_num) for src, dst in ip_node_pairs.get((a, b), list())]
+            self._candidate_paths_per_opt_edge = candidates
+        return self._candidate_paths_per_opt_edge
+
     def get_all_optical_candidate_paths_between_ip_nodes(self, src, dst):
-        paths = list(nx.all_shortest_paths(self.graph, src.lower_layer.id, dst.lower_layer.id, weight='weight'))
-        for i, path in enumerate(paths):
-            for m, n in zip(path[:-1], path[1:]):
-                if (src, dst, i) not in self.candidate_paths_per_opt_edge[(m, n)]:
-                    self.candidate_paths_per_opt_edge[(m, n)].append((src, dst, i))
-        return paths
+        """
+        All shortest optical paths between the optical nodes of the IP nodes. The returned list must not be modified.
+        :return: (list) of paths as lists of optical node ids
+        """
+        return self.optical_path_table.get_paths(src.lower_layer.id, dst.lower_layer.id)
+
+    @property
+    def optical_distances(self):
+        """
+        Optical path lengths between all optical nodes. Computed once per topology.
+        :return: (tuple) of the node index (dict of node id -> row) and the distance matrix (np.ndarray)
+        """
+        if self._optical_distances is None:
+            node_ids = list(self.graph.nodes)
+            self._optical_distances = (
+                {nid: i for i, nid in enumerate(node_ids)}, get_distance_matrix(self.graph, node_ids)
+            )
+        return self._optical_distances
+
+    def get_distances_between_ip_nodes(self, src_nodes, dst_nodes):
+        """
+        :return: (np.ndarray) |src_nodes|x|dst_nodes| matrix of optical path lengths, np.inf if not connected
+        """
+        node_index, dist = self.optical_distances
+        src = np.array([node_index[n.lower_layer.id] for n in src_nodes], dtype=np.int64)
+        dst = np.array([node_index[n.lower_layer.id] for n in dst_nodes], dtype=np.int64)
+        return dist[np.ix_(src, dst)]
 
     def get_path_length_between_ip_nodes(self, src, dst):
-        try:
-            return nx.shortest_path_length(self.graph, src.lower_layer.id, dst.lower_layer.id, weight='weight')
-        except nx.NetworkXNoPath:
-            return np.inf
+        node_index, dist = self.optical_distances
+        return dist[node_index[src.lower_layer.id], node_index[dst.lower_layer.id]]
 
     def get_required_num_trunks(self, rate_to_allocate):
         """
@@ -21,3 +21,9 @@ class AbstractOutput(object):
         :return:
         """
         raise NotImplementedError
+
+    def get_solution_fname(self):
+        """
+        :return: path of the solution file of this configuration or None if the output does not write files
+        """
+        return None
@@ -0,0 +1,213 @@
+import json
+import os
+import logging
+import sqlite3
+
+# Name of the catalog file in the output folder
+CATALOG_FNAME = "catalog.sqlite"
+
+# Indexed columns extracted from the scenario configuration
+COLUMNS = [
+    ("config_hash", "TEXT NOT NULL"),
+    ("format", "TEXT NOT NULL"),
+    ("solution_fname", "TEXT NOT NULL"),
+    ("config_fname", "TEXT"),
+    ("input_timestamp", "INTEGER"),
+    ("topology_name", "TEXT"),
+    ("ip_link_util", "REAL"),
+    ("fiber_capacity", "REAL"),
+    ("num_transceiver", "INTEGER"),
+    ("failed_links", "INTEGER"),
+    ("demand_type", "TEXT"),
+    ("algo_name", "TEXT"),
+    ("algo_timelimit", "REAL"),
+    ("algorithm", "TEXT"),
+    ("fixed_layers", "TEXT"),
+    ("fix_ip_links", "INTEGER"),
+    ("fix_ip_connectivity", "INTEGER"),
+    ("fix_cdn_assignment", "INTEGER"),
+    ("comment", "TEXT"),
+    ("configuration", "TEXT NOT NULL")
+]
+INDEXES = [
+    ("input_timestamp",),
+    ("config_hash",),
+    ("algo_name", "demand_type", "num_transceiver", "ip_link_util", "fiber_capacity", "input_timestamp")
+]
+
+
+def get_timestamp(name_prefix):
+    """
+    Timestamp of the input files of a scenario from the prefix of its file names (see
+    output.file_writer.JsonWriter), e.g., _link_util_single_1577836800 -> 1577836800. Inputs averaged over time
+    ('average') have timestamp 0 as in the aggregated metrics.
+    :return: (int) or None if the prefix does not end with a timestamp
+    """
+    last = name_prefix.split("_")[-1]
+    if last == "average":
+        return 0
+    try:
+        return int(last)
+    except ValueError:
+        return None
+
+
+def get_demand_type(demand):
+    """
+    :return: name of the demand configuration. For combined demands, the names of both parts as JSON list
+    """
+    if "cdn_demand" in demand and "e2e_demand" in demand:
+        return json.dumps([demand["cdn_demand"]["name"], demand["e2e_demand"]["name"]])
+    return demand["name"]
+
+
+def get_row(config, config_hash, fmt, solution_fname, config_fname, name_prefix):
+    """
+    Extracts the indexed columns from a scenario configuration dict (see scenario.ScenarioConfiguration.to_dict()).
+    Parameters that a configuration does not have are None.
+    """
+    topology = config.get("topology", dict())
+    parameter = topology.get("parameter") or dict()
+    algorithm = config.get("algorithm", dict())
+    fixed_layers = config.get("fixed_layers")
+    time_limit = algorithm.get("time_limit")
+    if time_limit is None and "mip_config" in algorithm:
+        time_limit = algorithm["mip_config"].get("time_limit")
+    return {
+        "config_hash": config_hash,
+        "format": fmt,
+        "solution_fname": solution_fname,
+        "config_fname": config_fname,
+        "input_timestamp": get_timestamp(name_prefix),
+        "topology_name": topology.get("name"),
+        "ip_link_util": parameter.get("IP_LINK_UTILIZATION"),
+        "fiber_capacity": topology.get("opt_topo", dict()).get("fiber_capacity"),
+        "num_transceiver": topology.get("ip_topo", dict()).get("num_transceiver"),
+        "failed_links": "failed_links" in parameter,
+        "demand_type": get_demand_type(config["demand"]) if "demand" in config else None,
+        "algo_name": algorithm.get("name"),
+        "algo_timelimit": time_limit,
+        "algorithm": json.dumps(algorithm, sort_keys=True),
+        "fixed_layers": json.dumps(fixed_layers, sort_keys=True) if fixed_layers is not None else None,
+        "fix_ip_links": (fixed_layers or dict()).get("fix_ip_links", False),
+        "fix_ip_connectivity": (fixed_layers or dict()).get("fix_ip_connectivity", False),
+        "fix_cdn_assignment": (fixed_layers or dict()).get("fix_cdn_assignment", False),
+        "comment": config.get("comment"),
+        "configuration": json.dumps(config)
+    }
+
+
+class SolutionCatalog(object):
+    """
+    SQLite index of the solutions in an output folder. Writers register every solution with the parameters of its
+    scenario configuration (see COLUMNS), so that scripts can query solutions instead of listing the folder and loading
+    every configuration file. File names are relative to the folder. Several processes can register concurrently.
+    Concurrent access relies on the file locks of the file system. On network file systems (e.g., NFS folders shared by
+    several hosts, see control.FileQueueRunner), these locks are often unreliable and the catalog can be corrupted.
+    Disable the catalog of the writers for such folders (catalog=False) and index the solutions afterwards on one host (see
+    index_folder()).
+    """
+
+    def __init__(self, base_path, fname=CATALOG_FNAME):
+        self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
+        self.base_path = base_path
+        self.fname = os.path.join(base_path, fname)
+        self._connection = None
+
+    @staticmethod
+    def exists(base_path, fname=CATALOG_FNAME):
+        return os.path.exists(os.path.join(base_path, fname))
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.fname, timeout=60)
+            self._connection.row_factory = sqlite3.Row
+            # Rollback journal instead of WAL, which needs shared memory and does not work on network file systems.
+            # Setting it explicitly also converts catalogs that were created in WAL mode
+            self._connection.execute("PRAGMA journal_mode=DELETE")
+            with self._connection:
+                self._connection.execute("CREATE TABLE IF NOT EXISTS solutions ({}, PRIMARY KEY (config_hash, format))"
+                                         .format(", ".join("{} {}".format(*c) for c in COLUMNS)))
+                for columns in INDEXES:
+                    self._connection.execute("CREATE INDEX IF NOT EXISTS idx_{} ON solutions ({})".format(
+                        "_".join(columns), ", ".join(columns)))
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __getstate__(self):
+        # Connections can not be sent to worker processes
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        return state
+
+    def register(self, config, config_hash, fmt, solution_fname, config_fname=None, name_prefix=""):
+        """
+        Adds a solution. An existing entry with the same hash and format is replaced.
+        :param config: (dict) scenario configuration
+        :param config_hash: hash of the configuration, part of the file names
+        :param fmt: format of the solution file, e.g., json or npz
+        :param solution_fname: solution file relative to the folder
+        :param config_fname: configuration file relative to the folder, None if the solution file contains it
+        :param name_prefix: prefix of the file names from the topology and demand configuration
+        """
+        row = get_row(config, config_hash, fmt, solution_fname, config_fname, name_prefix)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO solutions ({}) VALUES ({})".format(
+                    ", ".join(row.keys()), ", ".join("?" * len(row))),
+                list(row.values())
+            )
+
+    def query(self, **conditions):
+        """
+        Returns the solutions whose columns equal the given values, e.g., query(input_timestamp=1577836800). None
+        matches NULL. Entries are ordered by timestamp and format.
+        :return: (list) of dicts with the columns of COLUMNS
+        """
+        for column in conditions:
+            if column not in dict(COLUMNS):
+                raise ValueError("Unknown column: {}".format(column))
+        where = ["{} IS ?".format(column) for column in conditions]
+        sql = "SELECT * FROM solutions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY input_timestamp, format"
+        return [dict(row) for row in self.connection.execute(sql, list(conditions.values()))]
+
+    def get_config_hashes(self):
+        return {row[0] for row in self.connection.execute("SELECT config_hash FROM solutions")}
+
+    def index_folder(self):
+        """
+        Registers the solutions of the folder that are not in the catalog yet, e.g., written before the catalog
+        existed. Only the configuration of unknown solutions is loaded.
+        :return: (int) number of registered solutions
+        """
+        # Imported here since the writers import this module
+        import output.columnar_writer
+
+        known = {(row[0], row[1]) for row in self.connection.execute("SELECT solution_fname, format FROM solutions")}
+        num_registered = 0
+        for fname in sorted(os.listdir(self.base_path)):
+            stem, ext = os.path.splitext(fname)
+            if not stem.startswith("solution") or ext not in [".json", ".npz"] or stem.endswith(".tmp"):
+                continue
+            fmt = ext[1:]
+            if (fname, fmt) in known:
+                continue
+            config_fname = None
+            if fmt == "json":
+                config_fname = "configuration" + fname[len("solution"):]
+                if not os.path.exists(os.path.join(self.base_path, config_fname)):
+                    continue
+            config = output.columnar_writer.load_configuration(os.path.join(self.base_path, fname))
+            name_prefix, _, config_hash = stem[len("solution"):].rpartition("_")
+            self.register(config, config_hash, fmt, fname, config_fname, name_prefix)
+            num_registered += 1
+        self.logger.info("Registered {} solutions of {}".format(num_registered, self.base_path))
+        return num_registered
@@ -0,0 +1,280 @@
+import json
+import os
+
+import numpy as np
+
+import output.abstract_output
+import output.file_writer
+
+# Version of the table layout, stored with every file
+FORMAT_VERSION = 1
+
+
+class NpzWriterConfiguration(output.abstract_output.AbstractOutputConfiguration):
+    def __init__(self, base_path, compressed=True, catalog=True):
+        """
+
+        :param base_path: folder of the solution files
+        :param compressed: Deflate the tables. Files are considerably smaller, writing takes slightly longer.
+        :param catalog: Register written solutions in the catalog of the folder (see output.catalog.SolutionCatalog).
+            Disable it for folders on network file systems shared by several hosts
+        """
+        self.base_path = base_path
+        self.compressed = compressed
+        self.catalog = catalog
+
+    def produce(self, scenario_config):
+        return NpzWriter(
+            self.base_path,
+            scenario_config,
+            self.compressed,
+            self.catalog
+        )
+
+
+class NpzWriter(output.file_writer.JsonWriter):
+    """
+    Writes solutions as columnar tables into a NumPy .npz archive instead of JSON. Files are named like the ones of
+    JsonWriter (with the extension .npz) and also contain the scenario configuration. See solution_to_tables() for the
+    layout and load_solution() to read them.
+    """
+
+    def __init__(self, base_path, scenario_config, compressed=True, catalog=True):
+        super(NpzWriter, self).__init__(base_path, scenario_config, catalog)
+        self.compressed = compressed
+
+    def get_solution_fname(self):
+        return os.path.join(self.base_path, "solution" + self.fname + ".npz")
+
+    def write(self, solution):
+        sol_fname = self.get_solution_fname()
+        tables = solution_to_tables(solution.to_dict())
+        tables["configuration"] = np.array(json.dumps(self._scenario_config.to_dict()))
+        # Write to a temporary file first so that solution_exists() never sees a partial file
+        tmp_fname = sol_fname[:-len(".npz")] + ".tmp.npz"
+        if self.compressed:
+            np.savez_compressed(tmp_fname, **tables)
+        else:
+            np.savez(tmp_fname, **tables)
+        os.replace(tmp_fname, sol_fname)
+        self.logger.info("Wrote solution to {}".format(sol_fname))
+        self.register("npz", os.path.basename(sol_fname))
+
+
+class _NodeIndex(object):
+    """
+    Maps node ids to integer codes. Tables only store the codes, the ids are stored once in the table nodes.
+    """
+
+    def __init__(self):
+        self.codes = dict()
+
+    def __call__(self, node_id):
+        code = self.codes.get(node_id)
+        if code is None:
+            code = len(self.codes)
+            self.codes[node_id] = code
+        return code
+
+    def to_array(self):
+        return np.array(list(self.codes.keys()), dtype=str)
+
+
+def _int_array(values):
+    return np.array(values, dtype=np.int32)
+
+
+def _float_array(values):
+    return np.array(values, dtype=float)
+
+
+def solution_to_tables(sol_dict):
+    """
+    Converts a solution dict (see model.solution.SolutionInstance.to_dict()) into flat columns. Nodes and hypergiants
+    are stored as integer codes into the tables nodes and hypergiants. Rows of dependent tables refer to the rows of
+    their parent table (e.g., opt_link_ip_link is the row in the ip_link table).
+    Tables (prefix of the column names):
+        ip_link: node1, node2, num_trunks, path_num (-1 for None)
+        opt_link: optical hops of the IP links. ip_link, node1, node2, num_trunks, path_num
+        user_node: CDN assignment. hypergiant, node
+        peering: user_node, node, fraction
+        route: routes of the user nodes. user_node, node1, node2, volume
+        e2e: routed background demands. node1, node2
+        e2e_path: e2e, node1, node2, volume
+    Metrics are stored as JSON string.
+    :param sol_dict: (dict)
+    :return: (dict) of column name -> np.ndarray
+    """
+    nodes = _NodeIndex()
+    cols = {name: list() for name in [
+        "ip_link_node1", "ip_link_node2", "ip_link_num_trunks", "ip_link_path_num",
+        "opt_link_ip_link", "opt_link_node1", "opt_link_node2", "opt_link_num_trunks", "opt_link_path_num",
+        "user_node_hypergiant", "user_node_node",
+        "peering_user_node", "peering_node", "peering_fraction",
+        "route_user_node", "route_node1", "route_node2", "route_volume",
+        "e2e_node1", "e2e_node2",
+        "e2e_path_e2e", "e2e_path_node1", "e2e_path_node2", "e2e_path_volume"
+    ]}
+
+    for i, link in enumerate(sol_dict["ip_links"]):
+        cols["ip_link_node1"].append(nodes(link["node1"]))
+        cols["ip_link_node2"].append(nodes(link["node2"]))
+        cols["ip_link_num_trunks"].append(link["num_trunks"])
+        cols["ip_link_path_num"].append(-1 if link["path_num"] is None else link["path_num"])
+        for m, n, num_trunks, path_num in link["opt_links"]:
+            cols["opt_link_ip_link"].append(i)
+            cols["opt_link_node1"].append(nodes(m))
+            cols["opt_link_node2"].append(nodes(n))
+            cols["opt_link_num_trunks"].append(num_trunks)
+            cols["opt_link_path_num"].append(path_num)
+
+    hypergiants = list()
+    for hg in sol_dict["cdn_assignment"]:
+        hypergiants.append(hg["name"])
+        for unode in hg["user_nodes"]:
+            u = len(cols["user_node_node"])
+            cols["user_node_hypergiant"].append(len(hypergiants) - 1)
+            cols["user_node_node"].append(nodes(unode["node_id"]))
+            for pnode, fraction in unode["peering_nodes"]:
+                cols["peering_user_node"].append(u)
+                cols["peering_node"].append(nodes(pnode))
+                cols["peering_fraction"].append(fraction)
+            for node1, node2, volume in unode["routes"]:
+                cols["route_user_node"].append(u)
+                cols["route_node1"].append(nodes(node1))
+                cols["route_node2"].append(nodes(node2))
+                cols["route_volume"].append(volume)
+
+    for i, route in enumerate(sol_dict["e2e_routing"]):
+        cols["e2e_node1"].append(nodes(route["node1"]))
+        cols["e2e_node2"].append(nodes(route["node2"]))
+        for (node1, node2), volume in route["paths"]:
+            cols["e2e_path_e2e"].append(i)
+            cols["e2e_path_node1"].append(nodes(node1))
+            cols["e2e_path_node2"].append(nodes(node2))
+            cols["e2e_path_volume"].append(volume)
+
+    tables = {
+        name: _float_array(values) if name.endswith(("_num_trunks", "_fraction", "_volume")) else _int_array(values)
+        for name, values in cols.items()
+    }
+    tables["nodes"] = nodes.to_array()
+    tables["hypergiants"] = np.array(hypergiants, dtype=str)
+    tables["metrics"] = np.array(json.dumps(sol_dict["metrics"]))
+    tables["format_version"] = np.array(FORMAT_VERSION)
+    return tables
+
+
+def _group_rows(parents, num_parents):
+    """
+    :return: (list) of row index lists per parent row
+    """
+    groups = [list() for _ in range(num_parents)]
+    for row, parent in enumerate(parents.tolist()):
+        groups[parent].append(row)
+    return groups
+
+
+def tables_to_solution(tables):
+    """
+    Inverse of solution_to_tables(). Returns the same dict as loading the JSON file written by JsonWriter (tuples are
+    lists).
+    :param tables: mapping of column name -> np.ndarray, e.g., the opened .npz file
+    :return: (dict)
+    """
+    nodes = tables["nodes"].tolist()
+
+    def ids(name):
+        return [nodes[code] for code in tables[name].tolist()]
+
+    ip_links = list()
+    opt_node1, opt_node2 = ids("opt_link_node1"), ids("opt_link_node2")
+    opt_num_trunks, opt_path_num = tables["opt_link_num_trunks"].tolist(), tables["opt_link_path_num"].tolist()
+    opt_rows = _group_rows(tables["opt_link_ip_link"], len(tables["ip_link_node1"]))
+    for i, (node1, node2, num_trunks, path_num) in enumerate(zip(
+            ids("ip_link_node1"), ids("ip_link_node2"), tables["ip_link_num_trunks"].tolist(),
+            tables["ip_link_path_num"].tolist())):
+        ip_links.append({
+            'node1': node1,
+            'node2': node2,
+            'num_trunks': num_trunks,
+            'opt_links': [[opt_node1[r], opt_node2[r], opt_num_trunks[r], opt_path_num[r]] for r in opt_rows[i]],
+            'path_num': None if path_num == -1 else path_num
+        })
+
+    num_user_nodes = len(tables["user_node_node"])
+    peering_rows = _group_rows(tables["peering_user_node"], num_user_nodes)
+    peering_node, peering_fraction = ids("peering_node"), tables["peering_fraction"].tolist()
+    route_rows = _group_rows(tables["route_user_node"], num_user_nodes)
+    route_node1, route_node2, route_volume = ids("route_node1"), ids("route_node2"), tables["route_volume"].tolist()
+    cdn_assignment = [{'name': name, 'user_nodes': list()} for name in tables["hypergiants"].tolist()]
+    for u, (hg, node_id) in enumerate(zip(tables["user_node_hypergiant"].tolist(), ids("user_node_node"))):
+        cdn_assignment[hg]['user_nodes'].append({
+            'node_id': node_id,
+            'peering_nodes': [[peering_node[r], peering_fraction[r]] for r in peering_rows[u]],
+            'routes': [[route_node1[r], route_node2[r], route_volume[r]] for r in route_rows[u]]
+        })
+
+    path_rows = _group_rows(tables["e2e_path_e2e"], len(tables["e2e_node1"]))
+    path_node1, path_node2 = ids("e2e_path_node1"), ids("e2e_path_node2")
+    path_volume = tables["e2e_path_volume"].tolist()
+    e2e_routing = list()
+    for i, (node1, node2) in enumerate(zip(ids("e2e_node1"), ids("e2e_node2"))):
+        e2e_routing.append({
+            'node1': node1,
+            'node2': node2,
+            'paths': [[[path_node1[r], path_node2[r]], path_volume[r]] for r in path_rows[i]]
+        })
+
+    return {
+        'ip_links': ip_links,
+        'cdn_assignment': cdn_assignment,
+        'e2e_routing': e2e_routing,
+        'metrics': json.loads(tables["metrics"].item())
+    }
+
+
+def load_solution(fname):
+    """
+    Loads a solution written by NpzWriter or JsonWriter.
+    :param fname: .npz or .json file
+    :return: (dict) as written by JsonWriter
+    """
+    if fname.endswith(".npz"):
+        with np.load(fname) as tables:
+            return tables_to_solution(tables)
+    with open(fname, "r") as fd:
+        return json.load(fd)
+
+
+def load_tables(fname):
+    """
+    Loads the columns of a .npz solution file (see solution_to_tables()) without building the solution dict.
+    :return: (dict) of column name -> np.ndarray
+    """
+    with np.load(fname) as tables:
+        return {name: tables[name] for name in tables.files}
+
+
+def load_metrics(fname):
+    """
+    Loads only the metrics of a solution, without reading the tables of a .npz file.
+    """
+    if fname.endswith(".npz"):
+        with np.load(fname) as tables:
+            return json.loads(tables["metrics"].item())
+    return load_solution(fname)["metrics"]
+
+
+def load_configuration(fname):
+    """
+    Loads the scenario configuration of a solution.
+    :param fname: .npz solution file or the solution .json file of JsonWriter (its configuration file is read)
+    :return: (dict)
+    """
+    if fname.endswith(".npz"):
+        with np.load(fname) as tables:
+            return json.loads(tables["configuration"].item())
+    dirname, basename = os.path.split(fname)
+    with open(os.path.join(dirname, basename.replace("solution", "configuration", 1)), "r") as fd:
+        return json.load(fd)
@@ -3,25 +3,44 @@ import os
 import logging
 import hashlib
 import output.abstract_output
+import output.catalog
+
+
+def get_config_hash(scenario_config):
+    """
+    Unique identifier of a scenario configuration: the hash of the string of its configuration dict
+    """
+    return str(hashlib.sha256(bytes(str(scenario_config.to_dict()), encoding="utf-8")).hexdigest())
 
 
 class JsonWriterConfiguration(output.abstract_output.AbstractOutputConfiguration):
-    def __init__(self, base_path):
+    def __init__(self, base_path, catalog=True):
+        """
+
+        :param base_path: folder of the solution files
+        :param catalog: Register written solutions in the catalog of the folder (see output.catalog.SolutionCatalog).
+            Disable it for folders on network file systems shared by several hosts
+        """
         self.base_path = base_path
+        self.catalog = catalog
 
     def produce(self, scenario_config):
         return JsonWriter(
             self.base_path,
             scenario_config,
+            self.catalog
         )
 
 
 class JsonWriter(output.abstract_output.AbstractOutput):
-    def __init__(self, base_path, scenario_config):
+    def __init__(self, base_path, scenario_config, catalog=True):
         super(JsonWriter, self).__init__(scenario_config)
         self.base_path = base_path
         self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
         self.fname = None
+        self.name_prefix = None
+        self.config_hash = None
+        self.catalog = output.catalog.SolutionCatalog(base_path) if catalog else None
 
         self._construct_fname()
 
@@ -30,19 +49,34 @@ class JsonWriter(output.abstract_output.AbstractOutput):
         Hashes the string of the configuration dict and uses this as unique identifier for the configuration
         :return:
         """
-        my_uuid = hashlib.sha256(bytes(str(self._scenario_config.to_dict()), encoding="utf-8")).hexdigest()
-        self.fname = self._scenario_config.topology_configuration.config_name_prefix() + \
-                     self._scenario_config.demand_configuration.config_name_prefix() + "_" + str(my_uuid)
+        self.name_prefix = self._scenario_config.topology_configuration.config_name_prefix() + \
+            self._scenario_config.demand_configuration.config_name_prefix()
+        self.config_hash = get_config_hash(self._scenario_config)
+        self.fname = self.name_prefix + "_" + self.config_hash
+
+    def get_solution_fname(self):
+        return os.path.join(self.base_path, "solution" + self.fname + ".json")
 
     def solution_exists(self):
-        return os.path.exists(os.path.join(self.base_path, "solution" + self.fname + ".json"))
+        return os.path.exists(self.get_solution_fname())
 
     def write(self, solution):
         config_fname = os.path.join(self.base_path, "configuration" + self.fname + ".json")
         with open(config_fname, "w") as fd:
             json.dump(self._scenario_config.to_dict(), fp=fd, indent=2)
         self.logger.info("Wrote configuration to {}".format(config_fname))
-        sol_fname = os.path.join(self.base_path, "solution" + self.fname + ".json")
+        sol_fname = self.get_solution_fname()
         with open(sol_fname, "w") as fd:
             json.dump(solution.to_dict(), fp=fd, indent=2)
         self.logger.info("Wrote configuration to {}".format(sol_fname))
+        self.register("json", os.path.basename(sol_fname), os.path.basename(config_fname))
+
+    def register(self, fmt, solution_fname, config_fname=None):
+        """
+        Adds the written solution to the catalog of the folder, if enabled.
+        """
+        if self.catalog is None:
+            return
+        self.catalog.register(self._scenario_config.to_dict(), self.config_hash, fmt, solution_fname, config_fname,
+                              self.name_prefix)
+        self.catalog.close()
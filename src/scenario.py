@@ -1,6 +1,8 @@
 import traceback
 import logging
 
+import input_cache
+import instrumentation
 import model.input
 
 
@@ -27,23 +29,48 @@ class ScenarioConfiguration(object):
         }
 
     def produce(self):
-        topo = self.topology_configuration.produce().generate()
-        demand, demand_matrix = self.demand_configuration.produce(topo).generate()
+        instr = instrumentation.Instrumentation()
+        # Scenarios with the same inputs share the produced objects (see input_cache)
+        inputs = None
+        if input_cache.get_cache_dir() is not None:
+            with instr.timer("load_inputs"):
+                inputs = input_cache.load_inputs(self.topology_configuration, self.demand_configuration)
+        if inputs is not None:
+            topo, demand, demand_matrix = inputs
+        else:
+            with instr.timer("produce_topology"):
+                topo = input_cache.produce_topology(self.topology_configuration)
+            with instr.timer("produce_demand"):
+                demand, demand_matrix = input_cache.produce_demand(self.demand_configuration,
+                                                                   self.topology_configuration, topo)
+            input_cache.store_inputs(self.topology_configuration, self.demand_configuration, topo, demand,
+                                     demand_matrix)
         inputinstance = model.input.InputInstance(topo, demand, fixed_layers=self.fixed_layers.produce(),
                                                   background_demand=demand_matrix)
-        algo = self.algorithm_configuration.produce(inputinstance)
+        with instr.timer("produce_algorithm"):
+            algo = self.algorithm_configuration.produce(inputinstance)
 
         return Scenario(
             self,
             topo,
             demand,
             algo,
-            self.outputs
+            self.outputs,
+            instr
         )
 
 
 class Scenario(object):
-    def __init__(self, cfg, topology, demandset, algorithm, outputs):
+    def __init__(self, cfg, topology, demandset, algorithm, outputs, instr=None):
+        """
+
+        :param cfg: (ScenarioConfiguration)
+        :param topology:
+        :param demandset:
+        :param algorithm:
+        :param outputs: output configurations
+        :param instr: (instrumentation.Instrumentation) with the timings of ScenarioConfiguration.produce()
+        """
         self.logger = logging.getLogger(self.__module__ + '.' + self.__class__.__name__)
         self.config = cfg
         self.topology = topology
@@ -51,6 +78,7 @@ class Scenario(object):
         self.algorithm = algorithm
         self.output_configs = outputs
         self.outputs = list()
+        self.instrumentation = instr if instr is not None else instrumentation.Instrumentation()
 
     def build_outputs(self):
         if len(self.outputs) > 0:
@@ -75,14 +103,20 @@ class Scenario(object):
             return
 
         # Run algorithm
-        self.algorithm.run()
+        with self.instrumentation.timer("run"):
+            self.algorithm.run()
 
         # Get and save solution
         sol = self.algorithm.get_solution()
-
-        for output in self.outputs:
-            output.write(sol)
-        self.logger.info(f"Scenario successfully solved.")
+        sol.update_metric_group("timings", self.instrumentation.timings)
+
+        # The written solutions can not contain the time it takes to write them. It is only added to the returned one
+        with self.instrumentation.timer("write_output"):
+            for output in self.outputs:
+                output.write(sol)
+        sol.update_metric_group("timings", {"write_output": self.instrumentation.timings["write_output"]})
+        self.logger.info("Scenario successfully solved. Writing the outputs took {:.3f}s".format(
+            self.instrumentation.timings["write_output"]))
         return sol
 
 
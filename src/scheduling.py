@@ -0,0 +1,171 @@
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import statistics
+import time
+import traceback
+
+import constants
+import input_cache
+import output.catalog
+import output.columnar_writer
+
+# Fixed layers of model.input.InputInstance
+FIXED_LAYER_KEYS = [constants.KEY_IP_LINK_LAYER, constants.KEY_IP_LINK_LAYER_FULL, constants.KEY_CDN_ASSIGNMENT_LAYER]
+
+
+def _strip_numbers(value):
+    if isinstance(value, dict):
+        return {k: _strip_numbers(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_strip_numbers(v) for v in value]
+    if isinstance(value, str):
+        return re.sub(r"\d+", "#", value)
+    return value
+
+
+def get_shape(config_dict):
+    """
+    Identifies scenarios of the same kind, e.g., the same sweep at different timestamps. Numbers in strings (the
+    timestamps in the names of the input files) are ignored, all other parameters have to be equal.
+    :param config_dict: scenario configuration dict (see scenario.ScenarioConfiguration.to_dict())
+    :return: (str)
+    """
+    return json.dumps(_strip_numbers(config_dict), sort_keys=True)
+
+
+def get_instance_size(scenario_config):
+    """
+    Produces the topology, demands and fixed layers (not the algorithm) of a scenario configuration and counts them.
+    The topology and demands stay in the input cache of the process for running the scenario.
+    :return: (dict) with ip_nodes, user_nodes, background_pairs and fixed_layers (number of fixed layers)
+    """
+    topo = input_cache.produce_topology(scenario_config.topology_configuration)
+    demandset, background_demand = input_cache.produce_demand(
+        scenario_config.demand_configuration, scenario_config.topology_configuration, topo)
+    fixed_layers = scenario_config.fixed_layers.produce() or dict()
+    return {
+        'ip_nodes': len(topo.ip_nodes),
+        'user_nodes': sum(len(hg.user_nodes) for hg in demandset),
+        'background_pairs': len(background_demand or dict()),
+        'fixed_layers': sum(1 for k in FIXED_LAYER_KEYS if fixed_layers.get(k))
+    }
+
+
+def get_size_cost(size):
+    """
+    Relative cost of an instance from its size (see get_instance_size()). The number of variables of the path-based
+    models grows with the candidate IP links and the paths of every user node and background pair. Every fixed layer
+    removes a part of the decisions.
+    """
+    n = size['ip_nodes']
+    return (n ** 2 + (size['user_nodes'] + size['background_pairs']) * n) / (1 + size['fixed_layers'])
+
+
+class CostModel(object):
+    """
+    Estimates the run time of scenario configurations for scheduling. Scenarios of the same kind (see get_shape())
+    that were solved before give the expected run time: the median of the sum of the timings of their solutions.
+    Scenarios without history are estimated from their instance size, scaled to seconds by the scenarios that have both.
+    """
+
+    def __init__(self, max_history=5):
+        """
+
+        :param max_history: number of previous solutions per kind of scenario whose timings are loaded
+        """
+        self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
+        self.max_history = max_history
+
+    def get_history(self, scenario_configs):
+        """
+        :return: (dict) shape -> median run time (s, timer "run" of scenario.Scenario.run()) of previous solutions in
+            the catalogs of the output folders
+        """
+        shapes = {get_shape(sconfig.to_dict()) for sconfig in scenario_configs}
+        folders = {os.path.dirname(fname) for fname in (
+            out_cfg.produce(sconfig).get_solution_fname() for sconfig in scenario_configs for out_cfg in sconfig.outputs
+        ) if fname is not None}
+        durations = dict()
+        for folder in folders:
+            if not output.catalog.SolutionCatalog.exists(folder):
+                continue
+            catalog = output.catalog.SolutionCatalog(folder)
+            entries = catalog.query()
+            catalog.close()
+            for entry in reversed(entries):
+                shape = get_shape(json.loads(entry["configuration"]))
+                if shape not in shapes or len(durations.get(shape, list())) >= self.max_history:
+                    continue
+                metrics = output.columnar_writer.load_metrics(os.path.join(folder, entry["solution_fname"]))
+                # The other timers are nested in the run timer (e.g., build and solve) and must not be added to it
+                if "run" in metrics.get("timings", dict()):
+                    durations.setdefault(shape, list()).append(metrics["timings"]["run"])
+        return {shape: statistics.median(d) for shape, d in durations.items()}
+
+    def estimate(self, scenario_configs, pool=None):
+        """
+        :param scenario_configs: list of scenario.ScenarioConfiguration
+        :param pool: (multiprocessing.Pool) to produce the instances in parallel if their size is needed
+        :return: (list) of estimated run times in the order of the configurations
+        """
+        history = self.get_history(scenario_configs)
+        costs = [history.get(get_shape(sconfig.to_dict())) for sconfig in scenario_configs]
+        num_known = sum(1 for c in costs if c is not None)
+        self.logger.info("Run time history for {} of {} scenarios".format(num_known, len(costs)))
+        if num_known == len(costs):
+            return costs
+
+        sizes = pool.map(get_instance_size, scenario_configs, chunksize=1) if pool is not None else \
+            [get_instance_size(sconfig) for sconfig in scenario_configs]
+        size_costs = [get_size_cost(size) for size in sizes]
+        ratios = [c / s for c, s in zip(costs, size_costs) if c is not None and s > 0]
+        seconds_per_unit = statistics.median(ratios) if ratios else 1
+        return [c if c is not None else s * seconds_per_unit for c, s in zip(costs, size_costs)]
+
+
+def get_makespan(durations, num_jobs, chunksize=1):
+    """
+    Simulates a pool of num_jobs workers that take chunks of jobs in the given order whenever they are idle.
+    :return: (float) time until all jobs are done
+    """
+    workers = [0.0] * num_jobs
+    for i in range(0, len(durations), chunksize):
+        start = heapq.heappop(workers)
+        heapq.heappush(workers, start + sum(durations[i:i + chunksize]))
+    return max(workers)
+
+
+def get_map_chunksize(num_items, num_jobs):
+    """
+    :return: chunk size that multiprocessing.Pool.map() uses by default
+    """
+    if num_items == 0:
+        return 1
+    return int(math.ceil(num_items / (num_jobs * 4)))
+
+
+def run_scenario_timed(indexed_config, num_threads=None):
+    """
+    Builds and runs a scenario configuration like scenario.run_scenario().
+    :param indexed_config: (index, scenario configuration)
+    :param num_threads: solver threads instead of the ones of the configuration (see
+        algorithm.abstract.AbstractAlgorithm.set_num_threads())
+    :return: (index, wall time in s, hits and misses of the input cache (see input_cache.get_stats()) of the scenario)
+    """
+    index, config = indexed_config
+    stats_before = input_cache.get_stats()
+    t_start = time.perf_counter()
+    try:
+        scen = config.produce()
+        if num_threads is not None:
+            scen.algorithm.set_num_threads(num_threads)
+        scen.run()
+    except Exception as e:
+        print(e)
+        traceback.print_exc()
+    duration = time.perf_counter() - t_start
+    return index, duration, {k: v - stats_before[k] for k, v in input_cache.get_stats().items()}
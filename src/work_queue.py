@@ -0,0 +1,221 @@
+import os
+import time
+import uuid
+import pickle
+import socket
+import logging
+import threading
+import traceback
+
+import input_cache
+import output.file_writer
+
+"""
+Work queue of scenario configurations in a shared folder (e.g., on NFS), so that workers on several hosts can run the
+scenarios of one sweep. Only atomic file operations are used: creating a file exclusively and renaming it.
+Layout of the folder:
+    pending/<hash>.pkl   pickled scenario configurations that are not done yet
+    claims/<hash>.claim  a worker runs the scenario. Its modification time is the heartbeat of the worker
+    done/<hash>          the scenario was run
+    failed/<hash>        the scenario raised an exception (with the traceback)
+    workers/<id>         the modification times of these files are used as the clock of the file system
+Scenarios are identified by their configuration hash (see output.file_writer.get_config_hash()). A claim can only be
+created by one worker, hence, no hash is run twice at the same time. Claims whose heartbeat is older than the lease
+time are from crashed workers: they are removed and the scenario can be claimed again.
+"""
+
+PENDING = "pending"
+CLAIMS = "claims"
+DONE = "done"
+FAILED = "failed"
+WORKERS = "workers"
+
+
+class FileWorkQueue(object):
+    def __init__(self, path, lease_time=600, heartbeat_interval=60, poll_interval=10):
+        """
+
+        :param path: folder of the queue, shared by all hosts
+        :param lease_time: claims without heartbeat for this time (s) are expired and their scenarios are requeued
+        :param heartbeat_interval: time (s) between two heartbeats of a worker. Has to be well below lease_time
+        :param poll_interval: time (s) to wait for claimed scenarios of other workers before looking again
+        """
+        self.logger = logging.getLogger(self.__module__ + "." + self.__class__.__name__)
+        self.path = path
+        self.lease_time = lease_time
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.worker_id = "{}_{}_{}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        for folder in [PENDING, CLAIMS, DONE, FAILED, WORKERS]:
+            os.makedirs(os.path.join(self.path, folder), exist_ok=True)
+
+    def _fname(self, folder, config_hash, ext=""):
+        return os.path.join(self.path, folder, config_hash + ext)
+
+    def get_pending(self):
+        """
+        :return: (list) of hashes of the scenarios that are not done yet
+        """
+        return sorted(fname[:-len(".pkl")] for fname in os.listdir(os.path.join(self.path, PENDING))
+                      if fname.endswith(".pkl"))
+
+    def publish(self, scenario_configs):
+        """
+        Adds scenario configurations. Configurations that are in the queue or were run already are not added again.
+        :return: (int) number of added configurations
+        """
+        num_published = 0
+        for sconfig in scenario_configs:
+            config_hash = output.file_writer.get_config_hash(sconfig)
+            fname = self._fname(PENDING, config_hash, ".pkl")
+            if os.path.exists(fname) or os.path.exists(self._fname(DONE, config_hash)) or \
+                    os.path.exists(self._fname(FAILED, config_hash)):
+                continue
+            tmp_fname = self._fname(PENDING, config_hash, ".{}.tmp".format(self.worker_id))
+            with open(tmp_fname, "wb") as fd:
+                pickle.dump(sconfig, fd)
+            os.replace(tmp_fname, fname)
+            num_published += 1
+        self.logger.info("Published {} of {} scenarios".format(num_published, len(scenario_configs)))
+        return num_published
+
+    def get_time(self):
+        """
+        Current time of the file system. Hosts can have different clocks, but all modification times of the shared
+        folder are set by its server.
+        """
+        fname = os.path.join(self.path, WORKERS, self.worker_id)
+        with open(fname, "a"):
+            os.utime(fname)
+        return os.stat(fname).st_mtime
+
+    @staticmethod
+    def _read_claim(claim_fname):
+        """
+        :return: (tuple) inode, modification time and worker id of a claim file. Raises FileNotFoundError
+        """
+        with open(claim_fname, "r") as fd:
+            stat = os.fstat(fd.fileno())
+            return stat.st_ino, stat.st_mtime, fd.read()
+
+    def claim(self, config_hash):
+        """
+        Claims a scenario. An expired claim is removed first.
+        :return: True if this worker holds the claim now
+        """
+        claim_fname = self._fname(CLAIMS, config_hash, ".claim")
+        try:
+            expired_claim = self._read_claim(claim_fname)
+            if self.get_time() - expired_claim[1] > self.lease_time:
+                # Renaming succeeds for only one of the workers that found the claim expired. Another worker could
+                # have removed the expired claim and created a new one since it was read, though
+                expired_fname = claim_fname + ".expired." + self.worker_id
+                os.rename(claim_fname, expired_fname)
+                if self._read_claim(expired_fname) != expired_claim:
+                    # Restores the live claim unless yet another claim was created in the meantime
+                    try:
+                        os.link(expired_fname, claim_fname)
+                    except FileExistsError:
+                        pass
+                    os.remove(expired_fname)
+                    return False
+                os.remove(expired_fname)
+                self.logger.warning("Requeued {} whose claim has expired".format(config_hash))
+        except FileNotFoundError:
+            pass
+        try:
+            fd = os.open(claim_fname, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            f.write(self.worker_id)
+        # The scenario could have been finished between listing and claiming
+        if not os.path.exists(self._fname(PENDING, config_hash, ".pkl")):
+            os.remove(claim_fname)
+            return False
+        return True
+
+    def heartbeat(self, config_hash, stop):
+        """
+        Refreshes the claim until stop is set. Runs in a thread of the worker.
+        :param stop: (threading.Event)
+        """
+        claim_fname = self._fname(CLAIMS, config_hash, ".claim")
+        missing = False
+        while not stop.wait(self.heartbeat_interval):
+            try:
+                os.utime(claim_fname)
+                missing = False
+            except FileNotFoundError:
+                # The claim is moved aside for a moment while another worker checks if it has expired (see claim())
+                if missing:
+                    self.logger.error("Claim of {} was removed while running it".format(config_hash))
+                    return
+                missing = True
+
+    def complete(self, config_hash, failure=None):
+        """
+        Marks a claimed scenario as done (or failed with the given traceback) and releases the claim.
+        """
+        with open(self._fname(FAILED if failure is not None else DONE, config_hash), "w") as fd:
+            fd.write(self.worker_id + "\n" + (failure or ""))
+        for fname in [self._fname(PENDING, config_hash, ".pkl"), self._fname(CLAIMS, config_hash, ".claim")]:
+            try:
+                os.remove(fname)
+            except FileNotFoundError:
+                pass
+
+    def run_claimed(self, config_hash):
+        """
+        Runs a claimed scenario while sending heartbeats.
+        """
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(config_hash, stop), daemon=True)
+        heartbeat.start()
+        failure = None
+        try:
+            with open(self._fname(PENDING, config_hash, ".pkl"), "rb") as fd:
+                sconfig = pickle.load(fd)
+            self.logger.info("Running {}".format(config_hash))
+            sconfig.produce().run()
+        except Exception:
+            failure = traceback.format_exc()
+            self.logger.error("Scenario {} failed: {}".format(config_hash, failure))
+        finally:
+            stop.set()
+            heartbeat.join()
+        self.complete(config_hash, failure)
+
+    def work(self):
+        """
+        Claims and runs scenarios until no scenario is pending. Scenarios claimed by other workers are waited for,
+        since their workers could crash.
+        :return: (int) number of scenarios run by this worker
+        """
+        num_run = 0
+        while True:
+            pending = self.get_pending()
+            if len(pending) == 0:
+                break
+            claimed = False
+            for config_hash in pending:
+                if self.claim(config_hash):
+                    self.run_claimed(config_hash)
+                    num_run += 1
+                    claimed = True
+            if not claimed:
+                time.sleep(self.poll_interval)
+        try:
+            os.remove(os.path.join(self.path, WORKERS, self.worker_id))
+        except FileNotFoundError:
+            pass
+        self.logger.info("Worker {} ran {} scenarios".format(self.worker_id, num_run))
+        input_cache.log_stats(input_cache.get_stats(), self.logger)
+        return num_run
+
+
+def work(path, lease_time=600, heartbeat_interval=60, poll_interval=10):
+    """
+    Runs a worker of the queue in path (see FileWorkQueue.work()), e.g., in a worker process
+    """
+    return FileWorkQueue(path, lease_time, heartbeat_interval, poll_interval).work()
@@ -0,0 +1,94 @@
+import os
+import sys
+import logging
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import constants
+import model.demand
+import model.input
+import model.topology
+from algorithm.column_generation import ColumnGenerationProgram
+from algorithm.mip_pathbased_lin import PathMixedIntegerProgram
+
+logging.disable(logging.WARNING)
+
+
+def build_instance(volumes, background):
+    """
+    Ring of six nodes with a chord (0, 3). Two hypergiants peer at the IP nodes 0, 3 and 1, 4, respectively, and have a
+    user node at every IP node, i.e., also at the IP nodes of their peering nodes.
+    :param volumes: (list) per hypergiant, demand volumes of the user nodes
+    :param background: (list) of (source, target, volume) of the background demands
+    """
+    topology = model.topology.Topology(name="ring_chord", parameter={
+        constants.KEY_IP_LIGHTPATH_CAPACITY: 100,
+        constants.KEY_IP_LINK_UTILIZATION: 0.5
+    })
+    for i in range(6):
+        topology.add_node(model.topology.OpticalNode(nid="O-{}".format(i)))
+    for i in range(6):
+        topology.add_node(model.topology.IPNode(
+            nid="{}".format(i), parent=topology.get_node_by_id("O-{}".format(i)), num_transceiver=4
+        ))
+    for i, j in [(k, (k + 1) % 6) for k in range(6)] + [(0, 3)]:
+        a, b = topology.get_node_by_id("O-{}".format(i)), topology.get_node_by_id("O-{}".format(j))
+        topology.add_edge(model.topology.OpticalLink(a, b, capacity=8))
+        topology.add_edge(model.topology.OpticalLink(b, a, capacity=8))
+
+    demandset = model.demand.DemandSet()
+    for h, peers in enumerate([[0, 3], [1, 4]]):
+        name = "hg{}".format(h)
+        demandset.append(model.demand.Hypergiant(
+            name=name,
+            peering_nodes=[model.demand.PeeringNode(
+                nid="{}-{}".format(p, name), parent=topology.get_node_by_id("{}".format(p)), capacity=1000
+            ) for p in peers],
+            user_nodes=[model.demand.EndUserNode(
+                nid="{}-{}".format(u, name), parent=topology.get_node_by_id("{}".format(u)),
+                demand_volume=volumes[h][u]
+            ) for u in range(6)]
+        ))
+
+    matrix = model.demand.DemandMatrix()
+    for s, t, volume in background:
+        dem = model.demand.EndToEndDemand(
+            topology.get_node_by_id("{}".format(s)), topology.get_node_by_id("{}".format(t)), volume
+        )
+        matrix[dem.key] = dem
+    return model.input.InputInstance(topology, demandset, background_demand=matrix)
+
+
+class TestColumnGeneration(unittest.TestCase):
+    VOLUMES = [[40, 5, 5, 40, 5, 5], [5, 40, 5, 5, 40, 5]]
+    BACKGROUND = [(2, 5, 20), (5, 2, 20)]
+
+    def run_algorithm(self, cls, **kwargs):
+        algorithm = cls(build_instance(self.VOLUMES, self.BACKGROUND),
+                        model_implementor=PathMixedIntegerProgram.MODEL_IMPLEMENTOR_CBC, **kwargs)
+        algorithm.run()
+        return algorithm
+
+    def test_objective_equals_arc_model(self):
+        arc = self.run_algorithm(PathMixedIntegerProgram)
+        cg = self.run_algorithm(ColumnGenerationProgram, num_transit_columns=6)
+        self.assertAlmostEqual(
+            cg.get_solution().to_dict()["metrics"]["objective"],
+            arc.get_solution().to_dict()["metrics"]["objective"]
+        )
+        self.assertIsNotNone(cg.cg_stats["lp_bound"])
+        self.assertLessEqual(cg.cg_stats["lp_bound"], arc.get_solution().to_dict()["metrics"]["objective"] + 1e-6)
+
+    def test_no_colocated_peering_node(self):
+        # As in the arc model, flows leaving the IP node of a user node do not serve it
+        cg = self.run_algorithm(ColumnGenerationProgram, num_transit_columns=6)
+        for hg in cg.inputinstance.demandset:
+            for unode in hg.user_nodes:
+                for pnode in hg.peering_nodes:
+                    if pnode.lower_layer == unode.lower_layer:
+                        self.assertAlmostEqual(cg.variables["flow_super"][hg.name][unode, pnode].solution_value(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import json
+import logging
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import output.columnar_writer
+from algorithm.mip_pathbased_lin import PathMixedIntegerProgram
+from test_column_generation import build_instance
+
+logging.disable(logging.WARNING)
+
+
+class TestColumnarWriter(unittest.TestCase):
+    VOLUMES = [[40, 5, 5, 40, 5, 5], [5, 40, 5, 5, 40, 5]]
+    BACKGROUND = [(2, 5, 20), (5, 2, 20)]
+
+    @classmethod
+    def setUpClass(cls):
+        mip = PathMixedIntegerProgram(build_instance(cls.VOLUMES, cls.BACKGROUND),
+                                      model_implementor=PathMixedIntegerProgram.MODEL_IMPLEMENTOR_CBC)
+        mip.run()
+        cls.sol_dict = mip.get_solution().to_dict()
+        # The solution as loaded from the file of JsonWriter (tuples are lists)
+        cls.json_dict = json.loads(json.dumps(cls.sol_dict))
+
+    def test_tables_round_trip(self):
+        self.assertGreater(len(self.json_dict["e2e_routing"]), 0)
+        tables = output.columnar_writer.solution_to_tables(self.sol_dict)
+        self.assertEqual(output.columnar_writer.tables_to_solution(tables), self.json_dict)
+
+    def test_file_round_trip(self):
+        tables = output.columnar_writer.solution_to_tables(self.sol_dict)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fname = os.path.join(tmp_dir, "solution.npz")
+            np.savez_compressed(fname, **tables)
+            self.assertEqual(output.columnar_writer.load_solution(fname), self.json_dict)
+            self.assertEqual(output.columnar_writer.load_metrics(fname), self.json_dict["metrics"])
+
+    def test_empty_solution(self):
+        sol_dict = {'ip_links': [], 'cdn_assignment': [], 'e2e_routing': [], 'metrics': {'objective': 0}}
+        tables = output.columnar_writer.solution_to_tables(sol_dict)
+        self.assertEqual(output.columnar_writer.tables_to_solution(tables), sol_dict)
+
+
+if __name__ == '__main__':
+    unittest.main()
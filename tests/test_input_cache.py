@@ -0,0 +1,107 @@
+import os
+import sys
+import glob
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import input_cache
+
+logging.disable(logging.WARNING)
+
+
+class FileConfiguration(object):
+    """
+    Generator configuration that reads its input file, like the configurations of topology and demand files
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.num_produced = 0
+
+    def to_dict(self):
+        return {'fname': self.fname}
+
+    def produce(self, *args):
+        self.num_produced += 1
+        return self
+
+    def generate(self):
+        with open(self.fname, "r") as fd:
+            return fd.read()
+
+
+class TestInputCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmp_dir.name, "topology.txt")
+        self.write_file("a")
+        self.configuration = FileConfiguration(self.fname)
+        input_cache.configure()
+
+    def tearDown(self):
+        input_cache.set_cache_dir(None)
+        input_cache.configure()
+        self.tmp_dir.cleanup()
+
+    def write_file(self, content, mtime_ns=None):
+        with open(self.fname, "w") as fd:
+            fd.write(content)
+        if mtime_ns is not None:
+            os.utime(self.fname, ns=(mtime_ns, mtime_ns))
+
+    def test_key_changes_with_file(self):
+        key = input_cache.get_key(self.configuration.to_dict())
+        self.assertEqual(input_cache.get_key(self.configuration.to_dict()), key)
+        mtime_ns = os.stat(self.fname).st_mtime_ns
+        # Same size, later modification time
+        self.write_file("b", mtime_ns + 10 ** 9)
+        self.assertNotEqual(input_cache.get_key(self.configuration.to_dict()), key)
+
+    def test_changed_file_is_produced_again(self):
+        self.assertEqual(input_cache.produce_topology(self.configuration), "a")
+        self.assertEqual(input_cache.produce_topology(self.configuration), "a")
+        self.assertEqual(self.configuration.num_produced, 1)
+        self.write_file("bb")
+        self.assertEqual(input_cache.produce_topology(self.configuration), "bb")
+        self.assertEqual(self.configuration.num_produced, 2)
+        stats = input_cache.get_stats()
+        self.assertEqual((stats['topology_hits'], stats['topology_misses']), (1, 2))
+
+    def test_content_hash_changes_with_file(self):
+        demand_configuration = FileConfiguration(self.fname)
+        content_hash = input_cache.get_content_hash(self.configuration, demand_configuration)
+        mtime_ns = os.stat(self.fname).st_mtime_ns
+        # Touching the file without changing it keeps the hash
+        os.utime(self.fname, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+        self.assertEqual(input_cache.get_content_hash(self.configuration, demand_configuration), content_hash)
+        self.write_file("b", mtime_ns + 2 * 10 ** 9)
+        self.assertNotEqual(input_cache.get_content_hash(self.configuration, demand_configuration), content_hash)
+
+    def test_changed_file_is_not_loaded_from_disk(self):
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        input_cache.set_cache_dir(cache_dir)
+        demand_configuration = FileConfiguration(self.fname)
+        self.assertIsNone(input_cache.load_inputs(self.configuration, demand_configuration))
+        input_cache.store_inputs(self.configuration, demand_configuration, FileTopology("a"), "demands", None)
+        self.assertEqual(len(glob.glob(os.path.join(cache_dir, "*.pkl"))), 1)
+
+        input_cache.configure()
+        topology, demandset, _ = input_cache.load_inputs(self.configuration, demand_configuration)
+        self.assertEqual((topology.content, demandset), ("a", "demands"))
+
+        input_cache.configure()
+        self.write_file("b", os.stat(self.fname).st_mtime_ns + 10 ** 9)
+        self.assertIsNone(input_cache.load_inputs(self.configuration, demand_configuration))
+
+
+class FileTopology(object):
+    def __init__(self, content):
+        self.content = content
+        self.optical_path_table = None
+
+
+if __name__ == '__main__':
+    unittest.main()
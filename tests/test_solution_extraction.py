@@ -0,0 +1,54 @@
+import os
+import sys
+import logging
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from algorithm.mip import get_variable_indices
+from algorithm.mip_pathbased_lin import PathMixedIntegerProgram
+from test_column_generation import build_instance
+
+logging.disable(logging.WARNING)
+
+
+class TestSolutionExtraction(unittest.TestCase):
+    VOLUMES = [[40, 5, 5, 40, 5, 5], [5, 40, 5, 5, 40, 5]]
+    BACKGROUND = [(2, 5, 20), (5, 2, 20)]
+
+    def run_mip(self, background, **kwargs):
+        mip = PathMixedIntegerProgram(build_instance(self.VOLUMES, background),
+                                      model_implementor=PathMixedIntegerProgram.MODEL_IMPLEMENTOR_CBC, **kwargs)
+        mip.run()
+        return mip
+
+    def test_values_equal_solution_value(self):
+        mip = self.run_mip(self.BACKGROUND)
+        values = mip.get_solution_values()
+        for container in [mip.variables["ip_capacity"], mip.variables["flow_e2e"]] + \
+                list(mip.variables["flow_cdn"].values()) + list(mip.variables["flow_super"].values()):
+            indices = get_variable_indices(container)
+            self.assertEqual(indices.tolist(), [var.index() for var in container.values()])
+            self.assertEqual(values[indices].tolist(), [var.solution_value() for var in container.values()])
+
+    def test_nonzero_values(self):
+        mip = self.run_mip(self.BACKGROUND)
+        container = mip.variables["ip_capacity"]
+        expected = [(key, var.solution_value()) for key, var in container.items() if var.solution_value() > 0]
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(mip._get_nonzero_values(container), expected)
+
+    def test_solution_without_names(self):
+        named = self.run_mip(self.BACKGROUND).get_solution().to_dict()
+        unnamed = self.run_mip(self.BACKGROUND, names=False).get_solution().to_dict()
+        # Metrics contain run times
+        self.assertEqual(unnamed.pop("metrics")["objective"], named.pop("metrics")["objective"])
+        self.assertEqual(unnamed, named)
+
+    def test_empty_background(self):
+        sol_dict = self.run_mip([]).get_solution().to_dict()
+        self.assertEqual(sol_dict["e2e_routing"], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
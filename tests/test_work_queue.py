@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import work_queue
+
+logging.disable(logging.WARNING)
+
+
+class TestWorkQueueClaims(unittest.TestCase):
+    CONFIG_HASH = "abc"
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = self.tmp_dir.name
+        self.queue = work_queue.FileWorkQueue(self.path, lease_time=60)
+        self.other = work_queue.FileWorkQueue(self.path, lease_time=60)
+        open(self.queue._fname(work_queue.PENDING, self.CONFIG_HASH, ".pkl"), "wb").close()
+        self.claim_fname = self.queue._fname(work_queue.CLAIMS, self.CONFIG_HASH, ".claim")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_claim_owner(self):
+        with open(self.claim_fname, "r") as fd:
+            return fd.read()
+
+    def expire_claim(self):
+        past = time.time() - 3600
+        os.utime(self.claim_fname, (past, past))
+
+    def test_claim_once(self):
+        self.assertTrue(self.queue.claim(self.CONFIG_HASH))
+        self.assertFalse(self.other.claim(self.CONFIG_HASH))
+        self.assertFalse(self.queue.claim(self.CONFIG_HASH))
+        self.assertEqual(self.get_claim_owner(), self.queue.worker_id)
+
+    def test_expired_claim_is_taken_over(self):
+        self.assertTrue(self.queue.claim(self.CONFIG_HASH))
+        self.expire_claim()
+        self.assertTrue(self.other.claim(self.CONFIG_HASH))
+        self.assertEqual(self.get_claim_owner(), self.other.worker_id)
+        self.assertEqual(os.listdir(os.path.join(self.path, work_queue.CLAIMS)), [self.CONFIG_HASH + ".claim"])
+
+    def test_live_claim_is_not_taken_over(self):
+        self.assertTrue(self.queue.claim(self.CONFIG_HASH))
+        self.assertFalse(self.other.claim(self.CONFIG_HASH))
+        self.assertEqual(self.get_claim_owner(), self.queue.worker_id)
+
+    def test_claim_renewed_after_expiry_check(self):
+        self.assertTrue(self.queue.claim(self.CONFIG_HASH))
+        self.expire_claim()
+        third = work_queue.FileWorkQueue(self.path, lease_time=60)
+        get_time = self.other.get_time
+
+        def get_time_and_reclaim():
+            # A third worker removes the expired claim and claims the scenario after the other worker read the claim
+            now = get_time()
+            self.assertTrue(third.claim(self.CONFIG_HASH))
+            return now
+
+        self.other.get_time = get_time_and_reclaim
+        self.assertFalse(self.other.claim(self.CONFIG_HASH))
+        self.assertEqual(self.get_claim_owner(), third.worker_id)
+        self.assertEqual(os.listdir(os.path.join(self.path, work_queue.CLAIMS)), [self.CONFIG_HASH + ".claim"])
+
+    def test_completed_scenario_is_not_claimed(self):
+        self.assertTrue(self.queue.claim(self.CONFIG_HASH))
+        self.queue.complete(self.CONFIG_HASH)
+        self.assertFalse(self.other.claim(self.CONFIG_HASH))
+        self.assertFalse(os.path.exists(self.claim_fname))
+        self.assertEqual(self.queue.get_pending(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()